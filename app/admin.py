@@ -1,7 +1,52 @@
 from django.contrib import admin
+from django.db import transaction
 
-from .models import Budget, Category
+from .aggregates import record_transaction_change, transaction_state
+from .bulk import delete_transactions
 
+from .models import ArchivedBudget, ArchiveTotals, BalanceLedger, Budget, Category, CategoryTotals, DailyRollup, IdempotencyKey, ImportCheckpoint, IngestTicket, RangeSumsGeneration
 
-admin.site.register(Budget)
+
+class BudgetAdmin(admin.ModelAdmin):
+    """Admin of the transactions, recording every change in the aggregates like the write views."""
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            old_state = None
+            if change:
+                old_state = transaction_state(Budget.objects.select_for_update().get(id=obj.id))
+            super().save_model(request, obj, form, change)
+            record_transaction_change(old_state, transaction_state(obj))
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Budget.objects.filter(id=obj.id))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            delete_transactions(list(queryset.select_for_update().only('id', 'amount', 'category_id', 'transaction_at')))
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Admin of the tables derived from the transactions, which only the write paths keep in sync."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(Budget, BudgetAdmin)
 admin.site.register(Category)
+admin.site.register(BalanceLedger, ReadOnlyAdmin)
+admin.site.register(DailyRollup, ReadOnlyAdmin)
+admin.site.register(CategoryTotals, ReadOnlyAdmin)
+admin.site.register(ArchivedBudget, ReadOnlyAdmin)
+admin.site.register(ArchiveTotals, ReadOnlyAdmin)
+admin.site.register(ImportCheckpoint)
+admin.site.register(IdempotencyKey, ReadOnlyAdmin)
+admin.site.register(IngestTicket, ReadOnlyAdmin)
+admin.site.register(RangeSumsGeneration, ReadOnlyAdmin)
@@ -0,0 +1,84 @@
+from collections import Counter, defaultdict, namedtuple
+
+from .category_totals import apply_category_deltas
+from .fields import to_cents
+from .ledger import apply_balance_change
+from .range_sums import record_range_changes
+from .response_cache import invalidate_responses_on_commit
+from .rollups import apply_rollup_delta, apply_rollup_deltas, rollup_fields
+
+
+TransactionState = namedtuple('TransactionState', ['cents', 'category_id', 'transaction_at'])
+
+
+def transaction_state(budget):
+    """Return the fields of a Budget instance that the derived aggregates depend on."""
+
+    return TransactionState(to_cents(budget.amount), budget.category_id, budget.transaction_at)
+
+
+def record_transaction_changes(old_states=(), new_states=()):
+    """Update every derived aggregate for transactions going from the old to the new states.
+
+    Must run in the same database transaction as the Budget changes. Removed transactions
+    are given only in old_states and created ones only in new_states. Changes hitting the
+    same rollup row are merged, so each aggregate row is written once, and changes of
+    several rollup rows are written in batches. Transactions saved without changes
+    are left out.
+    """
+
+    if old_states and new_states:
+        old_counts, new_counts = Counter(old_states), Counter(new_states)
+        unchanged = old_counts & new_counts
+        old_states = list((old_counts - unchanged).elements())
+        new_states = list((new_counts - unchanged).elements())
+
+    rollup_deltas = defaultdict(lambda: [0, 0])
+    for sign, states in ((-1, old_states), (1, new_states)):
+        for state in states:
+            rollup_delta = rollup_deltas[(state.transaction_at, state.category_id, rollup_fields(state.cents))]
+            rollup_delta[0] += sign * state.cents
+            rollup_delta[1] += sign
+
+    apply_balance_change(
+        sum(state.cents for state in new_states) - sum(state.cents for state in old_states),
+        len(new_states) - len(old_states)
+    )
+    row_deltas = defaultdict(dict)
+    category_deltas = defaultdict(lambda: defaultdict(int))
+    day_deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for (day, category_id, (sum_field, count_field)), (cents_delta, count_delta) in rollup_deltas.items():
+        if cents_delta or count_delta:
+            row_deltas[(day, category_id)].update({sum_field: cents_delta, count_field: count_delta})
+            category_deltas[category_id][sum_field] += cents_delta
+            category_deltas[category_id][count_field] += count_delta
+            offset = 0 if sum_field == 'income_sum' else 2
+            day_deltas[day][offset] += cents_delta
+            day_deltas[day][offset + 1] += count_delta
+    if len(row_deltas) == 1:
+        for (day, category_id, fields), (cents_delta, count_delta) in rollup_deltas.items():
+            if cents_delta or count_delta:
+                apply_rollup_delta(day, category_id, fields, cents_delta, count_delta)
+    elif row_deltas:
+        apply_rollup_deltas(row_deltas)
+    category_deltas = {
+        category_id: {field: delta for field, delta in field_deltas.items() if delta}
+        for category_id, field_deltas in category_deltas.items()
+    }
+    apply_category_deltas(category_deltas, _newest_dates(new_states), _newest_dates(old_states))
+    record_range_changes({day: deltas for day, deltas in day_deltas.items() if any(deltas)})
+    invalidate_responses_on_commit((day, category_id) for day, category_id, _ in rollup_deltas)
+
+
+def _newest_dates(states):
+    newest_dates = {}
+    for state in states:
+        if state.category_id not in newest_dates or state.transaction_at > newest_dates[state.category_id]:
+            newest_dates[state.category_id] = state.transaction_at
+    return newest_dates
+
+
+def record_transaction_change(old=None, new=None):
+    """Update every derived aggregate for a single transaction, see record_transaction_changes."""
+
+    record_transaction_changes([old] if old else [], [new] if new else [])
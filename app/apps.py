@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from . import categories, category_totals, db, range_sums, response_cache
+
+        categories.connect_signals()
+        category_totals.connect_signals()
+        db.connect_signals()
+        range_sums.connect_signals()
+        response_cache.connect_signals()
@@ -0,0 +1,183 @@
+import datetime
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .fields import cents_amount, to_cents
+from .models import ArchivedBudget, ArchiveTotals, Budget
+from .rollups import rollup_fields
+
+
+ARCHIVED_FIELDS = ('id', 'amount', 'category_id', 'transaction_at', 'created_at')
+
+# (first and last date of the archived transactions, when they were read), see get_archive_bounds.
+_archive_bounds = None
+
+
+def archive_transactions(before, batch_size=1000):
+    """Move the transactions dated before the given date to the archive and return how many were moved.
+
+    The balance, the rollups and the category totals count archived transactions like
+    the others, so moving them only adds to the ArchiveTotals of their year and
+    category. Each batch is moved in its own transaction, oldest first.
+    """
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Budget.objects.select_for_update().filter(transaction_at__lt=before)
+                .order_by('transaction_at', 'id').values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return moved
+            ArchivedBudget.objects.bulk_create([ArchivedBudget(**row) for row in rows])
+            Budget.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            _add_archive_totals(rows)
+            transaction.on_commit(clear_archive_bounds)
+        moved += len(rows)
+
+
+def _add_archive_totals(rows, sign=1):
+    totals = defaultdict(lambda: {'income_sum': 0, 'income_count': 0, 'expenses_sum': 0, 'expenses_count': 0})
+    dates = defaultdict(list)
+    for row in rows:
+        key = (row['transaction_at'].year, row['category_id'])
+        sum_field, count_field = rollup_fields(row['amount'])
+        totals[key][sum_field] += sign * to_cents(row['amount'])
+        totals[key][count_field] += sign
+        dates[key].append(row['transaction_at'])
+
+    existing = {
+        (archive_totals.year, archive_totals.category_id): archive_totals
+        for archive_totals in ArchiveTotals.objects.select_for_update().filter(
+            year__in={year for year, _ in totals}, category_id__in={category_id for _, category_id in totals}
+        )
+    }
+    for key, fields in totals.items():
+        year, category_id = key
+        archive_totals = existing.get(key) or ArchiveTotals(
+            year=year, category_id=category_id, first_date=min(dates[key]), last_date=max(dates[key])
+        )
+        archive_totals.income_sum = cents_amount(to_cents(archive_totals.income_sum) + fields['income_sum'])
+        archive_totals.expenses_sum = cents_amount(to_cents(archive_totals.expenses_sum) + fields['expenses_sum'])
+        archive_totals.income_count += fields['income_count']
+        archive_totals.expenses_count += fields['expenses_count']
+        if not archive_totals.income_count and not archive_totals.expenses_count:
+            archive_totals.delete()
+            continue
+        # Restored rows leave the dates as they are, the archive may still hold rows up to them.
+        if sign > 0:
+            archive_totals.first_date = min(archive_totals.first_date, *dates[key])
+            archive_totals.last_date = max(archive_totals.last_date, *dates[key])
+        archive_totals.save()
+
+
+def restore_transactions(ids=None, filters=None, limit=None):
+    """Move archived transactions back to the Budget table and return how many were moved.
+
+    They are selected either by a list of ids or by a start_date, end_date and category
+    filter, like bulk.select_transactions, which restores them before changing them,
+    at most limit of them.
+    The aggregates count archived transactions like the others, so only the
+    ArchiveTotals change. Must run in a database transaction.
+    """
+
+    archived = ArchivedBudget.objects.select_for_update()
+    if ids is not None:
+        archived = archived.filter(id__in=ids)
+    else:
+        if filters.get('start_date'):
+            archived = archived.filter(transaction_at__gte=filters['start_date'])
+        if filters.get('end_date'):
+            archived = archived.filter(transaction_at__lte=filters['end_date'])
+        if filters.get('category'):
+            archived = archived.filter(category__type=filters['category'])
+    rows = list(archived.order_by('id').values(*ARCHIVED_FIELDS)[:limit])
+    if not rows:
+        return 0
+    Budget.objects.bulk_create([Budget(**row) for row in rows])
+    # bulk_create sets created_at to the current time.
+    for row in rows:
+        Budget.objects.filter(id=row['id']).update(created_at=row['created_at'])
+    ArchivedBudget.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    _add_archive_totals(rows, sign=-1)
+    transaction.on_commit(clear_archive_bounds)
+    return len(rows)
+
+
+def _read_archive_bounds():
+    bounds = ArchiveTotals.objects.aggregate(first_date=Min('first_date'), last_date=Max('last_date'))
+    if bounds['first_date'] is None:
+        return None
+    return bounds['first_date'], bounds['last_date']
+
+
+def get_archive_bounds():
+    """Return the first and last date of the archived transactions, or None when nothing is archived.
+
+    The dates are kept in memory and read again every ARCHIVE_BOUNDS_CHECK_INTERVAL
+    seconds, or every time with the response cache on, which would keep a response
+    missing newly archived rows for longer.
+    """
+
+    global _archive_bounds
+
+    check_interval = 0 if settings.RESPONSE_CACHE_TIMEOUT else settings.ARCHIVE_BOUNDS_CHECK_INTERVAL
+    cached = _archive_bounds
+    if cached is not None and time.monotonic() - cached[1] < check_interval:
+        return cached[0]
+    bounds = _read_archive_bounds()
+    _archive_bounds = (bounds, time.monotonic())
+    return bounds
+
+
+def clear_archive_bounds():
+    """Drop the archive dates kept in memory by this process."""
+
+    global _archive_bounds
+
+    _archive_bounds = None
+
+
+def get_archive_horizon():
+    """Return the date before which transactions are archived, or None when archiving is disabled."""
+
+    if not settings.ARCHIVE_AFTER_DAYS:
+        return None
+    return timezone.localdate() - datetime.timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def overlaps_archive(start_date=None, end_date=None):
+    """Return whether the archived transactions may hold rows of a date range (None for an open end).
+
+    It is decided from the dates of the archived transactions, whatever ARCHIVE_AFTER_DAYS
+    is set to now.
+    """
+
+    bounds = get_archive_bounds()
+    return bounds is not None and (
+        (start_date is None or start_date <= bounds[1]) and (end_date is None or bounds[0] <= end_date)
+    )
+
+
+def get_archived_totals(using=None):
+    """Return {category_id: (income_sum, income_count, expenses_sum, expenses_count, last_date)} of the archive.
+
+    The sums are in cents. They are read from the database given by using, the routed one by default.
+    """
+
+    rows = ArchiveTotals.objects.using(using).values('category').annotate(
+        income=Sum('income_sum'), income_count=Sum('income_count'),
+        expenses=Sum('expenses_sum'), expenses_count=Sum('expenses_count'), last_date=Max('last_date')
+    ).order_by()
+    return {
+        row['category']: (
+            to_cents(row['income']), row['income_count'], to_cents(row['expenses']), row['expenses_count'], row['last_date']
+        )
+        for row in rows
+    }
@@ -0,0 +1,28 @@
+import asyncio
+import functools
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore():
+    loop = asyncio.get_event_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    return _semaphores[loop]
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a function using the ORM from async code and return its result.
+
+    The function runs thread sensitive, so database connections stay tied to the
+    request as in sync views, and at most ASYNC_DB_CONCURRENCY of them run at once
+    per event loop, while waiting clients only hold a coroutine.
+    """
+
+    async with _get_semaphore():
+        return await sync_to_async(functools.partial(func, *args, **kwargs), thread_sensitive=True)()
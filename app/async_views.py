@@ -0,0 +1,118 @@
+from django.conf import settings
+
+from .async_db import run_db
+from .categories import match_categories
+from .category_totals import get_category_totals
+from .encoders import JsonResponse
+from .forms import CategorySearchForm, FilteredDatesForm, FilteredTransactionsForm, SeriesForm, SummaryForm
+from .ledger import get_ledger
+from .pagination import paginate
+from .reports import get_series, get_summary
+from .rollups import get_range_totals
+from .views import (
+    balance_response,
+    category_totals_response,
+    filtered_transactions_query,
+    sum_from_dates_response,
+    series_response,
+    summary_response,
+    transactions_page_response
+)
+from .views_decorators import allowed_method, cached_response, parse_request_dates
+
+
+# Async versions of the read views for ASGI servers, with the same names so that
+# they share the cached responses of the sync views.
+
+
+@allowed_method('GET')
+@cached_response
+async def get_balance(request):
+    """Return the balance of the day which is calculated."""
+
+    return balance_response(await run_db(get_ledger))
+
+
+@allowed_method('GET')
+@cached_response
+@parse_request_dates(FilteredDatesForm)
+async def get_sum_from_dates(request, category):
+    """Return total income or expenses from the  given date range."""
+
+    form_obj = FilteredDatesForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    start_date = form_obj.cleaned_data['start_date'].date()
+    end_date = form_obj.cleaned_data['end_date'].date()
+    totals = await run_db(get_range_totals, start_date, end_date)
+    return sum_from_dates_response(category, start_date, end_date, totals)
+
+
+@allowed_method('GET')
+@cached_response
+async def get_summary_from_dates(request):
+    """Return income, expenses, net, count, min, max and average from the given date range, optionally grouped."""
+
+    form_obj = SummaryForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    start_date = form_obj.cleaned_data['start_date'].date()
+    end_date = form_obj.cleaned_data['end_date'].date()
+    summary = await run_db(get_summary, start_date, end_date, form_obj.cleaned_data['group_by'] or None)
+    return summary_response(start_date, end_date, summary)
+
+
+@allowed_method('GET')
+@cached_response
+async def get_series_from_dates(request):
+    """Return income and expenses per day, week, month or year of the given date range."""
+
+    form_obj = SeriesForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    start_date = form_obj.cleaned_data['start_date'].date()
+    end_date = form_obj.cleaned_data['end_date'].date()
+    interval = form_obj.cleaned_data['interval']
+    category = form_obj.cleaned_data['category'] or None
+    series = await run_db(get_series, start_date, end_date, interval, category)
+    return series_response(interval, category, start_date, end_date, series)
+
+
+@allowed_method('GET')
+@cached_response
+async def get_categories_totals(request):
+    """Return the all-time income, expenses, number of transactions and last transaction date of each category."""
+
+    return category_totals_response(await run_db(get_category_totals))
+
+
+@allowed_method('GET')
+async def search_categories(request):
+    """Return the category types starting with, then containing, the given text, for autocompletion."""
+
+    form_obj = CategorySearchForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    limit = form_obj.cleaned_data['limit'] or settings.CATEGORY_SEARCH_LIMIT
+    return JsonResponse({'results': await run_db(match_categories, form_obj.cleaned_data['q'], limit)})
+
+
+@allowed_method('GET')
+@cached_response
+async def get_filtered_transactions(request):
+    """Return records based on the given dates, categories and/or amounts, one page at a time."""
+
+    form_obj = FilteredTransactionsForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    if request.GET and not any(key in form_obj.fields for key in request.GET):
+        return JsonResponse({'message': 'wrong field or no value for field'})
+    if form_obj.cleaned_data['stream']:
+        # Django only streams sync iterators, which can not use the ORM under ASGI.
+        return JsonResponse({'message': 'streaming is only available from the sync views'}, status=400)
+
+    transactions, fieldnames_to_filter = await run_db(filtered_transactions_query, form_obj)
+    cursor = form_obj.cleaned_data['cursor']
+    limit = form_obj.cleaned_data['limit'] or settings.TRANSACTIONS_PAGE_SIZE
+    results, next_cursor = await run_db(paginate, transactions, limit, cursor)
+    return transactions_page_response(fieldnames_to_filter, cursor, results, next_cursor)
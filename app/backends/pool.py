@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class ConnectionPool:
+    """Process wide pool of open DB-API connections, shared by the threads of a worker.
+
+    At most max_size connections are open at once. A thread asking for one while
+    they are all in use waits up to timeout seconds for another thread to give one
+    back, then gets queue.Empty.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_size)
+
+    def get(self, connect, check=None):
+        """Return an idle connection, or a new one from connect() when there is none.
+
+        With check, an idle connection for which check(connection) fails is dropped.
+        """
+
+        if not self.slots.acquire(timeout=self.timeout):
+            raise queue.Empty
+        try:
+            while True:
+                try:
+                    connection = self.idle.get_nowait()
+                except queue.Empty:
+                    return connect()
+                if check is None or self._works(connection, check):
+                    return connection
+                self._discard(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def put(self, connection):
+        """Give a connection back, after rolling back whatever transaction it left open."""
+
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+        else:
+            self.idle.put(connection)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _works(self, connection, check):
+        try:
+            check(connection)
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, max_size, timeout):
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(max_size, timeout)
+        return _pools[key]
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def _forget_pools():
+    # Connections opened before a fork (gunicorn --preload) must not be shared with the children.
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
+
+
+def _ping(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    finally:
+        cursor.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """Database backend mixin taking its connections from a ConnectionPool when OPTIONS has a pool entry.
+
+    {'pool': {'max_size': 10, 'timeout': 10}} enables it. Closing the connection of
+    a thread, at the end of each request as CONN_MAX_AGE must be 0, gives it back to
+    the pool instead of closing it, so the next request of any thread reuses it.
+    """
+
+    pool = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        pool_options = kwargs.pop('pool', None)
+        if pool_options:
+            if self.settings_dict['CONN_MAX_AGE'] != 0:
+                raise ImproperlyConfigured('Pooled connections require CONN_MAX_AGE = 0.')
+            self.pool = get_pool(
+                (self.alias, repr(sorted(kwargs.items()))),
+                int(pool_options.get('max_size', 10)),
+                float(pool_options.get('timeout', 10))
+            )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        check = _ping if self.settings_dict.get('CONN_HEALTH_CHECKS') else None
+        try:
+            return self.pool.get(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params), check)
+        except queue.Empty:
+            raise self.Database.OperationalError(
+                f'no connection of the pool became free within {self.pool.timeout} seconds'
+            )
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.put(self.connection)
@@ -0,0 +1,33 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite backend accepting the transaction_mode option of newer Django versions and a pool.
+
+    Django starts transactions with a plain BEGIN, which takes the write lock only at
+    the first write. When another connection committed in the meantime, that write
+    fails at once with 'database is locked', busy_timeout does not apply. With
+    {'transaction_mode': 'IMMEDIATE'} in OPTIONS the lock is taken by BEGIN, so
+    concurrent writers wait for each other instead of failing. See pool.py for the
+    pool option.
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}')
+        self.transaction_mode = transaction_mode and transaction_mode.upper()
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .aggregates import TransactionState, record_transaction_changes, transaction_state
+from .archive import restore_transactions
+from .categories import get_category_ids, remember_categories
+from .fields import to_cents
+from .forms import BulkTransactionForm
+from .models import Budget, Category
+
+
+def validate_rows(loaded_rows):
+    """Return the cleaned rows and a list of errors for the rows that are not valid."""
+
+    cleaned_rows = []
+    errors = []
+    for row_number, loaded_row in enumerate(loaded_rows):
+        if not isinstance(loaded_row, dict):
+            errors.append({'row': row_number, 'errors': {'__all__': ['Expected a json object.']}})
+            continue
+        row_form = BulkTransactionForm(loaded_row)
+        if not row_form.is_valid():
+            errors.append({'row': row_number, 'errors': row_form.errors})
+            continue
+        cleaned_rows.append(row_form.cleaned_data)
+    return cleaned_rows, errors
+
+
+def resolve_categories(category_types):
+    """Return a mapping of category type to id, creating the missing categories in one query."""
+
+    category_types = set(category_types)
+    cached_ids = get_category_ids()
+    category_ids = {type: cached_ids[type] for type in category_types if type in cached_ids}
+    unknown_types = category_types - category_ids.keys()
+    if not unknown_types:
+        return category_ids
+    category_ids.update(Category.objects.filter(type__in=unknown_types).values_list('type', 'id'))
+    missing_types = unknown_types - category_ids.keys()
+    if missing_types:
+        # ignore_conflicts covers categories created by another request in the meantime,
+        # but leaves the ids unset on some backends, so they are read back.
+        Category.objects.bulk_create([Category(type=type) for type in missing_types], ignore_conflicts=True)
+        category_ids.update(Category.objects.filter(type__in=missing_types).values_list('type', 'id'))
+    remember_categories({type: category_ids[type] for type in unknown_types})
+    return category_ids
+
+
+def insert_transactions(cleaned_rows, batch_size):
+    """Save the cleaned rows in one database transaction and return the number of saved rows."""
+
+    with transaction.atomic():
+        category_ids = resolve_categories(row['category'] for row in cleaned_rows)
+        budgets = [
+            Budget(amount=row['amount'], category_id=category_ids[row['category']], transaction_at=row['transaction_at'])
+            for row in cleaned_rows
+        ]
+        Budget.objects.bulk_create(budgets, batch_size=batch_size)
+        record_transaction_changes(new_states=[transaction_state(budget) for budget in budgets])
+    return len(budgets)
+
+
+# Ids per query of the bulk changes, under the 999 parameters of older SQLite versions.
+IDS_BATCH_SIZE = 500
+
+
+class TooManyTransactions(Exception):
+    """Raised when a filter selects more than BULK_MAX_IDS transactions."""
+
+
+def select_transactions(ids=None, filters=None):
+    """Return the transactions to change, locked until the end of the database transaction, and the missing ids.
+
+    They are selected either by a list of ids, through a single in_bulk lookup, or by
+    a start_date, end_date and category filter, which raises TooManyTransactions when
+    it matches more than BULK_MAX_IDS of them, like a list of ids would be refused.
+    Archived transactions are moved back to the Budget table first. Must run in a
+    database transaction.
+    """
+
+    transactions = Budget.objects.select_for_update().only('id', 'amount', 'category_id', 'transaction_at')
+    if ids is not None:
+        found = transactions.in_bulk(ids)
+        missing_ids = set(ids) - found.keys()
+        if missing_ids and restore_transactions(ids=missing_ids):
+            found.update(transactions.in_bulk(missing_ids))
+        return list(found.values()), sorted(set(ids) - found.keys())
+    if restore_transactions(filters=filters, limit=settings.BULK_MAX_IDS + 1) > settings.BULK_MAX_IDS:
+        raise TooManyTransactions(f'Enter a filter matching at most {settings.BULK_MAX_IDS} transactions.')
+    if filters.get('start_date'):
+        transactions = transactions.filter(transaction_at__gte=filters['start_date'])
+    if filters.get('end_date'):
+        transactions = transactions.filter(transaction_at__lte=filters['end_date'])
+    if filters.get('category'):
+        transactions = transactions.filter(category__type=filters['category'])
+    selected = list(transactions.order_by('id')[:settings.BULK_MAX_IDS + 1])
+    if len(selected) > settings.BULK_MAX_IDS:
+        raise TooManyTransactions(f'Enter a filter matching at most {settings.BULK_MAX_IDS} transactions.')
+    return selected, []
+
+
+def _id_batches(budgets):
+    ids = [budget.id for budget in budgets]
+    for start in range(0, len(ids), IDS_BATCH_SIZE):
+        yield ids[start:start + IDS_BATCH_SIZE]
+
+
+def update_transactions(budgets, changes):
+    """Apply the same changes (amount, category, transaction_at) to the selected transactions.
+
+    The rows are changed by id, so rows matching a filter after the selection are left out.
+    """
+
+    changes = {field: value for field, value in changes.items() if value not in (None, '')}
+    if 'category' in changes:
+        category_type = changes.pop('category')
+        changes['category_id'] = resolve_categories([category_type])[category_type]
+    cents = to_cents(changes['amount']) if 'amount' in changes else None
+    old_states = [transaction_state(budget) for budget in budgets]
+    new_states = [
+        TransactionState(
+            state.cents if cents is None else cents,
+            changes.get('category_id', state.category_id),
+            changes.get('transaction_at', state.transaction_at)
+        )
+        for state in old_states
+    ]
+    for id_batch in _id_batches(budgets):
+        Budget.objects.filter(id__in=id_batch).update(**changes, modified_at=timezone.now())
+    record_transaction_changes(old_states, new_states)
+    return len(budgets)
+
+
+def delete_transactions(budgets):
+    """Delete the selected transactions."""
+
+    for id_batch in _id_batches(budgets):
+        Budget.objects.filter(id__in=id_batch).delete()
+    record_transaction_changes(old_states=[transaction_state(budget) for budget in budgets])
+    return len(budgets)
@@ -0,0 +1,157 @@
+import threading
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Category
+
+
+VERSION_CACHE_KEY = 'app:categories:version'
+
+_category_ids = {}
+_loaded = False
+_loaded_version = None
+_lock = threading.Lock()
+# Bumped on every change of _category_ids, the search index is rebuilt when it is behind.
+_generation = 0
+_search_index = []
+_search_index_generation = None
+
+
+def _shared_version():
+    """Return the category version shared between processes, or None when it is disabled."""
+
+    if not settings.CATEGORY_CACHE_SHARED_VERSION:
+        return None
+    return cache.get_or_set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+def get_category_ids():
+    """Return the cached mapping of category type to id, loading it when it is missing or outdated.
+
+    Categories are only loaded outside atomic blocks, so that rows which may still be
+    rolled back never reach the cache.
+    """
+
+    global _generation, _loaded, _loaded_version
+
+    version = _shared_version()
+    if _loaded and version == _loaded_version:
+        return _category_ids
+    if connection.in_atomic_block:
+        clear_category_cache(shared=False)
+        return _category_ids
+    category_ids = dict(Category.objects.values_list('type', 'id'))
+    with _lock:
+        _category_ids.clear()
+        _category_ids.update(category_ids)
+        _loaded = True
+        _loaded_version = version
+        _generation += 1
+    return _category_ids
+
+
+def remember_categories(category_ids):
+    """Add resolved categories to the cache once the current transaction commits."""
+
+    def remember():
+        global _generation
+
+        with _lock:
+            if _loaded:
+                _category_ids.update(category_ids)
+                _generation += 1
+
+    transaction.on_commit(remember)
+
+
+def get_category_id(category_type):
+    """Return the id of a category type, creating the category if it does not exist."""
+
+    category_id = get_category_ids().get(category_type)
+    if category_id is None:
+        # get_or_create repeats the lookup when a concurrent worker wins the unique constraint.
+        category_obj, _ = Category.objects.get_or_create(type=category_type)
+        category_id = category_obj.id
+        remember_categories({category_type: category_id})
+    return category_id
+
+
+def _get_search_index():
+    global _search_index, _search_index_generation
+
+    with _lock:
+        if _search_index_generation != _generation:
+            _search_index = sorted((category_type.casefold(), category_type) for category_type in _category_ids)
+            _search_index_generation = _generation
+        return _search_index
+
+
+def match_categories(query, limit):
+    """Return up to limit category types starting with query, followed by the ones containing it, ignoring case.
+
+    Prefixes are found with a binary search over the sorted types of the category
+    cache, which is rebuilt whenever the cache changes. Inside atomic blocks, where the
+    cache is not loaded, the Category table is searched instead.
+    """
+
+    get_category_ids()
+    if not _loaded:
+        return _search_table(query, limit)
+    index = _get_search_index()
+    key = query.casefold()
+    matches = []
+    for folded, category_type in islice(index, bisect_left(index, (key,)), None):
+        if not folded.startswith(key) or len(matches) == limit:
+            break
+        matches.append(category_type)
+    if len(matches) < limit:
+        matches.extend(islice(
+            (category_type for folded, category_type in index if key in folded and not folded.startswith(key)),
+            limit - len(matches)
+        ))
+    return matches
+
+
+def _search_table(query, limit):
+    types = Category.objects.order_by('type').values_list('type', flat=True)
+    matches = list(types.filter(type__istartswith=query)[:limit])
+    if len(matches) < limit:
+        matches += types.filter(type__icontains=query).exclude(type__istartswith=query)[:limit - len(matches)]
+    return matches
+
+
+def clear_category_cache(shared=True):
+    """Drop the cache of this process and, when enabled and shared is set, of every other process."""
+
+    global _generation, _loaded
+
+    with _lock:
+        _category_ids.clear()
+        _loaded = False
+        _generation += 1
+    if shared and settings.CATEGORY_CACHE_SHARED_VERSION:
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+def category_saved(sender, instance, created, **kwargs):
+    if created:
+        remember_categories({instance.type: instance.id})
+    else:
+        clear_category_cache()
+
+
+def category_deleted(sender, instance, **kwargs):
+    clear_category_cache()
+
+
+def connect_signals():
+    post_save.connect(category_saved, sender=Category, dispatch_uid='category_cache_saved')
+    post_delete.connect(category_deleted, sender=Category, dispatch_uid='category_cache_deleted')
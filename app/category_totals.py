@@ -0,0 +1,171 @@
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, DateField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete
+
+from .archive import get_archived_totals
+from .fields import cents_amount, from_cents, to_cents
+from .ledger import apply_balance_change
+from .models import ArchiveTotals, Budget, Category, CategoryTotals
+from .response_cache import clear_responses
+
+
+SUM_FIELDS = ('income_sum', 'income_count', 'expenses_sum', 'expenses_count')
+TOTALS_FIELDS = SUM_FIELDS + ('last_transaction_at',)
+
+
+def apply_category_deltas(deltas, added_dates, removed_dates):
+    """Update the totals of the changed categories. Must run in the same transaction as the Budget changes.
+
+    deltas is {category_id: {field: delta}} with the sums in cents, added_dates and
+    removed_dates the newest date added to and removed from each category. When the
+    newest transaction of a category may be gone, its last date is read back from the
+    Budget (category, transaction_at) index and the archive totals.
+    """
+
+    category_ids = deltas.keys() | added_dates.keys() | removed_dates.keys()
+    if len(category_ids) == 1:
+        category_id, = category_ids
+        _apply_category_delta(category_id, deltas.get(category_id, {}), added_dates.get(category_id))
+    elif category_ids:
+        _apply_many_category_deltas(category_ids, deltas, added_dates)
+    if removed_dates:
+        latest_date = Subquery(
+            Budget.objects.filter(category_id=OuterRef('category_id')).order_by('-transaction_at').values('transaction_at')[:1]
+        )
+        # Archived transactions are never removed, their last date is kept in the archive totals.
+        latest_archived_date = Subquery(
+            ArchiveTotals.objects.filter(category_id=OuterRef('category_id')).order_by('-last_date').values('last_date')[:1]
+        )
+        CategoryTotals.objects.filter(
+            category_id__in=removed_dates, last_transaction_at__lte=max(removed_dates.values())
+        ).update(last_transaction_at=Greatest(
+            Coalesce(latest_date, latest_archived_date), Coalesce(latest_archived_date, latest_date)
+        ))
+
+
+def _apply_category_delta(category_id, field_deltas, added_date):
+    changes = {field: F(field) + delta for field, delta in field_deltas.items()}
+    if added_date:
+        day = Value(added_date, output_field=DateField())
+        changes['last_transaction_at'] = Greatest(Coalesce('last_transaction_at', day), day)
+    if not changes or CategoryTotals.objects.filter(category_id=category_id).update(**changes):
+        return
+    initial = {field: cents_amount(delta) if field.endswith('_sum') else delta for field, delta in field_deltas.items()}
+    try:
+        with transaction.atomic():
+            CategoryTotals.objects.create(category_id=category_id, last_transaction_at=added_date, **initial)
+    except IntegrityError:
+        # Another worker created the row in the meantime.
+        CategoryTotals.objects.filter(category_id=category_id).update(**changes)
+
+
+def _apply_many_category_deltas(category_ids, deltas, added_dates):
+    # Same approach as apply_rollup_deltas, missing rows are created empty and a single
+    # executemany statement updates all of them.
+    CategoryTotals.objects.bulk_create(
+        [CategoryTotals(category_id=category_id) for category_id in category_ids], ignore_conflicts=True
+    )
+    connection = connections[router.db_for_write(CategoryTotals)]
+    quote_name = connection.ops.quote_name
+    last_date = quote_name('last_transaction_at')
+    update_sql = 'UPDATE {} SET {}, {} = CASE WHEN {} IS NULL OR {} < %s THEN %s ELSE {} END WHERE {} = %s'.format(
+        quote_name(CategoryTotals._meta.db_table),
+        ', '.join(f'{quote_name(field)} = {quote_name(field)} + %s' for field in SUM_FIELDS),
+        last_date, last_date, last_date, last_date,
+        quote_name('category_id')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(update_sql, [
+            [deltas.get(category_id, {}).get(field, 0) for field in SUM_FIELDS]
+            + [connection.ops.adapt_datefield_value(added_dates.get(category_id))] * 2
+            + [category_id]
+            for category_id in category_ids
+        ])
+
+
+def get_category_totals():
+    """Return the all-time totals of every category, ordered by type."""
+
+    rows = Category.objects.order_by('type').values_list(
+        'type', *(f'totals__{field}' for field in TOTALS_FIELDS)
+    )
+    return [
+        {
+            'category': category_type,
+            'income': income_sum or 0.0,
+            'expenses': expenses_sum or 0.0,
+            'count': (income_count or 0) + (expenses_count or 0),
+            'last_transaction_at': last_transaction_at
+        }
+        for category_type, income_sum, income_count, expenses_sum, expenses_count, last_transaction_at in rows
+    ]
+
+
+def compute_category_totals():
+    """Return the totals of each category calculated from the Budget table, a GROUP BY over all of it, and the archive."""
+
+    category_totals = Budget.objects.values('category').annotate(
+        income_sum=Sum('amount', filter=Q(amount__gt=0)),
+        income_count=Count('id', filter=Q(amount__gt=0)),
+        expenses_sum=Sum('amount', filter=Q(amount__lte=0)),
+        expenses_count=Count('id', filter=Q(amount__lte=0)),
+        last_transaction_at=Max('transaction_at')
+    ).order_by()
+    computed_totals = get_archived_totals()
+    for totals in category_totals.iterator():
+        income_sum, income_count, expenses_sum, expenses_count, last_date = computed_totals.get(
+            totals['category'], (0, 0, 0, 0, None)
+        )
+        computed_totals[totals['category']] = (
+            income_sum + to_cents(totals['income_sum'] or 0), income_count + totals['income_count'],
+            expenses_sum + to_cents(totals['expenses_sum'] or 0), expenses_count + totals['expenses_count'],
+            max(filter(None, [last_date, totals['last_transaction_at']]))
+        )
+    return computed_totals
+
+
+def find_category_drift():
+    """Return {category_id: (stored, actual)} for the categories whose stored totals differ from the Budget table.
+
+    Both are (income_sum, income_count, expenses_sum, expenses_count, last_transaction_at)
+    tuples with the sums in cents.
+    """
+
+    empty = (0, 0, 0, 0, None)
+    actual_totals = compute_category_totals()
+    stored_totals = {
+        category_id: (to_cents(income_sum), income_count, to_cents(expenses_sum), expenses_count, last_transaction_at)
+        for category_id, income_sum, income_count, expenses_sum, expenses_count, last_transaction_at
+        in CategoryTotals.objects.values_list('category_id', *TOTALS_FIELDS)
+    }
+    return {
+        category_id: (stored_totals.get(category_id, empty), actual_totals.get(category_id, empty))
+        for category_id in stored_totals.keys() | actual_totals.keys()
+        if stored_totals.get(category_id, empty) != actual_totals.get(category_id, empty)
+    }
+
+
+def fix_category_totals(drift):
+    """Overwrite the drifted totals returned by find_category_drift with the values of the Budget table."""
+
+    with transaction.atomic():
+        for category_id, (_, actual) in drift.items():
+            values = dict(zip(TOTALS_FIELDS, actual))
+            values['income_sum'] = from_cents(values['income_sum'])
+            values['expenses_sum'] = from_cents(values['expenses_sum'])
+            CategoryTotals.objects.update_or_create(category_id=category_id, defaults=values)
+        transaction.on_commit(clear_responses)
+
+
+def category_totals_deleted(sender, instance, **kwargs):
+    # Totals rows are only deleted along with their category, whose transactions go
+    # with them, so the balance loses what the category held.
+    apply_balance_change(
+        -to_cents(instance.income_sum) - to_cents(instance.expenses_sum),
+        -instance.income_count - instance.expenses_count
+    )
+
+
+def connect_signals():
+    post_delete.connect(category_totals_deleted, sender=CategoryTotals, dispatch_uid='category_totals_deleted')
@@ -0,0 +1,78 @@
+import random
+
+import django
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+# Messages of the SQLite errors raised when another connection holds the lock, and
+# PostgreSQL codes of serialization failures, deadlocks and lock timeouts.
+SQLITE_LOCK_MESSAGES = ('database is locked', 'database table is locked')
+POSTGRESQL_LOCK_CODES = ('40001', '40P01', '55P03')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Set up every new SQLite connection for concurrent writers.
+
+    busy_timeout makes a writer wait for the lock instead of failing at once, and
+    in WAL mode readers no longer block the writer nor the writer the readers.
+    synchronous=NORMAL is safe with WAL, only the last commits can be lost on a
+    power failure, never the consistency of the file. mmap_size and cache_size
+    keep more of the file in memory than the 2 MB page cache of the defaults.
+    """
+
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT)}')
+        cursor.execute(f'PRAGMA cache_size = {-int(settings.SQLITE_CACHE_SIZE)}')
+        if connection.is_in_memory_db():
+            return
+        cursor.execute(f'PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}')
+        # The journal mode of a read-only replica is the one its writer set.
+        if settings.SQLITE_WAL and 'mode=ro' not in str(connection.settings_dict['NAME']):
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+
+
+def check_connection(connection):
+    """Close a persistent connection with CONN_HEALTH_CHECKS which stopped working, before a request uses it.
+
+    Django only closes it after a query failed, so a connection dropped by the
+    database server or a proxy while idle would fail the first query of the request.
+    """
+
+    if (
+        connection.settings_dict.get('CONN_HEALTH_CHECKS') and connection.connection is not None
+        and not connection.in_atomic_block and not connection.is_usable()
+    ):
+        connection.close()
+
+
+def check_connections(**kwargs):
+    for connection in connections.all():
+        check_connection(connection)
+
+
+def is_lock_error(error):
+    """Return whether a database error is caused by a concurrent transaction, so that retrying can succeed."""
+
+    if getattr(error.__cause__, 'pgcode', None) in POSTGRESQL_LOCK_CODES:
+        return True
+    return any(message in str(error) for message in SQLITE_LOCK_MESSAGES)
+
+
+def retry_delay(attempt):
+    """Return the seconds to wait before a retry, exponential backoff with full jitter."""
+
+    backoff = min(settings.WRITE_RETRY_MAX_DELAY, settings.WRITE_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, backoff)
+
+
+def connect_signals():
+    connection_created.connect(configure_sqlite, dispatch_uid='app.db.configure_sqlite')
+    # Django checks CONN_HEALTH_CHECKS itself from version 4.1.
+    if django.VERSION < (4, 1):
+        request_started.connect(check_connections, dispatch_uid='app.db.check_connections')
@@ -0,0 +1,98 @@
+import json
+from collections import UserList
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# The encoders write the same compact utf-8 json, so responses do not depend on
+# which of them is installed.
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def _default(value):
+    """Return a value the C encoders can handle, for the types they do not know."""
+
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, (list, tuple, UserList)):
+        return list(value)
+    if isinstance(value, (str, Decimal)):
+        return str(value)
+    return _django_encoder.default(value)
+
+
+def _plain(value):
+    """Return the value with its dict and list subclasses (like form errors) turned into plain ones."""
+
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, UserList)):
+        return [_plain(item) for item in value]
+    if isinstance(value, str) and type(value) is not str:
+        return str(value)
+    return value
+
+
+def stdlib_dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def orjson_dumps(data):
+    # Subclasses (form errors, safe strings) go through _default, orjson would only see their base storage.
+    return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+
+def ujson_dumps(data):
+    # ujson has no option for subclasses, so they are converted beforehand.
+    return ujson.dumps(_plain(data), default=_default, ensure_ascii=False, escape_forward_slashes=False).encode()
+
+
+ENCODERS = {'json': stdlib_dumps}
+if ujson is not None:
+    ENCODERS['ujson'] = ujson_dumps
+if orjson is not None:
+    ENCODERS['orjson'] = orjson_dumps
+
+
+def get_encoder(name=None):
+    """Return the dumps function of an encoder name, 'auto' picks orjson when installed.
+
+    ujson is only used when asked for, with dates going through a python default
+    it is slower than the json module on transactions (benchmarks/json_encoders.py).
+    """
+
+    name = name or settings.JSON_ENCODER
+    if name == 'auto':
+        return ENCODERS.get('orjson', stdlib_dumps)
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise ValueError(f'json encoder {name} is not installed')
+
+
+def dumps(data):
+    """Return data as json bytes, with the encoder set by JSON_ENCODER."""
+
+    return get_encoder()(data)
+
+
+class JsonResponse(HttpResponse):
+    """HttpResponse with its data encoded by the JSON_ENCODER encoder."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,67 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Return an amount (int, float, Decimal or str) as an exact number of cents."""
+
+    return int((Decimal(str(value)) / CENT).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_cents(cents):
+    """Return a number of cents as an amount."""
+
+    return cents / 100
+
+
+def cents_amount(cents):
+    """Return a number of cents as the exact Decimal amount, to be saved without a float."""
+
+    return cents * CENT
+
+
+class CentsField(models.BigIntegerField):
+    """Amount stored as an integer number of cents and exposed as a float amount, or as
+    the Decimal it was given until it is read back.
+
+    Sums run over integers in the database, so they are exact. Arithmetic in
+    update expressions (F('amount') + value) works on the stored cents.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return from_cents(value)
+
+    def to_python(self, value):
+        # Decimals, like the cleaned form values, are kept as they are: a float can not
+        # hold every amount of the column exactly.
+        if value is None or isinstance(value, (float, Decimal)):
+            return value
+        try:
+            return Decimal(str(value))
+        except ArithmeticError:
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return to_cents(value)
+
+    def save_form_data(self, instance, data):
+        setattr(instance, self.name, self.to_python(data))
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'decimal_places': 2,
+            'min_value': (-self.MAX_BIGINT - 1) * CENT,
+            'max_value': self.MAX_BIGINT * CENT,
+            **kwargs,
+        })
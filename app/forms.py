@@ -1,13 +1,85 @@
 from django import forms
+from django.conf import settings
 
-from .models import Budget
+from .categories import get_category_id
+from .models import Budget, Category
+from .pagination import decode_cursor
+from .reports import SERIES_INTERVALS, SUMMARY_GROUPS, count_buckets
+
+
+def amount_field(**kwargs):
+    """Return a form field for an amount within the range of the Budget amount column."""
+
+    return Budget._meta.get_field('amount').formfield(**kwargs)
 
 
 class TransactionForm(forms.ModelForm):
 
+    # Resolved through the category cache on save instead of a ModelChoiceField lookup.
+    category = forms.CharField(max_length=30)
+
     class Meta:
         model = Budget
-        fields = ['amount', 'category', 'transaction_at']
+        fields = ['amount', 'transaction_at']
+
+    def clean_category(self):
+        category_type = self.cleaned_data['category']
+        return Category(id=get_category_id(category_type), type=category_type)
+
+    def save(self, commit=True):
+        self.instance.category = self.cleaned_data['category']
+        return super().save(commit)
+
+
+class BulkTransactionForm(forms.Form):
+
+    amount = amount_field()
+    category = forms.CharField(max_length=30)
+    transaction_at = forms.DateField()
+
+
+class IdsField(forms.Field):
+    """Field for a json list of transaction ids."""
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if not isinstance(value, list) or not all(type(item) is int for item in value):
+            raise forms.ValidationError('Enter a list of ids.')
+        if len(value) > settings.BULK_MAX_IDS:
+            raise forms.ValidationError(f'Enter at most {settings.BULK_MAX_IDS} ids.')
+        return value
+
+
+class BulkSelectionForm(forms.Form):
+
+    ids = IdsField()
+
+
+class BulkFilterForm(forms.Form):
+
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    category = forms.CharField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.values()):
+            raise forms.ValidationError('Enter at least one filter.')
+        return cleaned_data
+
+
+class BulkChangesForm(forms.Form):
+
+    amount = amount_field(required=False)
+    category = forms.CharField(required=False, max_length=30)
+    transaction_at = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if all(value in (None, '') for value in cleaned_data.values()):
+            raise forms.ValidationError('Enter at least one change.')
+        return cleaned_data
 
 
 class FilteredDatesForm(forms.Form):
@@ -16,12 +88,90 @@ class FilteredDatesForm(forms.Form):
     end_date = forms.DateTimeField(input_formats=['%Y-%m-%d'])
 
 
+class SummaryForm(FilteredDatesForm):
+
+    group_by = forms.ChoiceField(required=False, choices=[(group, group) for group in SUMMARY_GROUPS])
+
+
+class SeriesForm(FilteredDatesForm):
+
+    interval = forms.ChoiceField(choices=[(interval, interval) for interval in SERIES_INTERVALS])
+    category = forms.CharField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date, interval = cleaned_data.get('start_date'), cleaned_data.get('end_date'), cleaned_data.get('interval')
+        if not (start_date and end_date and interval):
+            return cleaned_data
+        if count_buckets(start_date.date(), end_date.date(), interval) > settings.SERIES_MAX_BUCKETS:
+            raise forms.ValidationError(f'Enter a date range of at most {settings.SERIES_MAX_BUCKETS} {interval}s.')
+        return cleaned_data
+
+
 class FilteredTransactionsForm(forms.Form):
 
     category = forms.CharField(required=False)
+    categories = forms.CharField(required=False)
     transaction_at = forms.DateTimeField(required=False, input_formats=['%Y-%m-%d'])
+    start_date = forms.DateTimeField(required=False, input_formats=['%Y-%m-%d'])
+    end_date = forms.DateTimeField(required=False, input_formats=['%Y-%m-%d'])
+    min_amount = amount_field(required=False)
+    max_amount = amount_field(required=False)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=settings.TRANSACTIONS_MAX_PAGE_SIZE)
+    cursor = forms.CharField(required=False)
+    stream = forms.BooleanField(required=False)
+
+    def clean_categories(self):
+        categories = [category for category in self.cleaned_data['categories'].split(',') if category]
+        if len(categories) > settings.TRANSACTIONS_MAX_CATEGORIES:
+            raise forms.ValidationError(f'Enter at most {settings.TRANSACTIONS_MAX_CATEGORIES} categories.')
+        return categories
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError('The start date must not be after the end date.')
+        min_amount, max_amount = cleaned_data.get('min_amount'), cleaned_data.get('max_amount')
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise forms.ValidationError('The minimum amount must not be above the maximum amount.')
+        return cleaned_data
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            raise forms.ValidationError('Enter a valid cursor.')
+
+
+class CategorySearchForm(forms.Form):
+
+    q = forms.CharField(max_length=30)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=settings.CATEGORY_SEARCH_MAX_LIMIT)
 
 
 class DeleteForm(forms.Form):
 
-    id = forms.IntegerField()
\ No newline at end of file
+    id = forms.IntegerField()
+
+
+FILE_FORMATS = [('csv', 'csv'), ('ndjson', 'ndjson')]
+
+
+class ExportForm(forms.Form):
+
+    format = forms.ChoiceField(required=False, choices=FILE_FORMATS)
+    gzip = forms.BooleanField(required=False)
+    start_date = forms.DateTimeField(required=False, input_formats=['%Y-%m-%d'])
+    end_date = forms.DateTimeField(required=False, input_formats=['%Y-%m-%d'])
+    category = forms.CharField(required=False)
+
+
+class ImportForm(forms.Form):
+
+    format = forms.ChoiceField(required=False, choices=FILE_FORMATS)
+    gzip = forms.BooleanField(required=False)
+    checkpoint = forms.CharField(required=False, max_length=100)
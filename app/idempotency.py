@@ -0,0 +1,48 @@
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def request_hash(request):
+    """Return a hash of the path and body of a request, to tell a retry from another request reusing its key."""
+
+    return hashlib.sha256(request.path.encode() + b'\n' + request.body).hexdigest()
+
+
+def expiry_date():
+    return timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def find_response(key):
+    """Return the stored response of a key which has not expired, in a single primary key query."""
+
+    stored = IdempotencyKey.objects.filter(key=key).first()
+    if stored is not None and stored.created_at < expiry_date():
+        stored.delete()
+        return None
+    return stored
+
+
+def save_response(key, hashed_request, response):
+    IdempotencyKey.objects.create(
+        key=key, request_hash=hashed_request, status_code=response.status_code, content=response.content
+    )
+
+
+def delete_response(key):
+    """Delete the stored response of a key, so that a retry runs the request again."""
+
+    IdempotencyKey.objects.filter(key=key).delete()
+
+
+def clear_expired_keys():
+    """Delete the keys older than IDEMPOTENCY_KEY_TTL and return their number."""
+
+    return IdempotencyKey.objects.filter(created_at__lt=expiry_date()).delete()[0]
@@ -0,0 +1,269 @@
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, router, transaction
+from django.utils import timezone
+
+from .bulk import insert_transactions
+from .forms import BulkTransactionForm
+from .idempotency import delete_response
+from .models import IngestTicket
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS ingest_queue ('
+    'seq INTEGER PRIMARY KEY AUTOINCREMENT, ticket TEXT NOT NULL UNIQUE, payload TEXT NOT NULL, '
+    'claimed_until REAL NOT NULL DEFAULT 0)'
+)
+
+_local = threading.local()
+_worker = None
+_worker_lock = threading.Lock()
+# Rows queued by this process since its worker last woke up.
+_queued_count = 0
+
+
+def _reset_after_fork():
+    # SQLite connections and threads do not survive a fork, the child opens and starts its own.
+    global _local, _worker, _worker_lock, _queued_count
+
+    _local = threading.local()
+    _worker = None
+    _worker_lock = threading.Lock()
+    _queued_count = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def queue_connection():
+    """Return the connection of this thread to the INGEST_QUEUE_PATH SQLite file, creating the queue if needed.
+
+    The file uses the write-ahead log with synchronous=FULL, so a queued row survives
+    the restart or crash of the process, and a power loss, once it is inserted.
+    """
+
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.path != settings.INGEST_QUEUE_PATH:
+        connection = sqlite3.connect(
+            settings.INGEST_QUEUE_PATH, timeout=settings.SQLITE_BUSY_TIMEOUT / 1000, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = FULL')
+        connection.execute(QUEUE_SCHEMA)
+        _local.connection = connection
+        _local.path = settings.INGEST_QUEUE_PATH
+    return connection
+
+
+def close_queue_connection():
+    connection = getattr(_local, 'connection', None)
+    if connection is not None:
+        connection.close()
+        _local.connection = None
+
+
+def enqueue(cleaned_data, idempotency_key=None):
+    """Queue a cleaned BulkTransactionForm row for the ingest worker and return its ticket.
+
+    Inside an atomic block the row is only queued once the transaction commits, so an
+    idempotent request rolled back by a concurrent retry queues nothing. When queueing
+    fails after the response was stored under idempotency_key, the stored response is
+    deleted, so that a retry queues the row instead of replaying a ticket which does
+    not exist.
+    """
+
+    ticket = uuid.uuid4().hex
+    payload = json.dumps({
+        'amount': str(cleaned_data['amount']),
+        'category': cleaned_data['category'],
+        'transaction_at': cleaned_data['transaction_at'].isoformat()
+    })
+
+    def insert():
+        global _queued_count
+
+        try:
+            queue_connection().execute('INSERT INTO ingest_queue (ticket, payload) VALUES (?, ?)', (ticket, payload))
+        except Exception:
+            if idempotency_key:
+                delete_response(idempotency_key)
+            raise
+        _queued_count += 1
+        if _worker is not None and _queued_count >= settings.INGEST_BATCH_SIZE:
+            _worker.wake_up.set()
+
+    transaction.on_commit(insert)
+    return ticket
+
+
+def claim_batch(limit):
+    """Return up to limit (seq, ticket, payload) queued rows, leased for INGEST_LEASE_SECONDS to this worker.
+
+    Rows of a worker which stopped before finishing them are claimed again once their
+    lease expired.
+    """
+
+    connection = queue_connection()
+    now = time.time()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        rows = connection.execute(
+            'SELECT seq, ticket, payload FROM ingest_queue WHERE claimed_until < ? ORDER BY seq LIMIT ?', (now, limit)
+        ).fetchall()
+        if rows:
+            connection.execute(
+                f'UPDATE ingest_queue SET claimed_until = ? WHERE seq IN ({", ".join("?" * len(rows))})',
+                [now + settings.INGEST_LEASE_SECONDS] + [seq for seq, _, _ in rows]
+            )
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return rows
+
+
+def commit_batch(rows):
+    """Save the valid rows of a batch in one database transaction, along with the tickets of all of them.
+
+    Rows whose ticket is already saved were committed by an earlier attempt, which
+    stopped before removing them from the queue, and are skipped.
+    """
+
+    with transaction.atomic():
+        committed = set(IngestTicket.objects.filter(ticket__in=[ticket for _, ticket, _ in rows]).values_list('ticket', flat=True))
+        cleaned_rows = []
+        tickets = []
+        for _, ticket, payload in rows:
+            if ticket in committed:
+                continue
+            row_form = BulkTransactionForm(json.loads(payload))
+            if row_form.is_valid():
+                cleaned_rows.append(row_form.cleaned_data)
+                tickets.append(IngestTicket(ticket=ticket, status=IngestTicket.DONE))
+            else:
+                tickets.append(IngestTicket(ticket=ticket, status=IngestTicket.FAILED, errors=row_form.errors.get_json_data()))
+        if cleaned_rows:
+            insert_transactions(cleaned_rows, settings.BULK_INSERT_BATCH_SIZE)
+        IngestTicket.objects.bulk_create(tickets)
+
+
+def process_batch():
+    """Commit the next batch of queued rows and return its size, 0 when the queue is empty.
+
+    When the batch fails, its rows are committed one at a time and a row failing on its
+    own gets a failed ticket, so that it does not hold back the rows queued after it.
+    Rows failing on a lost connection or a lock stay queued and are claimed again once
+    their lease expires.
+    """
+
+    rows = claim_batch(settings.INGEST_BATCH_SIZE)
+    if not rows:
+        return 0
+    try:
+        commit_batch(rows)
+    except (InterfaceError, OperationalError):
+        raise
+    except Exception:
+        logger.exception('ingest batch failed, committing its rows one at a time')
+        for row in rows:
+            try:
+                commit_batch([row])
+            except (InterfaceError, OperationalError):
+                raise
+            except Exception as error:
+                logger.exception('queued transaction %s failed', row[1])
+                IngestTicket.objects.create(ticket=row[1], status=IngestTicket.FAILED, errors={'__all__': [str(error)]})
+    seqs = [seq for seq, _, _ in rows]
+    queue_connection().execute(f'DELETE FROM ingest_queue WHERE seq IN ({", ".join("?" * len(seqs))})', seqs)
+    return len(rows)
+
+
+def get_ticket_status(ticket):
+    """Return the status of a ticket and the errors of its row, or None when the ticket is unknown.
+
+    The queue is read first, unless the asynchronous ingest mode is off: a row leaves it
+    only after its ticket is committed. The ticket is read from the primary, a replica
+    may not have it yet.
+    """
+
+    if settings.INGEST_ASYNC and queue_connection().execute('SELECT 1 FROM ingest_queue WHERE ticket = ?', (ticket,)).fetchone():
+        return {'ticket': ticket, 'status': 'pending'}
+    saved = IngestTicket.objects.using(router.db_for_write(IngestTicket)).filter(ticket=ticket).first()
+    if saved is None:
+        return None
+    status = {'ticket': ticket, 'status': saved.status}
+    if saved.errors:
+        status['errors'] = saved.errors
+    return status
+
+
+def clear_expired_tickets():
+    """Delete the tickets older than INGEST_TICKET_TTL and return their number."""
+
+    expiry_date = timezone.now() - datetime.timedelta(seconds=settings.INGEST_TICKET_TTL)
+    deleted, _ = IngestTicket.objects.filter(created_at__lt=expiry_date).delete()
+    return deleted
+
+
+class IngestWorker(threading.Thread):
+    """Thread committing the queued rows in batches, every INGEST_BATCH_INTERVAL ms or INGEST_BATCH_SIZE rows."""
+
+    def __init__(self):
+        super().__init__(name='ingest-worker', daemon=True)
+        self.wake_up = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        global _queued_count
+
+        while not self.stopped.is_set():
+            _queued_count = 0
+            close_old_connections()
+            try:
+                processed = process_batch()
+            except Exception:
+                # The rows stay claimed until their lease expires and are committed again then.
+                logger.exception('ingest batch failed')
+                processed = 0
+            if processed < settings.INGEST_BATCH_SIZE:
+                self.wake_up.wait(settings.INGEST_BATCH_INTERVAL / 1000)
+                self.wake_up.clear()
+        close_old_connections()
+        close_queue_connection()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake_up.set()
+        self.join()
+
+
+def ensure_worker():
+    """Start the ingest worker of this process unless it runs, or INGEST_ASYNC or INGEST_START_WORKER is off."""
+
+    global _worker
+
+    if not settings.INGEST_ASYNC or not settings.INGEST_START_WORKER or (_worker is not None and _worker.is_alive()):
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = IngestWorker()
+            _worker.start()
+
+
+def stop_worker():
+    global _worker
+
+    with _worker_lock:
+        if _worker is not None:
+            _worker.stop()
+            _worker = None
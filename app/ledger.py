@@ -0,0 +1,71 @@
+from django.db import router, transaction
+from django.db.models import BigIntegerField, Count, F, Sum
+
+from .archive import get_archived_totals
+from .fields import cents_amount, from_cents
+from .models import BalanceLedger, Budget
+
+
+LEDGER_ID = 1
+
+
+def _compute_balance_cents():
+    # Summed as plain integers, a float could not hold every sum of the column exactly. Both
+    # sums are read from the primary: a replica lagging behind would leave the ledger
+    # short of the writes it has not received yet, for good.
+    database = router.db_for_write(BalanceLedger)
+    totals = Budget.objects.using(database).aggregate(cents=Sum('amount', output_field=BigIntegerField()), transactions_count=Count('id'))
+    cents, transactions_count = totals['cents'] or 0, totals['transactions_count']
+    for income_sum, income_count, expenses_sum, expenses_count, _ in get_archived_totals(using=database).values():
+        cents += income_sum + expenses_sum
+        transactions_count += income_count + expenses_count
+    return cents, transactions_count
+
+
+def compute_balance():
+    """Return the balance and the number of transactions calculated from the Budget table and the archive totals."""
+
+    cents, transactions_count = _compute_balance_cents()
+    return from_cents(cents), transactions_count
+
+
+def rebuild_balance():
+    """Recalculate the ledger row from the Budget table and the archive totals and return it.
+
+    The ledger row is locked before the sum is calculated, so writers committing in the
+    meantime wait to add their change to the rebuilt row instead of being left out of it.
+    """
+
+    with transaction.atomic():
+        ledger = BalanceLedger.objects.select_for_update().filter(id=LEDGER_ID).first()
+        if ledger is None:
+            BalanceLedger.objects.get_or_create(id=LEDGER_ID)
+            ledger = BalanceLedger.objects.select_for_update().get(id=LEDGER_ID)
+        cents, ledger.transactions_count = _compute_balance_cents()
+        ledger.amount = cents_amount(cents)
+        ledger.save()
+        ledger.amount = from_cents(cents)
+    return ledger
+
+
+def get_ledger():
+    """Return the ledger row, building it from the Budget table the first time."""
+
+    try:
+        return BalanceLedger.objects.get(id=LEDGER_ID)
+    except BalanceLedger.DoesNotExist:
+        return rebuild_balance()
+
+
+def apply_balance_change(cents_delta, count_delta=0):
+    """Add the given deltas to the ledger. Must run in the same transaction as the Budget change."""
+
+    if not cents_delta and not count_delta:
+        return
+    updated = BalanceLedger.objects.filter(id=LEDGER_ID).update(
+        amount=F('amount') + cents_delta,
+        transactions_count=F('transactions_count') + count_delta
+    )
+    if not updated:
+        # The Budget change is already visible inside this transaction, so the rebuild includes it.
+        rebuild_balance()
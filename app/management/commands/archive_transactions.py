@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.archive import archive_transactions, get_archive_horizon
+
+
+class Command(BaseCommand):
+    help = 'Move the transactions older than ARCHIVE_AFTER_DAYS days from the Budget table to the archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of transactions moved per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        horizon = get_archive_horizon()
+        if horizon is None:
+            raise CommandError('archiving is disabled, set ARCHIVE_AFTER_DAYS')
+        moved = archive_transactions(horizon, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{moved} transactions dated before {horizon} archived'))
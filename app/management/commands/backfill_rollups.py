@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily income - expenses rollups from the Budget table and the archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows inserted per query.'
+        )
+
+    def handle(self, *args, **options):
+        created = backfill_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{created} daily rollups created'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.range_sums import find_range_sums_drift
+from app.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the range sums loaded from the rollups with the Budget table and report or fix the days that drifted. '
+        'The range sums in the memory of the running workers are not checked.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild the rollups from the Budget table, making every worker load its range sums again.'
+        )
+
+    def handle(self, *args, **options):
+        drift = find_range_sums_drift()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('range sums verified'))
+            return
+
+        for day, (indexed, actual) in sorted(drift.items()):
+            self.stdout.write(
+                f'{day}: indexed {indexed}, table {actual} (income cents, income count, expenses cents, expenses count)'
+            )
+        if not options['fix']:
+            raise CommandError(f'{len(drift)} days drifted, run again with --fix to rebuild them')
+        backfill_rollups()
+        self.stdout.write(self.style.SUCCESS(f'{len(drift)} days fixed'))
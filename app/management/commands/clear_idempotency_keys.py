@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.idempotency import clear_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete the idempotency keys older than IDEMPOTENCY_KEY_TTL.'
+
+    def handle(self, *args, **options):
+        deleted = clear_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired idempotency keys deleted'))
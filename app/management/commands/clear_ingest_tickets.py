@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.ingest import clear_expired_tickets
+
+
+class Command(BaseCommand):
+    help = 'Delete the ingest tickets older than INGEST_TICKET_TTL.'
+
+    def handle(self, *args, **options):
+        deleted = clear_expired_tickets()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired ingest tickets deleted'))
@@ -0,0 +1,41 @@
+import datetime
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.forms import FILE_FORMATS
+from app.transfer import export_chunks, export_querysets, gzip_chunks
+
+
+class Command(BaseCommand):
+    help = 'Write the transactions as a csv or ndjson file, streamed from a server side cursor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=[file_format for file_format, _ in FILE_FORMATS], default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the file with gzip.')
+        parser.add_argument('--output', help='File to write, the standard output by default.')
+        parser.add_argument('--start-date', type=datetime.date.fromisoformat)
+        parser.add_argument('--end-date', type=datetime.date.fromisoformat)
+        parser.add_argument('--category')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.TRANSACTIONS_STREAM_CHUNK_SIZE,
+            help='Number of rows fetched from the database at a time.'
+        )
+
+    def handle(self, *args, **options):
+        transactions = export_querysets(options['start_date'], options['end_date'], options['category'])
+        chunks = export_chunks(transactions, options['format'], options['chunk_size'])
+        if options['gzip']:
+            chunks = gzip_chunks(chunks)
+        output_file = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output_file.write(chunk)
+        finally:
+            if options['output']:
+                output_file.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'transactions exported to {options["output"]}'))
@@ -0,0 +1,49 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.forms import FILE_FORMATS
+from app.transfer import import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import transactions from a csv or ndjson file in batches, resumable with a checkpoint name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, - for the standard input.')
+        parser.add_argument(
+            '--format',
+            choices=[file_format for file_format, _ in FILE_FORMATS],
+            help='Taken from the file extension (.csv, otherwise ndjson) by default.'
+        )
+        parser.add_argument('--gzip', action='store_true', help='The file is gzipped, implied by a .gz extension.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Name under which the progress is saved, running the import again with it skips the rows already read.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BULK_INSERT_BATCH_SIZE,
+            help='Number of rows saved per database transaction.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith(('.csv', '.csv.gz')) else 'ndjson')
+        compressed = options['gzip'] or path.endswith('.gz')
+        input_file = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = import_rows(read_rows(input_file, file_format, compressed), options['batch_size'], options['checkpoint'])
+        finally:
+            if path != '-':
+                input_file.close()
+
+        for error in report['errors']:
+            self.stderr.write(f'row {error["row"]}: {dict(error["errors"])}')
+        if report['resumed_at']:
+            self.stdout.write(f'resumed after row {report["resumed_at"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["imported"]} transactions imported from {report["rows_read"]} rows, {report["error_count"]} rows skipped'
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.ingest import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Save the transactions queued by add/ in the asynchronous ingest mode, until stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drain',
+            action='store_true',
+            help='Stop once the queue is empty.'
+        )
+
+    def handle(self, *args, **options):
+        saved = 0
+        while True:
+            processed = process_batch()
+            saved += processed
+            if not processed:
+                if options['drain']:
+                    break
+                time.sleep(settings.INGEST_BATCH_INTERVAL / 1000)
+        self.stdout.write(self.style.SUCCESS(f'{saved} queued transactions processed'))
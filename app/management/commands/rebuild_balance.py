@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.ledger import compute_balance, get_ledger, rebuild_balance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the balance ledger from the Budget table and the archive or verify it against the real sum.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the ledger with the Budget table and the archive, exit with an error on drift.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            ledger = rebuild_balance()
+            self.stdout.write(self.style.SUCCESS(f'ledger rebuilt: {ledger}'))
+            return
+
+        ledger = get_ledger()
+        amount, transactions_count = compute_balance()
+        if ledger.amount != amount or ledger.transactions_count != transactions_count:
+            raise CommandError(
+                f'ledger drift: ledger has {ledger.amount} of {ledger.transactions_count} transactions, '
+                f'table has {amount} of {transactions_count} transactions'
+            )
+        self.stdout.write(self.style.SUCCESS(f'ledger verified: {ledger}'))
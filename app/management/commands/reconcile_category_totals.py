@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.category_totals import find_category_drift, fix_category_totals
+from app.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-category totals with the Budget table and report or fix the categories that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Overwrite the drifted totals with the values of the Budget table instead of failing.'
+        )
+
+    def handle(self, *args, **options):
+        drift = find_category_drift()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('category totals verified'))
+            return
+
+        category_types = dict(Category.objects.filter(id__in=drift).values_list('id', 'type'))
+        for category_id, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(
+                f'{category_types.get(category_id, category_id)}: stored {stored}, table {actual} '
+                '(income cents, income count, expenses cents, expenses count, last transaction date)'
+            )
+        if not options['fix']:
+            raise CommandError(f'{len(drift)} categories drifted, run again with --fix to rebuild them')
+        fix_category_totals(drift)
+        self.stdout.write(self.style.SUCCESS(f'{len(drift)} category totals fixed'))
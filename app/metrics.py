@@ -0,0 +1,81 @@
+import threading
+from collections import defaultdict
+
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus format."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Per process request metrics grouped by url name."""
+
+    HISTOGRAMS = {
+        'money_handler_request_duration_seconds': ('Wall time of the requests.', SECONDS_BUCKETS),
+        'money_handler_request_db_duration_seconds': ('Time spent in database queries per request.', SECONDS_BUCKETS),
+        'money_handler_request_queries': ('Number of database queries per request.', QUERIES_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {
+                name: defaultdict(lambda buckets=buckets: Histogram(buckets))
+                for name, (_, buckets) in self.HISTOGRAMS.items()
+            }
+            self.requests = defaultdict(int)
+            self.duplicate_queries = defaultdict(int)
+
+    def record(self, view, status, duration, db_duration, queries, duplicate_queries):
+        with self._lock:
+            self.histograms['money_handler_request_duration_seconds'][view].observe(duration)
+            self.histograms['money_handler_request_db_duration_seconds'][view].observe(db_duration)
+            self.histograms['money_handler_request_queries'][view].observe(queries)
+            self.requests[(view, status)] += 1
+            self.duplicate_queries[view] += duplicate_queries
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+
+        lines = []
+        with self._lock:
+            for name, (description, _) in self.HISTOGRAMS.items():
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for view, histogram in sorted(self.histograms[name].items()):
+                    for upper_bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{view="{view}",le="{upper_bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+            lines += ['# HELP money_handler_requests_total Number of requests.', '# TYPE money_handler_requests_total counter']
+            for (view, status), count in sorted(self.requests.items()):
+                lines.append(f'money_handler_requests_total{{view="{view}",status="{status}"}} {count}')
+            lines += [
+                '# HELP money_handler_duplicate_queries_total Queries repeated with the same sql and params in a request.',
+                '# TYPE money_handler_duplicate_queries_total counter'
+            ]
+            for view, count in sorted(self.duplicate_queries.items()):
+                lines.append(f'money_handler_duplicate_queries_total{{view="{view}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,199 @@
+import asyncio
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+from .async_db import run_db
+from .metrics import request_metrics
+from .replicas import choose_replica, reset_replica, use_replica
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Database execute wrapper collecting the time and statements of the queries of a request."""
+
+    def __init__(self):
+        self.duration = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+
+# Recorder of the current request. Async requests share the connections of the thread
+# running their database calls, which passes their context along.
+_current_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper handing the query to the recorder of the current request, if any."""
+
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder():
+    """Add record_query to the connections of the current thread which do not have it yet."""
+
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+def dump_profile(profiler, request, duration):
+    """Write the stats of a slow request to REQUEST_PROFILER_DIR, as a .prof file and a text summary."""
+
+    os.makedirs(settings.REQUEST_PROFILER_DIR, exist_ok=True)
+    url_name = getattr(request.resolver_match, 'url_name', None) or 'unresolved'
+    file_name = os.path.join(settings.REQUEST_PROFILER_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}-{url_name}-{int(duration * 1000)}ms')
+    profiler.dump_stats(file_name + '.prof')
+    summary = io.StringIO()
+    summary.write(f'{request.method} {request.get_full_path()} took {duration * 1000:.1f} ms\n\n')
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(settings.REQUEST_PROFILER_TOP_FRAMES)
+    with open(file_name + '.txt', 'w') as summary_file:
+        summary_file.write(summary.getvalue())
+    logger.warning('slow request %s profiled to %s', request.get_full_path(), file_name)
+
+
+class RequestMetricsMiddleware:
+    """Middleware recording wall time, database time, query count and duplicate queries of each request.
+
+    The numbers are added to the response as a Server-Timing header and to the
+    metrics served at /metrics/. When REQUEST_PROFILER_SAMPLE_RATE is set, that
+    share of the requests runs under cProfile and the slow ones are dumped to disk.
+    Under ASGI it runs in the event loop, and requests are not profiled, as cProfile
+    would follow every request of the loop at once.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Tells Django to await the middleware instead of running it in a thread.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        profiler = None
+        if settings.REQUEST_PROFILER_SAMPLE_RATE and random.random() < settings.REQUEST_PROFILER_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+
+        install_query_recorder()
+        token = _current_recorder.set(recorder)
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+            _current_recorder.reset(token)
+        duration = time.perf_counter() - start
+
+        if profiler and duration * 1000 >= settings.REQUEST_PROFILER_SLOW_MS:
+            dump_profile(profiler, request, duration)
+        return self.record(request, response, recorder, duration)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        await run_db(install_query_recorder)
+        token = _current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self.record(request, response, recorder, time.perf_counter() - start)
+
+    def record(self, request, response, recorder, duration):
+        url_name = getattr(request.resolver_match, 'url_name', None) or 'unresolved'
+        if url_name != 'metrics':
+            request_metrics.record(url_name, response.status_code, duration, recorder.duration, recorder.count, recorder.duplicates)
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.2f}, '
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries, {recorder.duplicates} duplicates"'
+        )
+        return response
+
+
+class ReplicaMiddleware:
+    """Middleware choosing the database the reads of a request go to, see app.replicas.
+
+    GET and HEAD requests read from a replica, unless the client sent a write request
+    during the last REPLICA_STICKY_SECONDS, which is marked by a cookie set on every
+    write request. Streamed responses are read after the middleware returned, from
+    the primary. Under ASGI the replica is connected to through run_db.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        alias = choose_replica() if self.replica_request(request) else None
+        token = use_replica(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+        return self.mark_writer(request, response)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        alias = await run_db(choose_replica) if self.replica_request(request) else None
+        token = use_replica(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replica(token)
+        return self.mark_writer(request, response)
+
+    def replica_request(self, request):
+        return request.method in ('GET', 'HEAD') and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+
+    def mark_writer(self, request, response):
+        if request.method not in ('GET', 'HEAD'):
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:38
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    Budget = apps.get_model('app', 'Budget')
+    DailyRollup = apps.get_model('app', 'DailyRollup')
+    daily_totals = Budget.objects.values('transaction_at', 'category').annotate(
+        income_sum=Sum('amount', filter=Q(amount__gt=0)),
+        income_count=Count('id', filter=Q(amount__gt=0)),
+        expenses_sum=Sum('amount', filter=Q(amount__lte=0)),
+        expenses_count=Count('id', filter=Q(amount__lte=0))
+    ).order_by()
+    DailyRollup.objects.bulk_create(
+        [
+            DailyRollup(
+                day=totals['transaction_at'],
+                category_id=totals['category'],
+                income_sum=totals['income_sum'] or 0,
+                income_count=totals['income_count'],
+                expenses_sum=totals['expenses_sum'] or 0,
+                expenses_count=totals['expenses_count']
+            )
+            for totals in daily_totals.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_balanceledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('income_sum', models.FloatField(default=0)),
+                ('income_count', models.BigIntegerField(default=0)),
+                ('expenses_sum', models.FloatField(default=0)),
+                ('expenses_count', models.BigIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.category')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), name='unique_daily_rollup'),
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
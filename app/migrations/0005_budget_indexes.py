@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['transaction_at', 'id'], name='budget_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['category', 'transaction_at', 'id'], name='budget_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('amount__gt', 0)), fields=['transaction_at'], include=('amount',), name='budget_income_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('amount__lte', 0)), fields=['transaction_at'], include=('amount',), name='budget_expenses_date_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:46
+
+import app.fields
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+AMOUNT_FIELDS = [
+    ('Budget', 'amount'),
+    ('BalanceLedger', 'amount'),
+    ('DailyRollup', 'income_sum'),
+    ('DailyRollup', 'expenses_sum'),
+]
+
+
+def amounts_to_cents(apps, schema_editor):
+    for model_name, field_name in AMOUNT_FIELDS:
+        apps.get_model('app', model_name).objects.update(**{field_name: Round(F(field_name) * 100)})
+
+
+def cents_to_amounts(apps, schema_editor):
+    for model_name, field_name in AMOUNT_FIELDS:
+        apps.get_model('app', model_name).objects.update(**{field_name: F(field_name) / 100.0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_budget_indexes'),
+    ]
+
+    operations = [
+        # The partial indexes compare amount with a float, they are created again for integers.
+        migrations.RemoveIndex(
+            model_name='budget',
+            name='budget_income_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='budget',
+            name='budget_expenses_date_idx',
+        ),
+        migrations.RunPython(amounts_to_cents, cents_to_amounts),
+        migrations.AlterField(
+            model_name='balanceledger',
+            name='amount',
+            field=app.fields.CentsField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='budget',
+            name='amount',
+            field=app.fields.CentsField(),
+        ),
+        migrations.AlterField(
+            model_name='dailyrollup',
+            name='expenses_sum',
+            field=app.fields.CentsField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailyrollup',
+            name='income_sum',
+            field=app.fields.CentsField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('amount__gt', 0)), fields=['transaction_at'], include=('amount',), name='budget_income_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('amount__lte', 0)), fields=['transaction_at'], include=('amount',), name='budget_expenses_date_idx'),
+        ),
+    ]
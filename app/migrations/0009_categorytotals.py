@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:30
+
+import app.fields
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+import django.db.models.deletion
+
+
+def backfill_category_totals(apps, schema_editor):
+    Budget = apps.get_model('app', 'Budget')
+    CategoryTotals = apps.get_model('app', 'CategoryTotals')
+    category_totals = Budget.objects.values('category').annotate(
+        income_sum=Sum('amount', filter=Q(amount__gt=0)),
+        income_count=Count('id', filter=Q(amount__gt=0)),
+        expenses_sum=Sum('amount', filter=Q(amount__lte=0)),
+        expenses_count=Count('id', filter=Q(amount__lte=0)),
+        last_transaction_at=Max('transaction_at')
+    ).order_by()
+    CategoryTotals.objects.bulk_create(
+        [
+            CategoryTotals(
+                category_id=totals['category'],
+                income_sum=totals['income_sum'] or 0,
+                income_count=totals['income_count'],
+                expenses_sum=totals['expenses_sum'] or 0,
+                expenses_count=totals['expenses_count'],
+                last_transaction_at=totals['last_transaction_at']
+            )
+            for totals in category_totals.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTotals',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='totals', serialize=False, to='app.category')),
+                ('income_sum', app.fields.CentsField(default=0)),
+                ('income_count', models.BigIntegerField(default=0)),
+                ('expenses_sum', app.fields.CentsField(default=0)),
+                ('expenses_count', models.BigIntegerField(default=0)),
+                ('last_transaction_at', models.DateField(null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_category_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:41
+
+import app.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_categorytotals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('income_sum', app.fields.CentsField(default=0)),
+                ('income_count', models.BigIntegerField(default=0)),
+                ('expenses_sum', app.fields.CentsField(default=0)),
+                ('expenses_count', models.BigIntegerField(default=0)),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedBudget',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', app.fields.CentsField()),
+                ('transaction_at', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.category')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='archivetotals',
+            constraint=models.UniqueConstraint(fields=('year', 'category'), name='unique_archive_totals'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbudget',
+            index=models.Index(fields=['transaction_at', 'id'], name='archive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbudget',
+            index=models.Index(fields=['category', 'transaction_at', 'id'], name='archive_category_date_idx'),
+        ),
+    ]
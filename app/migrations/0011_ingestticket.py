@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestTicket',
+            fields=[
+                ('ticket', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('done', 'done'), ('failed', 'failed')], max_length=6)),
+                ('errors', models.JSONField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
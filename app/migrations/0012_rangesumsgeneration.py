@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_ingestticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RangeSumsGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
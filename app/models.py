@@ -1,5 +1,7 @@
 from django.db import models
 
+from .fields import CentsField
+
 
 class Category(models.Model):
     """Model for type of transaction."""
@@ -13,12 +15,165 @@ class Category(models.Model):
 class Budget(models.Model):
     """Model for income - expenses records."""
 
-    amount = models.FloatField()
+    amount = CentsField()
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     transaction_at = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Date filters and the (transaction_at, id) keyset order of the transactions listing.
+            models.Index(fields=['transaction_at', 'id'], name='budget_date_idx'),
+            # Category filters combined with the same order.
+            models.Index(fields=['category', 'transaction_at', 'id'], name='budget_category_date_idx'),
+            # Income and expenses sums over a date range. The amount is only included
+            # (index-only scans) on backends supporting covering indexes.
+            models.Index(
+                fields=['transaction_at'], include=['amount'], condition=models.Q(amount__gt=0),
+                name='budget_income_date_idx'
+            ),
+            models.Index(
+                fields=['transaction_at'], include=['amount'], condition=models.Q(amount__lte=0),
+                name='budget_expenses_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        # Saved forms leave the exact Decimal amount on the instance, printed like a read one.
+        return f'{self.category.type} {float(self.amount)} of {self.transaction_at}'
+
+
+class ArchivedBudget(models.Model):
+    """Model for the old income - expenses records moved out of Budget by the archive_transactions command."""
+
+    # The id the row had in Budget, whose ids are never reused.
+    id = models.BigIntegerField(primary_key=True)
+    amount = CentsField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    transaction_at = models.DateField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_at', 'id'], name='archive_date_idx'),
+            models.Index(fields=['category', 'transaction_at', 'id'], name='archive_category_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'archived {self.category.type} {self.amount} of {self.transaction_at}'
+
+
+class ArchiveTotals(models.Model):
+    """Model for the totals of the archived transactions of a category in a year."""
+
+    year = models.PositiveSmallIntegerField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    income_sum = CentsField(default=0)
+    income_count = models.BigIntegerField(default=0)
+    expenses_sum = CentsField(default=0)
+    expenses_count = models.BigIntegerField(default=0)
+    first_date = models.DateField()
+    last_date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'category'], name='unique_archive_totals')
+        ]
+
+    def __str__(self):
+        return f'archived {self.category.type} {self.income_sum} / {self.expenses_sum} of {self.year}'
+
+
+class BalanceLedger(models.Model):
+    """Model for the running balance, kept in a single row updated on every write."""
+
+    amount = CentsField(default=0)
+    transactions_count = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'balance {self.amount} of {self.transactions_count} transactions'
+
+
+class DailyRollup(models.Model):
+    """Model for income - expenses totals of a category for a single day."""
+
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    income_sum = CentsField(default=0)
+    income_count = models.BigIntegerField(default=0)
+    expenses_sum = CentsField(default=0)
+    expenses_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='unique_daily_rollup')
+        ]
+
+    def __str__(self):
+        return f'{self.category.type} {self.income_sum} / {self.expenses_sum} of {self.day}'
+
+
+class CategoryTotals(models.Model):
+    """Model for the all-time income - expenses totals of a category, updated on every write."""
+
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='totals')
+    income_sum = CentsField(default=0)
+    income_count = models.BigIntegerField(default=0)
+    expenses_sum = CentsField(default=0)
+    expenses_count = models.BigIntegerField(default=0)
+    last_transaction_at = models.DateField(null=True)
+
+    def __str__(self):
+        return f'{self.category.type} {self.income_sum} / {self.expenses_sum} up to {self.last_transaction_at}'
+
+
+class ImportCheckpoint(models.Model):
+    """Model for the progress of a named import, saved with every imported batch so it can be resumed."""
+
+    name = models.CharField(max_length=100, unique=True)
+    rows_read = models.BigIntegerField(default=0)
+    rows_imported = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'import {self.name} at row {self.rows_read}'
+
+
+class IdempotencyKey(models.Model):
+    """Model for the response of a write request sent with an Idempotency-Key header, replayed on retries."""
+
+    key = models.CharField(max_length=255, primary_key=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    content = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'idempotency key {self.key}'
+
+
+class IngestTicket(models.Model):
+    """Model for the outcome of a transaction accepted by add/ in the asynchronous ingest mode."""
+
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(DONE, 'done'), (FAILED, 'failed')]
+
+    ticket = models.CharField(max_length=32, primary_key=True)
+    status = models.CharField(max_length=6, choices=STATUS_CHOICES)
+    errors = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'ingest ticket {self.ticket} {self.status}'
+
+
+class RangeSumsGeneration(models.Model):
+    """Model for a counter bumped by every change of the daily totals, telling workers their range sums are outdated."""
+
+    generation = models.BigIntegerField(default=0)
 
     def __str__(self):
-        return f'{self.category.type} {self.amount} of {self.transaction_at}'
\ No newline at end of file
+        return f'range sums generation {self.generation}'
@@ -0,0 +1,97 @@
+import base64
+import binascii
+import datetime
+import heapq
+import json
+from itertools import islice
+from operator import itemgetter
+
+from django.db.models import Q
+
+from .encoders import dumps
+
+
+# Range of the BigInteger ids, the database fails on ids outside of it.
+MIN_ID, MAX_ID = -2 ** 63, 2 ** 63 - 1
+
+def encode_cursor(transaction_at, transaction_id):
+    """Return an opaque token pointing right after the given transaction."""
+
+    raw_cursor = json.dumps([transaction_at.isoformat(), transaction_id]).encode()
+    return base64.urlsafe_b64encode(raw_cursor).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return the (transaction_at, id) pair of a token, raise ValueError if it is not valid."""
+
+    try:
+        raw_cursor = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        transaction_at, transaction_id = json.loads(raw_cursor)
+        transaction_at, transaction_id = datetime.date.fromisoformat(transaction_at), int(transaction_id)
+    except (binascii.Error, OverflowError, TypeError, ValueError):
+        raise ValueError('invalid cursor')
+    if not MIN_ID <= transaction_id <= MAX_ID:
+        raise ValueError('invalid cursor')
+    return transaction_at, transaction_id
+
+
+def after_cursor(queryset, cursor):
+    """Return the queryset ordered by (transaction_at, id), starting after the given cursor."""
+
+    queryset = queryset.order_by('transaction_at', 'id')
+    if cursor is None:
+        return queryset
+    transaction_at, transaction_id = cursor
+    # The redundant lower bound lets the (transaction_at, id) index seek instead of scanning.
+    return queryset.filter(transaction_at__gte=transaction_at).filter(
+        Q(transaction_at__gt=transaction_at) | Q(id__gt=transaction_id)
+    )
+
+
+def ordered_rows(querysets, cursor=None, limit=None, chunk_size=None, key=itemgetter('transaction_at', 'id')):
+    """Return an iterator over the rows of the querysets merged in (transaction_at, id) order, after the cursor.
+
+    Each queryset is read along its own (transaction_at, id) order, at most limit
+    rows of it and with a server side cursor when chunk_size is given, so the hot
+    and the archived transactions are read as a single sequence. key returns the
+    (transaction_at, id) of a row.
+    """
+
+    iterators = []
+    for queryset in querysets:
+        queryset = after_cursor(queryset, cursor)
+        if limit is not None:
+            queryset = queryset[:limit]
+        iterators.append(queryset.iterator(chunk_size=chunk_size) if chunk_size else iter(queryset))
+    if len(iterators) == 1:
+        return iterators[0]
+    return heapq.merge(*iterators, key=key)
+
+
+def paginate(querysets, limit, cursor=None):
+    """Return one page of rows of the querysets and the token of the next page (None on the last page).
+
+    The querysets must be values() querysets including 'id' and 'transaction_at'.
+    """
+
+    rows = list(islice(ordered_rows(querysets, cursor, limit + 1), limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['transaction_at'], rows[-1]['id'])
+
+
+def stream_results(querysets, chunk_size, cursor=None):
+    """Yield a {"results": [...]} json document chunk by chunk, using server side cursors."""
+
+    rows = ordered_rows(querysets, cursor, chunk_size=chunk_size)
+    yield b'{"results":['
+    separator = b''
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        # Each chunk is encoded at once, without the brackets of its list.
+        yield separator + dumps(chunk)[1:-1]
+        separator = b','
+    yield b']}'
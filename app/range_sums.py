@@ -0,0 +1,323 @@
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .fields import from_cents, to_cents
+from .models import ArchivedBudget, Budget, Category, DailyRollup, RangeSumsGeneration
+
+
+GENERATION_ID = 1
+# Days after the last transaction, or today, covered by a loaded index without reloading it.
+SPARE_DAYS = 3660
+
+logger = logging.getLogger(__name__)
+
+_range_sums = None
+_loader = None
+# Counts the clears, so that a load started before one does not bring back its trees.
+_clears = 0
+_lock = threading.Lock()
+
+
+class RangeSums:
+    """Fenwick trees of the income and expenses sums (in cents) and counts per day.
+
+    Position i holds the totals of first_day + i - 1, so the totals of any date range
+    are the difference of two prefix sums, each adding up log2(size) nodes.
+    """
+
+    def __init__(self, first_day, size, daily_totals, generation):
+        self.first_day = first_day
+        self.size = size
+        self.generation = generation
+        self.checked_at = time.monotonic()
+        self.trees = [[0] * (size + 1) for _ in range(4)]
+        for day, totals in daily_totals.items():
+            for tree, value in zip(self.trees, totals):
+                tree[(day - first_day).days + 1] += value
+        # Each node adds itself to its parent, building the trees in linear time.
+        for tree in self.trees:
+            for position in range(1, size + 1):
+                parent = position + (position & -position)
+                if parent <= size:
+                    tree[parent] += tree[position]
+
+    def covers(self, day):
+        return 0 <= (day - self.first_day).days < self.size
+
+    def add(self, day, deltas):
+        position = (day - self.first_day).days + 1
+        while position <= self.size:
+            for tree, delta in zip(self.trees, deltas):
+                tree[position] += delta
+            position += position & -position
+
+    def prefix_totals(self, position):
+        income_sum = income_count = expenses_sum = expenses_count = 0
+        income_sums, income_counts, expenses_sums, expenses_counts = self.trees
+        while position > 0:
+            income_sum += income_sums[position]
+            income_count += income_counts[position]
+            expenses_sum += expenses_sums[position]
+            expenses_count += expenses_counts[position]
+            position -= position & -position
+        return income_sum, income_count, expenses_sum, expenses_count
+
+    def range_totals(self, start_date, end_date):
+        """Return the (income cents, income count, expenses cents, expenses count) of a date range, both inclusive."""
+
+        start = max((start_date - self.first_day).days, 0)
+        end = min((end_date - self.first_day).days + 1, self.size)
+        if start >= end:
+            return 0, 0, 0, 0
+        return tuple(
+            total - before for total, before in zip(self.prefix_totals(end), self.prefix_totals(start))
+        )
+
+    def daily_totals(self):
+        """Return {day: (income cents, income count, expenses cents, expenses count)} of the days with totals."""
+
+        daily_totals = {}
+        previous = (0, 0, 0, 0)
+        for position in range(1, self.size + 1):
+            totals = self.prefix_totals(position)
+            if totals != previous:
+                daily_totals[self.first_day + datetime.timedelta(days=position - 1)] = tuple(
+                    total - before for total, before in zip(totals, previous)
+                )
+            previous = totals
+        return daily_totals
+
+
+def _database():
+    return router.db_for_write(DailyRollup)
+
+
+def _read_generation():
+    generation = RangeSumsGeneration.objects.using(_database()).filter(id=GENERATION_ID).values_list('generation', flat=True)
+    return generation.first() or 0
+
+
+def _read_daily_totals():
+    rows = DailyRollup.objects.using(_database()).values('day').annotate(
+        income_sum=Sum('income_sum'), income_count=Sum('income_count'),
+        expenses_sum=Sum('expenses_sum'), expenses_count=Sum('expenses_count')
+    ).order_by()
+    return {
+        row['day']: (to_cents(row['income_sum']), row['income_count'], to_cents(row['expenses_sum']), row['expenses_count'])
+        for row in rows.iterator()
+    }
+
+
+def load_range_sums():
+    """Build the range sums from the daily rollups of the primary, or return None if writes kept changing them.
+
+    The generation is read before and after the rollups: when both match, no write
+    committed in between, so the index holds exactly the writes of that generation.
+    """
+
+    for _ in range(3):
+        generation = _read_generation()
+        daily_totals = _read_daily_totals()
+        if _read_generation() != generation:
+            continue
+        first_day = min(daily_totals, default=timezone.localdate())
+        last_day = max([timezone.localdate(), *daily_totals]) + datetime.timedelta(days=SPARE_DAYS)
+        return RangeSums(first_day, (last_day - first_day).days + 1, daily_totals, generation)
+    return None
+
+
+def _load_in_background(clears):
+    global _range_sums
+
+    try:
+        loaded = load_range_sums()
+    except Exception:
+        logger.exception('loading the range sums failed')
+        loaded = None
+    finally:
+        connections.close_all()
+    if loaded is None:
+        return
+    with _lock:
+        # A write of this process may have brought the current index further meanwhile.
+        if _clears == clears and (_range_sums is None or _range_sums.generation < loaded.generation):
+            _range_sums = loaded
+
+
+def _start_loading():
+    global _loader
+
+    with _lock:
+        if _loader is None or not _loader.is_alive():
+            _loader = threading.Thread(target=_load_in_background, args=(_clears,), name='range-sums-loader', daemon=True)
+            _loader.start()
+
+
+def _current_range_sums(check_interval):
+    range_sums = _range_sums
+    if range_sums is not None and time.monotonic() - range_sums.checked_at < check_interval:
+        return range_sums
+    if range_sums is not None and _read_generation() == range_sums.generation:
+        range_sums.checked_at = time.monotonic()
+        return range_sums
+    # Loading reads every rollup, which would stall the request on every write of
+    # another worker: it runs in a thread while the request queries its date range.
+    _start_loading()
+    return None
+
+
+def get_range_sums(start_date, end_date):
+    """Return the income and expenses totals of a date range like rollups.get_range_totals, from memory.
+
+    Returns None when the index is disabled or can not be used: inside atomic blocks,
+    whose own uncommitted writes it does not hold yet, or while it is loaded in the
+    background, first or after writes of other workers. Those are seen within
+    RANGE_SUMS_CHECK_INTERVAL seconds, or right away with the response cache on, which
+    would keep a sum missing them for RESPONSE_CACHE_TIMEOUT seconds.
+    """
+
+    if not settings.RANGE_SUMS_INDEX or connections[_database()].in_atomic_block:
+        return None
+    range_sums = _current_range_sums(0 if settings.RESPONSE_CACHE_TIMEOUT else settings.RANGE_SUMS_CHECK_INTERVAL)
+    if range_sums is None:
+        return None
+    with _lock:
+        income_sum, income_count, expenses_sum, expenses_count = range_sums.range_totals(start_date, end_date)
+    return {
+        'income_sum': from_cents(income_sum),
+        'income_count': income_count,
+        'expenses_sum': from_cents(expenses_sum),
+        'expenses_count': expenses_count
+    }
+
+
+def bump_generation():
+    """Add one to the generation of the daily totals and return it. Must run in the same transaction as the change."""
+
+    connection = connections[router.db_for_write(RangeSumsGeneration)]
+    generation = RangeSumsGeneration.objects.filter(id=GENERATION_ID)
+    if connection.vendor == 'sqlite' and sqlite3.sqlite_version_info < (3, 35):
+        if generation.update(generation=F('generation') + 1):
+            # The row stays locked by this transaction, so the value is the one it wrote.
+            return generation.values_list('generation', flat=True).get()
+    else:
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE {0} SET {1} = {1} + 1 WHERE {2} = %s RETURNING {1}'.format(
+                quote_name(RangeSumsGeneration._meta.db_table), quote_name('generation'), quote_name('id')
+            ), [GENERATION_ID])
+            row = cursor.fetchone()
+        if row is not None:
+            return row[0]
+    try:
+        with transaction.atomic():
+            RangeSumsGeneration.objects.create(id=GENERATION_ID, generation=1)
+            return 1
+    except IntegrityError:
+        # Another worker created the row in the meantime.
+        return bump_generation()
+
+
+def record_range_changes(day_deltas):
+    """Bump the generation and add {day: (income cents, income count, expenses cents, expenses count)} deltas
+    to the range sums of this process once the current transaction commits.
+
+    The deltas are only added to an index at the generation just before, otherwise it
+    missed the writes of another worker and is dropped to be loaded again.
+    """
+
+    if not day_deltas:
+        return
+    generation = bump_generation()
+
+    def apply():
+        global _range_sums
+
+        with _lock:
+            if _range_sums is None:
+                return
+            if _range_sums.generation != generation - 1 or not all(_range_sums.covers(day) for day in day_deltas):
+                _range_sums = None
+                return
+            for day, deltas in day_deltas.items():
+                _range_sums.add(day, deltas)
+            _range_sums.generation = generation
+
+    transaction.on_commit(apply)
+
+
+def invalidate_range_sums():
+    """Make every worker load its range sums again once the current transaction commits."""
+
+    bump_generation()
+    transaction.on_commit(clear_range_sums)
+
+
+def clear_range_sums():
+    """Drop the range sums of this process."""
+
+    global _range_sums, _clears
+
+    with _lock:
+        _range_sums = None
+        _clears += 1
+
+
+def compute_daily_totals():
+    """Return {day: (income cents, income count, expenses cents, expenses count)} from the Budget table and the archive."""
+
+    daily_totals = {}
+    for model in (Budget, ArchivedBudget):
+        rows = model.objects.values_list('transaction_at').annotate(
+            income_sum=Sum('amount', filter=Q(amount__gt=0)),
+            income_count=Count('id', filter=Q(amount__gt=0)),
+            expenses_sum=Sum('amount', filter=Q(amount__lte=0)),
+            expenses_count=Count('id', filter=Q(amount__lte=0))
+        ).order_by()
+        for day, income_sum, income_count, expenses_sum, expenses_count in rows.iterator():
+            totals = (to_cents(income_sum or 0), income_count, to_cents(expenses_sum or 0), expenses_count)
+            daily_totals[day] = tuple(map(sum, zip(daily_totals.get(day, (0, 0, 0, 0)), totals)))
+    return daily_totals
+
+
+def find_range_sums_drift():
+    """Return {day: (indexed, actual)} for the days whose totals in the range sums of this process
+    differ from the Budget table and the archive, loading the range sums if needed.
+
+    Both are (income cents, income count, expenses cents, expenses count) tuples. The
+    trees of other processes are out of reach: run from a management command, the range
+    sums are loaded from the rollups, so the rollups are checked and not the deltas the
+    running workers added to their trees. Those drop their trees and load the rollups
+    again after every write of another worker, or after the --fix of check_range_sums.
+    """
+
+    range_sums = _range_sums or load_range_sums()
+    if range_sums is None:
+        raise RuntimeError('the daily totals kept changing while loading the range sums')
+    empty = (0, 0, 0, 0)
+    with _lock:
+        indexed_totals = range_sums.daily_totals()
+    actual_totals = compute_daily_totals()
+    return {
+        day: (indexed_totals.get(day, empty), actual_totals.get(day, empty))
+        for day in indexed_totals.keys() | actual_totals.keys()
+        if indexed_totals.get(day, empty) != actual_totals.get(day, empty)
+    }
+
+
+def category_deleted(sender, instance, **kwargs):
+    # The rollups of the category are deleted along with it.
+    invalidate_range_sums()
+
+
+def connect_signals():
+    post_delete.connect(category_deleted, sender=Category, dispatch_uid='range_sums_category_deleted')
@@ -0,0 +1,82 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+# Alias the reads of the current request go to, None for the primary.
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+# Alias of each replica found unavailable and when to try it again.
+_unavailable_until = {}
+_unavailable_lock = threading.Lock()
+
+
+def current_read_alias():
+    """Return the replica alias the reads of the current request go to, or None for the primary."""
+
+    return _read_alias.get()
+
+
+def use_replica(alias):
+    """Send the reads of the current context to alias (None for the primary), return a token for reset_replica."""
+
+    return _read_alias.set(alias)
+
+
+def reset_replica(token):
+    _read_alias.reset(token)
+
+
+def mark_unavailable(alias):
+    with _unavailable_lock:
+        _unavailable_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def choose_replica():
+    """Return the alias of a reachable replica, or None to read from the primary.
+
+    Replicas are tried in random order. One which can not be connected to is skipped
+    for REPLICA_RETRY_SECONDS, when every replica is down the primary serves the reads.
+    """
+
+    now = time.monotonic()
+    aliases = [alias for alias in settings.DATABASE_REPLICAS if _unavailable_until.get(alias, 0) <= now]
+    random.shuffle(aliases)
+    for alias in aliases:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            logger.warning('replica %s is unavailable, reading from the primary', alias, exc_info=True)
+            mark_unavailable(alias)
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """Database router sending the reads of the requests chosen by ReplicaMiddleware to a replica.
+
+    Everything else, writes and the reads of the write requests, of the requests
+    following a write and of management commands, goes to the primary ('default').
+    Replicas are never migrated, they copy the schema of the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,166 @@
+import datetime
+
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+
+from .archive import overlaps_archive
+from .fields import from_cents, to_cents
+from .models import ArchivedBudget, Budget, DailyRollup
+
+
+INCOME = Q(amount__gt=0)
+EXPENSES = Q(amount__lte=0)
+
+SUMMARY_GROUPS = {
+    'category': F('category__type'),
+    'day': TruncDay('transaction_at'),
+    'week': TruncWeek('transaction_at'),
+    'month': TruncMonth('transaction_at'),
+}
+
+
+def summary_aggregates():
+    """Return the aggregates of a summary, income and expenses are split with conditional aggregation."""
+
+    return {
+        'income': Sum('amount', filter=INCOME),
+        'income_count': Count('id', filter=INCOME),
+        'expenses': Sum('amount', filter=EXPENSES),
+        'expenses_count': Count('id', filter=EXPENSES),
+        'net': Sum('amount'),
+        'count': Count('id'),
+        'min': Min('amount'),
+        'max': Max('amount'),
+        # In cents, an integer output field would truncate it.
+        'avg': Avg('amount'),
+    }
+
+
+def _rounded_average(row):
+    if row['avg'] is not None:
+        row['avg'] = round(from_cents(row['avg']), 2)
+    return row
+
+
+def _add_summaries(row, other):
+    """Add the aggregates of the same summary computed over archived transactions to a summary row."""
+
+    for field in ('income', 'expenses', 'net'):
+        if other[field] is not None:
+            row[field] = from_cents(to_cents(row[field] or 0) + to_cents(other[field]))
+    for field in ('income_count', 'expenses_count', 'count'):
+        row[field] += other[field]
+    row['min'] = min(filter(lambda value: value is not None, [row['min'], other['min']]), default=None)
+    row['max'] = max(filter(lambda value: value is not None, [row['max'], other['max']]), default=None)
+    row['avg'] = round(from_cents(to_cents(row['net']) / row['count']), 2) if row['count'] else None
+    return row
+
+
+def get_summary(start_date, end_date, group_by=None):
+    """Return the summary of a date range (both inclusive) in a single query, two when the range is partly archived.
+
+    Without group_by a single dict is returned, otherwise a list of dicts ordered
+    by the group, which is one of SUMMARY_GROUPS.
+    """
+
+    models = [Budget, ArchivedBudget] if overlaps_archive(start_date, end_date) else [Budget]
+    summaries = []
+    for model in models:
+        transactions = model.objects.filter(transaction_at__range=(start_date, end_date))
+        if group_by is None:
+            summaries.append(_rounded_average(transactions.aggregate(**summary_aggregates())))
+            continue
+        # Grouped under an alias, 'category' would clash with the model field.
+        rows = transactions.values(group=SUMMARY_GROUPS[group_by]).annotate(**summary_aggregates()).order_by('group')
+        summaries.append({row.pop('group'): _rounded_average(row) for row in rows})
+
+    summary = summaries[0]
+    for archived_summary in summaries[1:]:
+        if group_by is None:
+            summary = _add_summaries(summary, archived_summary)
+            continue
+        for group, row in archived_summary.items():
+            summary[group] = _add_summaries(summary[group], row) if group in summary else row
+    if group_by is None:
+        return summary
+    groups = sorted(summary.items()) if len(summaries) > 1 else summary.items()
+    return [{group_by: group, **row} for group, row in groups]
+
+
+# Rollups already hold one row per day, so days need no truncation.
+SERIES_INTERVALS = {
+    'day': F,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def bucket_start(day, interval):
+    """Return the first day of the bucket a date belongs to, like the Trunc functions do."""
+
+    if interval == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    if interval == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def count_buckets(start_date, end_date, interval):
+    """Return the number of buckets between two dates (both inclusive) without listing them."""
+
+    if start_date > end_date:
+        return 0
+    if interval == 'week':
+        return (bucket_start(end_date, interval) - bucket_start(start_date, interval)).days // 7 + 1
+    if interval == 'month':
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    if interval == 'year':
+        return end_date.year - start_date.year + 1
+    return (end_date - start_date).days + 1
+
+
+def iter_buckets(start_date, end_date, interval):
+    """Yield the first day of every bucket between two dates (both inclusive)."""
+
+    bucket = bucket_start(start_date, interval)
+    while bucket <= end_date:
+        yield bucket
+        try:
+            if interval == 'day':
+                bucket += datetime.timedelta(days=1)
+            elif interval == 'week':
+                bucket += datetime.timedelta(days=7)
+            elif interval == 'month':
+                bucket = bucket.replace(year=bucket.year + bucket.month // 12, month=bucket.month % 12 + 1)
+            else:
+                bucket = bucket.replace(year=bucket.year + 1)
+        except (OverflowError, ValueError):
+            # The next bucket would start after datetime.date.max.
+            return
+
+
+def get_series(start_date, end_date, interval, category=None):
+    """Return income and expenses per bucket of a date range as parallel lists, with empty buckets as 0.
+
+    The sums come from the daily rollups in a single query.
+    """
+
+    rollups = DailyRollup.objects.filter(day__range=(start_date, end_date))
+    if category:
+        rollups = rollups.filter(category__type=category)
+    rows = rollups.values(bucket=SERIES_INTERVALS[interval]('day')).annotate(
+        income=Sum('income_sum'),
+        expenses=Sum('expenses_sum'),
+    ).values_list('bucket', 'income', 'expenses')
+    totals = {bucket: (income, expenses) for bucket, income, expenses in rows}
+
+    series = {'dates': [], 'income': [], 'expenses': []}
+    for bucket in iter_buckets(start_date, end_date, interval):
+        income, expenses = totals.get(bucket, (0, 0))
+        series['dates'].append(bucket.isoformat())
+        series['income'].append(income)
+        series['expenses'].append(expenses)
+    return series
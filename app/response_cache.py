@@ -0,0 +1,178 @@
+import datetime
+import hashlib
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .categories import get_category_ids
+from .models import Category
+
+
+VERSION_CACHE_KEY = 'app:responses:version:{}:{}'
+# Bumped by every write, and by clear_responses, apart from the coverage versions.
+WRITES_VERSION_KEY = 'app:responses:version:writes'
+CLEARS_VERSION_KEY = 'app:responses:version:clears'
+# Coverages spanning more months depend on the writes of all of them.
+MAX_COVERED_MONTHS = 24
+
+# What a cached response depends on: a category type (None for all of them) and an
+# inclusive date range (None for an open end). A write on a date and category only
+# drops the responses whose coverage contains both.
+Coverage = namedtuple('Coverage', ['category', 'first_date', 'last_date'])
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def response_cache_key(view_name, request, view_kwargs):
+    """Return the cache key of a request, independent of the order of the query params."""
+
+    params = sorted((key, sorted(values)) for key, values in request.GET.lists())
+    raw_key = repr((sorted(view_kwargs.items()), params))
+    return f'app:responses:{view_name}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+
+def _version_key(category, day=None):
+    # Category types are hashed, as some cache backends do not accept any character in keys.
+    category = hashlib.md5(category.encode()).hexdigest() if category else '*'
+    return VERSION_CACHE_KEY.format(category, '*' if day is None else f'{day.year:04}-{day.month:02}')
+
+
+def version_keys(coverage):
+    """Return the keys of the version counters a response with this coverage depends on."""
+
+    first_date, last_date = coverage.first_date, coverage.last_date
+    if first_date is None or last_date is None or first_date > last_date:
+        return [_version_key(coverage.category), CLEARS_VERSION_KEY]
+    months = (last_date.year - first_date.year) * 12 + last_date.month - first_date.month + 1
+    if months > MAX_COVERED_MONTHS:
+        return [_version_key(coverage.category), CLEARS_VERSION_KEY]
+    keys = [CLEARS_VERSION_KEY]
+    month = first_date.replace(day=1)
+    for _ in range(months):
+        keys.append(_version_key(coverage.category, month))
+        month = (month + datetime.timedelta(days=31)).replace(day=1)
+    return keys
+
+
+def _new_version():
+    # Counters evicted by the cache start again from a value they never had before,
+    # so that the responses stored with their old value do not become valid again.
+    return time.time_ns()
+
+
+def _read_versions(keys):
+    response_cache = get_response_cache()
+    versions = response_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            response_cache.add(key, _new_version(), timeout=None)
+    missing_keys = [key for key in keys if key not in versions]
+    if missing_keys:
+        versions.update(response_cache.get_many(missing_keys))
+    return versions
+
+
+def _bump_version(key):
+    response_cache = get_response_cache()
+    try:
+        response_cache.incr(key)
+    except ValueError:
+        # Missing or evicted, unless another process added it meanwhile.
+        if not response_cache.add(key, _new_version(), timeout=None):
+            _bump_version(key)
+
+
+def get_response(key):
+    """Return the cached response entry of a key, or None, and the writes version to store a new one with.
+
+    The writes version is read before the response is built, so that a response built
+    while a write committed is not stored.
+    """
+
+    response_cache = get_response_cache()
+    values = response_cache.get_many([key, WRITES_VERSION_KEY])
+    writes_version = values.get(WRITES_VERSION_KEY)
+    if writes_version is None:
+        writes_version = _read_versions([WRITES_VERSION_KEY])[WRITES_VERSION_KEY]
+    cached = values.get(key)
+    if cached is not None:
+        versions, entry = cached
+        if _read_versions(list(versions)) == versions:
+            return entry, writes_version
+    return None, writes_version
+
+
+def store_response(key, entry, coverage, writes_version, timeout=None):
+    """Cache a response entry along with the versions of what it covers.
+
+    A write bumps the versions of its date and category, which turns the entries
+    stored with the previous ones stale, in every process sharing the cache.
+    """
+
+    keys = version_keys(coverage)
+    versions = _read_versions(keys + [WRITES_VERSION_KEY])
+    if versions.pop(WRITES_VERSION_KEY) != writes_version:
+        return
+    response_cache = get_response_cache()
+    response_cache.set(key, (versions, entry), timeout=settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout)
+
+
+def _category_types(category_ids):
+    known_types = {category_id: type for type, category_id in get_category_ids().items()}
+    unknown_ids = set(category_ids) - known_types.keys()
+    if unknown_ids:
+        known_types.update(Category.objects.filter(id__in=unknown_ids).values_list('id', 'type'))
+    return known_types
+
+
+def invalidate_responses(changes):
+    """Drop the cached responses covering any of the (day, category_id) changes."""
+
+    changes = set(changes)
+    if not changes:
+        return
+    category_types = _category_types(category_id for _, category_id in changes)
+    keys = set()
+    for day, category_id in changes:
+        for category in {category_types.get(category_id), None}:
+            keys.add(_version_key(category, day))
+            keys.add(_version_key(category))
+    # The writes version goes first, so that a response built before the write and
+    # stored after its other versions were bumped is not stored with them.
+    _bump_version(WRITES_VERSION_KEY)
+    for key in sorted(keys):
+        _bump_version(key)
+
+
+def invalidate_responses_on_commit(changes):
+    """Drop the covering cached responses once the current transaction commits.
+
+    Dropping them earlier would let a concurrent request cache the old rows again.
+    """
+
+    changes = set(changes)
+    transaction.on_commit(lambda: invalidate_responses(changes))
+
+
+def clear_responses():
+    """Drop every cached response."""
+
+    _bump_version(WRITES_VERSION_KEY)
+    _bump_version(CLEARS_VERSION_KEY)
+
+
+def category_changed(sender, instance, created=False, **kwargs):
+    # Renamed or deleted categories change responses filtered by their type.
+    if not created:
+        transaction.on_commit(clear_responses)
+
+
+def connect_signals():
+    post_save.connect(category_changed, sender=Category, dispatch_uid='response_cache_category_saved')
+    post_delete.connect(category_changed, sender=Category, dispatch_uid='response_cache_category_deleted')
@@ -0,0 +1,132 @@
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .fields import cents_amount, from_cents, to_cents
+from .models import ArchivedBudget, Budget, DailyRollup
+from .range_sums import get_range_sums, invalidate_range_sums
+
+
+def rollup_fields(amount):
+    """Return the sum and count fields of the rollup that the given amount belongs to."""
+
+    if amount > 0:
+        return 'income_sum', 'income_count'
+    return 'expenses_sum', 'expenses_count'
+
+
+def apply_rollup_delta(day, category_id, fields, cents_delta, count_delta):
+    """Add the deltas to the given rollup fields of a day and category, creating the row if needed."""
+
+    sum_field, count_field = fields
+    rollup_query = DailyRollup.objects.filter(day=day, category_id=category_id)
+    changes = {sum_field: F(sum_field) + cents_delta, count_field: F(count_field) + count_delta}
+    if rollup_query.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(
+                day=day, category_id=category_id, **{sum_field: cents_amount(cents_delta), count_field: count_delta}
+            )
+    except IntegrityError:
+        # Another worker created the row in the meantime.
+        rollup_query.update(**changes)
+
+
+ROLLUP_FIELDS = ('income_sum', 'income_count', 'expenses_sum', 'expenses_count')
+
+
+def apply_rollup_deltas(deltas, batch_size=1000):
+    """Add the deltas of many rollup rows, given as {(day, category_id): {field: delta}}.
+
+    Missing rows are created empty with one insert per batch, then a single
+    executemany statement adds the deltas of every row. Building one ORM update
+    per row, or a CASE over all of them, costs more in Python than the queries.
+    """
+
+    DailyRollup.objects.bulk_create(
+        [DailyRollup(day=day, category_id=category_id) for day, category_id in deltas],
+        batch_size=batch_size, ignore_conflicts=True
+    )
+    connection = connections[router.db_for_write(DailyRollup)]
+    quote_name = connection.ops.quote_name
+    update_sql = 'UPDATE {} SET {} WHERE {} = %s AND {} = %s'.format(
+        quote_name(DailyRollup._meta.db_table),
+        ', '.join(f'{quote_name(field)} = {quote_name(field)} + %s' for field in ROLLUP_FIELDS),
+        quote_name('day'),
+        quote_name('category_id')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(update_sql, [
+            [field_deltas.get(field, 0) for field in ROLLUP_FIELDS]
+            + [connection.ops.adapt_datefield_value(day), category_id]
+            for (day, category_id), field_deltas in deltas.items()
+        ])
+
+
+def get_range_totals(start_date, end_date):
+    """Return income and expenses totals of a date range (both inclusive), from the range sums in memory when
+    they can be used and from the rollups otherwise."""
+
+    range_totals = get_range_sums(start_date, end_date)
+    if range_totals is not None:
+        return range_totals
+    return DailyRollup.objects.filter(day__range=(start_date, end_date)).aggregate(
+        income_sum=Sum('income_sum'),
+        income_count=Sum('income_count'),
+        expenses_sum=Sum('expenses_sum'),
+        expenses_count=Sum('expenses_count')
+    )
+
+
+def _daily_totals(queryset):
+    return queryset.values('transaction_at', 'category').annotate(
+        income_sum=Sum('amount', filter=Q(amount__gt=0)),
+        income_count=Count('id', filter=Q(amount__gt=0)),
+        expenses_sum=Sum('amount', filter=Q(amount__lte=0)),
+        expenses_count=Count('id', filter=Q(amount__lte=0))
+    ).order_by()
+
+
+def _all_daily_totals():
+    """Yield the totals of each day and category of the Budget table and the archive."""
+
+    # Transactions added with an old date after archiving share days with the archive.
+    archived_totals = {
+        (totals['transaction_at'], totals['category']): totals
+        for totals in _daily_totals(ArchivedBudget.objects.all()).iterator()
+    }
+    for totals in _daily_totals(Budget.objects.all()).iterator():
+        archived = archived_totals.pop((totals['transaction_at'], totals['category']), None)
+        if archived is not None:
+            for field in ('income_sum', 'expenses_sum'):
+                totals[field] = from_cents(to_cents(totals[field] or 0) + to_cents(archived[field] or 0))
+            for field in ('income_count', 'expenses_count'):
+                totals[field] += archived[field]
+        yield totals
+    yield from archived_totals.values()
+
+
+def backfill_rollups(batch_size=1000):
+    """Rebuild all the rollups from the Budget table and the archive and return the number of rows created."""
+
+    created = 0
+    with transaction.atomic():
+        DailyRollup.objects.all().delete()
+        batch = []
+        for totals in _all_daily_totals():
+            batch.append(DailyRollup(
+                day=totals['transaction_at'],
+                category_id=totals['category'],
+                income_sum=totals['income_sum'] or 0,
+                income_count=totals['income_count'],
+                expenses_sum=totals['expenses_sum'] or 0,
+                expenses_count=totals['expenses_count']
+            ))
+            if len(batch) >= batch_size:
+                DailyRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DailyRollup.objects.bulk_create(batch)
+        created += len(batch)
+        invalidate_range_sums()
+    return created
@@ -0,0 +1,129 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from app.archive import archive_transactions, clear_archive_bounds, overlaps_archive
+from app.category_totals import find_category_drift
+from app.ledger import compute_balance, get_ledger
+from app.models import ArchivedBudget, ArchiveTotals, Budget
+from app.rollups import backfill_rollups
+
+
+@override_settings(ARCHIVE_AFTER_DAYS=365, ARCHIVE_BOUNDS_CHECK_INTERVAL=0)
+class TestArchive(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        self.obj.post(reverse('add_bulk_transactions'), [
+            {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-05'},
+            {'amount': -40.5, 'category': 'rent', 'transaction_at': '2021-01-10'},
+            {'amount': -10, 'category': 'general', 'transaction_at': '2021-01-20'},
+            {'amount': 30, 'category': 'general', 'transaction_at': '2021-02-15'},
+            {'amount': -5, 'category': 'rent', 'transaction_at': '2021-03-01'}
+        ], content_type='application/json')
+
+    def tearDown(self):
+        clear_archive_bounds()
+
+    def get(self, name, data):
+        return json.loads(self.obj.get(reverse(name), data).content)
+
+    def summaries(self):
+        dates = {'start_date': '2021-01-01', 'end_date': '2021-12-31'}
+        return self.get('get_summary_from_dates', dates), self.get('get_summary_from_dates', {**dates, 'group_by': 'category'})
+
+
+    def test_archiving_moves_old_rows_and_keeps_every_total(self):
+        balance = self.get('get_balance', {})
+        income = self.get('get_income_sum_from_dates', {'start_date': '2021-01-01', 'end_date': '2021-12-31'})
+
+        moved = archive_transactions(datetime.date(2021, 2, 1), batch_size=2)
+
+        self.assertEquals((moved, Budget.objects.count(), ArchivedBudget.objects.count()), (3, 2, 3))
+        self.assertEquals(
+            list(ArchiveTotals.objects.order_by('category__type').values_list(
+                'year', 'category__type', 'income_sum', 'income_count', 'expenses_sum', 'expenses_count', 'first_date', 'last_date'
+            )),
+            [
+                (2021, 'general', 100.0, 1, -10.0, 1, datetime.date(2021, 1, 5), datetime.date(2021, 1, 20)),
+                (2021, 'rent', 0.0, 0, -40.5, 1, datetime.date(2021, 1, 10), datetime.date(2021, 1, 10))
+            ]
+        )
+        self.assertEquals(self.get('get_balance', {}), balance)
+        self.assertEquals(compute_balance(), (get_ledger().amount, get_ledger().transactions_count))
+        self.assertEquals(find_category_drift(), {})
+        backfill_rollups()
+        self.assertEquals(self.get('get_income_sum_from_dates', {'start_date': '2021-01-01', 'end_date': '2021-12-31'}), income)
+
+
+    def test_transactions_listing_reads_archive_only_when_dates_overlap(self):
+        archive_transactions(datetime.date(2021, 2, 1))
+
+        first_page = self.get('get_filtered_transactions', {'limit': 2})
+        second_page = self.get('get_filtered_transactions', {'limit': 2, 'cursor': first_page['next']})
+        third_page = self.get('get_filtered_transactions', {'limit': 2, 'cursor': second_page['next']})
+        filtered = self.get('get_filtered_transactions', {'categories': 'general', 'max_amount': 50})
+
+        self.assertEquals(
+            [result['transaction_at'] for page in (first_page, second_page, third_page) for result in page['results']],
+            ['2021-01-05', '2021-01-10', '2021-01-20', '2021-02-15', '2021-03-01']
+        )
+        self.assertEquals([result['amount'] for result in filtered['results']], [-10.0, 30.0])
+        self.assertTrue(overlaps_archive(datetime.date(2021, 1, 20), None))
+        self.assertFalse(overlaps_archive(datetime.date(2021, 1, 21), None))
+        with self.assertNumQueries(2):
+            self.obj.get(reverse('get_filtered_transactions'), {'start_date': '2021-02-01'})
+        with override_settings(ARCHIVE_AFTER_DAYS=0):
+            self.assertEquals(len(self.get('get_filtered_transactions', {'end_date': '2021-01-31'})['results']), 3)
+            self.assertEquals(self.get('get_summary_from_dates', {'start_date': '2021-01-01', 'end_date': '2021-01-31'})['count'], 3)
+
+
+    def test_summary_and_export_include_archived_transactions(self):
+        summaries = self.summaries()
+        export = b''.join(self.obj.get(reverse('export_transactions')).streaming_content)
+
+        archive_transactions(datetime.date(2021, 2, 1))
+
+        self.assertEquals(self.summaries(), summaries)
+        self.assertEquals(b''.join(self.obj.get(reverse('export_transactions')).streaming_content), export)
+
+
+    def test_removing_the_newest_transaction_falls_back_to_archived_dates(self):
+        archive_transactions(datetime.date(2021, 2, 1))
+
+        self.obj.post(reverse('delete_transaction'), {'id': Budget.objects.get(amount=30).id}, content_type='application/json')
+
+        general = next(row for row in self.get('get_categories_totals', {})['results'] if row['category'] == 'general')
+        self.assertEquals((general['count'], general['last_transaction_at']), (2, '2021-01-20'))
+        self.assertEquals(find_category_drift(), {})
+
+
+    def test_archived_transactions_can_be_updated_and_deleted(self):
+        archive_transactions(datetime.date(2021, 2, 1))
+        archived = {row['amount']: row['id'] for row in self.get('get_filtered_transactions', {'end_date': '2021-01-31'})['results']}
+
+        update = self.obj.post(reverse('update_transaction'), {
+            'id': archived[100.0], 'amount': 120, 'category': 'general', 'transaction_at': '2021-01-05'
+        }, content_type='application/json')
+        delete = self.obj.post(reverse('delete_transaction'), {'id': archived[-40.5]}, content_type='application/json')
+        delete_bulk = self.obj.post(reverse('delete_bulk_transactions'), {'ids': [archived[-10.0]]}, content_type='application/json')
+
+        self.assertEquals(update.json()['message'], 'transaction general 120.0 of 2021-01-05 updated')
+        self.assertEquals(delete.json()['message'], 'transaction rent -40.5 of 2021-01-10 deleted')
+        self.assertEquals(delete_bulk.json()['deleted'], [archived[-10.0]])
+        self.assertEquals((Budget.objects.count(), ArchivedBudget.objects.count(), ArchiveTotals.objects.count()), (3, 0, 0))
+        self.assertEquals(compute_balance(), (get_ledger().amount, get_ledger().transactions_count))
+        self.assertEquals(find_category_drift(), {})
+
+
+    def test_archive_transactions_command(self):
+        call_command('archive_transactions', stdout=StringIO())
+
+        self.assertEquals((Budget.objects.count(), ArchivedBudget.objects.count()), (0, 5))
+        with override_settings(ARCHIVE_AFTER_DAYS=0), self.assertRaises(CommandError):
+            call_command('archive_transactions', stdout=StringIO())
@@ -0,0 +1,69 @@
+import json
+
+from django.test import TestCase, RequestFactory
+
+from app import async_views
+from app.models import Budget, Category
+from app.rollups import backfill_rollups
+from app.views_decorators import allowed_method
+
+
+class TestAsyncViews(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        category_obj = Category.objects.create(type='general')
+        Budget.objects.bulk_create(
+            [
+                Budget(amount=200, category=category_obj, transaction_at='2021-01-01'),
+                Budget(amount=-130, category=category_obj, transaction_at='2021-01-02')
+            ]
+        )
+        backfill_rollups()
+
+    async def test_get_balance_returns_balance(self):
+        response = await async_views.get_balance(self.factory.get('/'))
+
+        self.assertEquals(response.content.decode(), '{"balance":70.0}')
+
+
+    async def test_get_sum_from_dates_returns_right_total_expenses(self):
+        request = self.factory.get('/', {'start_date': '2021-01-01', 'end_date': '2021-01-31'})
+
+        response = await async_views.get_sum_from_dates(request, category='expenses')
+
+        self.assertEquals(response.content.decode(), '{"total_expenses":-130.0}')
+
+
+    async def test_get_summary_from_dates_returns_totals(self):
+        request = self.factory.get('/', {'start_date': '2021-01-01', 'end_date': '2021-01-31', 'group_by': 'day'})
+
+        response = await async_views.get_summary_from_dates(request)
+
+        response_data = json.loads(response.content)
+        self.assertEquals([row['net'] for row in response_data['results']], [200.0, -130.0])
+
+
+    async def test_get_filtered_transactions_paginates(self):
+        response = await async_views.get_filtered_transactions(self.factory.get('/', {'limit': 1}))
+
+        response_data = json.loads(response.content)
+        self.assertEquals(len(response_data['results']), 1)
+        self.assertIn('next', response_data)
+
+
+    async def test_get_filtered_transactions_rejects_streaming(self):
+        response = await async_views.get_filtered_transactions(self.factory.get('/', {'stream': 'true'}))
+
+        self.assertEquals(response.status_code, 400)
+
+
+    async def test_allowed_method_rejects_post_for_async_view(self):
+
+        @allowed_method('GET')
+        async def mocked_view(request):
+            return True
+
+        response = await mocked_view(self.factory.post('/'))
+
+        self.assertEquals(response.status_code, 405)
@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.categories import VERSION_CACHE_KEY, clear_category_cache, get_category_id, match_categories
+from app.models import Budget, Category
+
+
+class TestCategoryCache(TransactionTestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        clear_category_cache()
+
+    def tearDown(self):
+        clear_category_cache()
+
+    def test_get_category_id_is_served_from_cache(self):
+        category_obj = Category.objects.create(type='general')
+        get_category_id('general')
+
+        with CaptureQueriesContext(connection) as queries:
+            category_id = get_category_id('general')
+
+        self.assertEquals(category_id, category_obj.id)
+        self.assertEquals(len(queries), 0)
+
+
+    def test_get_category_id_creates_missing_category(self):
+        Category.objects.create(type='general')
+        get_category_id('general')
+
+        category_id = get_category_id('rent')
+
+        self.assertEquals(Category.objects.get(type='rent').id, category_id)
+        with CaptureQueriesContext(connection) as queries:
+            get_category_id('rent')
+        self.assertEquals(len(queries), 0)
+
+
+    def test_category_changes_evict_cache(self):
+        category_obj = Category.objects.create(type='general')
+        get_category_id('general')
+        category_obj.type = 'salary'
+        category_obj.save()
+
+        new_id = get_category_id('general')
+
+        self.assertNotEquals(new_id, category_obj.id)
+        self.assertEquals(get_category_id('salary'), category_obj.id)
+
+
+    def test_add_transaction_does_not_query_categories_when_cached(self):
+        get_category_id('general')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.obj.post(reverse('add_transaction'), {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-21'}, content_type='application/json')
+
+        self.assertFalse(any('"app_category"' in query['sql'] for query in queries.captured_queries))
+        self.assertEquals(Budget.objects.get().category.type, 'general')
+
+
+    @override_settings(CATEGORY_CACHE_SHARED_VERSION=True)
+    def test_shared_version_bump_reloads_cache(self):
+        get_category_id('general')
+        Category.objects.filter(type='general').update(type='salary')
+        cache.incr(VERSION_CACHE_KEY)
+
+        with CaptureQueriesContext(connection) as queries:
+            get_category_id('salary')
+
+        self.assertEquals(len(queries), 1)
+
+
+    def test_search_categories_returns_prefix_then_substring_matches(self):
+        for category_type in ('Groceries', 'gifts', 'general', 'savings', 'rent'):
+            Category.objects.create(type=category_type)
+
+        response1 = self.obj.get(reverse('search_categories'), {'q': 'G'})
+        response2 = self.obj.get(reverse('search_categories'), {'q': 'g', 'limit': 4})
+        response3 = self.obj.get(reverse('search_categories'), {'q': ''})
+
+        self.assertEquals(response1.content.decode(), '{"results":["general","gifts","Groceries","savings"]}')
+        self.assertEquals(response2.json()['results'], ['general', 'gifts', 'Groceries', 'savings'])
+        self.assertEquals(response3.status_code, 400)
+
+
+    def test_search_categories_is_served_from_memory_and_follows_writes(self):
+        Category.objects.create(type='general')
+        match_categories('ge', 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            matches = match_categories('ge', 10)
+        get_category_id('gear')
+        Category.objects.filter(type='general').get().delete()
+
+        self.assertEquals((matches, len(queries)), (['general'], 0))
+        self.assertEquals(match_categories('ge', 10), ['gear'])
+
@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from app.category_totals import find_category_drift
+from app.ledger import get_ledger
+from app.models import Budget, Category, CategoryTotals
+
+
+class TestCategoryTotals(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+
+    def post(self, name, data):
+        return self.obj.post(reverse(name), data, content_type='application/json')
+
+    def get_totals(self):
+        return {row['category']: row for row in json.loads(self.obj.get(reverse('get_categories_totals')).content)['results']}
+
+
+    def test_get_categories_totals_returns_every_category(self):
+        Category.objects.create(type='unused')
+        self.post('add_transaction', {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'})
+        self.post('add_transaction', {'amount': -40.5, 'category': 'general', 'transaction_at': '2021-01-03'})
+        self.post('add_transaction', {'amount': -10, 'category': 'rent', 'transaction_at': '2021-01-02'})
+
+        response = self.obj.get(reverse('get_categories_totals'))
+
+        self.assertEquals(response.content.decode(), (
+            '{"results":['
+            '{"category":"general","income":100.0,"expenses":-40.5,"count":2,"last_transaction_at":"2021-01-03"},'
+            '{"category":"rent","income":0.0,"expenses":-10.0,"count":1,"last_transaction_at":"2021-01-02"},'
+            '{"category":"unused","income":0.0,"expenses":0.0,"count":0,"last_transaction_at":null}]}'
+        ))
+
+
+    def test_write_views_keep_totals_in_sync(self):
+        self.post('add_transaction', {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'})
+        self.post('add_transaction', {'amount': 50, 'category': 'general', 'transaction_at': '2021-01-05'})
+        latest_id = Budget.objects.get(amount=50).id
+        self.post('update_transaction', {'id': latest_id, 'amount': -20, 'category': 'rent', 'transaction_at': '2021-01-04'})
+        self.post('add_bulk_transactions', [
+            {'amount': 5, 'category': 'general', 'transaction_at': '2021-01-02'},
+            {'amount': -5, 'category': 'food', 'transaction_at': '2021-01-07'}
+        ])
+        self.post('delete_transaction', {'id': Budget.objects.get(amount=-5).id})
+
+        totals = self.get_totals()
+
+        self.assertEquals(
+            [totals['general'][key] for key in ('income', 'expenses', 'count', 'last_transaction_at')],
+            [105.0, 0.0, 2, '2021-01-02']
+        )
+        self.assertEquals(totals['rent']['expenses'], -20.0)
+        self.assertEquals((totals['food']['count'], totals['food']['last_transaction_at']), (0, None))
+        self.assertEquals(find_category_drift(), {})
+
+
+    def test_deleting_a_category_removes_its_transactions_from_the_balance(self):
+        self.post('add_transaction', {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'})
+        self.post('add_transaction', {'amount': -40, 'category': 'rent', 'transaction_at': '2021-01-02'})
+
+        Category.objects.get(type='rent').delete()
+
+        self.assertEquals((get_ledger().amount, get_ledger().transactions_count), (100, 1))
+        self.assertEquals(list(self.get_totals()), ['general'])
+
+
+    def test_reconcile_category_totals_command_fixes_drift(self):
+        self.post('add_transaction', {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'})
+        Budget.objects.create(amount=7, category=Category.objects.get(type='general'), transaction_at='2021-02-01')
+        CategoryTotals.objects.filter(category__type='general').update(income_count=5)
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_category_totals', stdout=StringIO())
+        call_command('reconcile_category_totals', '--fix', stdout=StringIO())
+        call_command('reconcile_category_totals', stdout=StringIO())
+
+        totals = CategoryTotals.objects.get()
+        self.assertEquals((totals.income_sum, totals.income_count, str(totals.last_transaction_at)), (107, 2, '2021-02-01'))
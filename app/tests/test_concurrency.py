@@ -0,0 +1,181 @@
+import json
+import threading
+from decimal import Decimal
+
+from django.db import OperationalError, connection, connections, transaction as db_transaction
+from django.db.models import Sum
+from django.test import TransactionTestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from app.categories import clear_category_cache
+from app.db import is_lock_error
+from app.ledger import get_ledger
+from app.models import Budget, DailyRollup
+from app.rollups import backfill_rollups
+from app.views_decorators import retry_on_lock
+
+
+WORKERS = 8
+REQUESTS_PER_WORKER = 25
+
+
+def run_workers(target, workers=WORKERS):
+    """Run target(worker_number) in parallel threads, each with its own connection, and return the errors."""
+
+    errors = []
+    start = threading.Barrier(workers)
+
+    def run(worker_number):
+        try:
+            start.wait()
+            target(worker_number)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(worker_number,)) for worker_number in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+@override_settings(WRITE_RETRY_ATTEMPTS=50, RESPONSE_CACHE_TIMEOUT=0)
+class TestConcurrentWrites(TransactionTestCase):
+
+    def setUp(self):
+        self.client = Client()
+        clear_category_cache()
+
+    def tearDown(self):
+        clear_category_cache()
+
+    def post(self, client, name, data):
+        return client.post(reverse(name), json.dumps(data), content_type='application/json')
+
+    def assertAggregatesMatchTransactions(self):
+        budget_totals = Budget.objects.aggregate(amount=Sum('amount'))
+        ledger = get_ledger()
+        self.assertEquals(Decimal(str(ledger.amount)), budget_totals['amount'] or 0)
+        self.assertEquals(ledger.transactions_count, Budget.objects.count())
+        # Rollup rows emptied by the changes stay behind, the backfill does not create them.
+        rollups = DailyRollup.objects.exclude(income_count=0, expenses_count=0).order_by('day', 'category')
+        fields = ('day', 'category', 'income_sum', 'income_count', 'expenses_sum', 'expenses_count')
+        maintained_rollups = list(rollups.values_list(*fields))
+        backfill_rollups()
+        self.assertEquals(maintained_rollups, list(rollups.values_list(*fields)))
+
+
+    def test_concurrent_adds_are_all_saved(self):
+        def add(worker_number):
+            client = Client()
+            for request_number in range(REQUESTS_PER_WORKER):
+                response = self.post(client, 'add_transaction', {
+                    'amount': worker_number + 1, 'category': f'category{request_number % 3}', 'transaction_at': '2021-08-11'
+                })
+                assert response.status_code == 200, response.content
+
+        self.assertEquals(run_workers(add), [])
+        self.assertEquals(Budget.objects.count(), WORKERS * REQUESTS_PER_WORKER)
+        self.assertEquals(get_ledger().amount, REQUESTS_PER_WORKER * sum(range(1, WORKERS + 1)))
+        self.assertAggregatesMatchTransactions()
+
+
+    def test_concurrent_updates_of_the_same_transaction_are_not_lost(self):
+        self.post(self.client, 'add_transaction', {'amount': 1, 'category': 'rent', 'transaction_at': '2021-08-11'})
+        transaction_id = Budget.objects.get().id
+
+        def update(worker_number):
+            client = Client()
+            for request_number in range(REQUESTS_PER_WORKER):
+                response = self.post(client, 'update_transaction', {
+                    'id': transaction_id,
+                    'amount': worker_number * 100 + request_number - 50,
+                    'category': f'category{worker_number % 2}',
+                    'transaction_at': f'2021-08-{worker_number + 10}'
+                })
+                assert response.status_code == 200, response.content
+
+        self.assertEquals(run_workers(update), [])
+        self.assertAggregatesMatchTransactions()
+
+
+    def test_concurrent_updates_and_deletes_keep_the_aggregates(self):
+        for amount in range(-20, 20):
+            self.post(self.client, 'add_transaction', {'amount': amount, 'category': 'food', 'transaction_at': '2021-08-11'})
+        transaction_ids = list(Budget.objects.values_list('id', flat=True))
+
+        def write(worker_number):
+            client = Client()
+            for request_number in range(REQUESTS_PER_WORKER):
+                transaction_id = transaction_ids[(worker_number * 7 + request_number) % len(transaction_ids)]
+                if request_number % 5 == 4:
+                    response = self.post(client, 'delete_transaction', {'id': transaction_id})
+                else:
+                    response = self.post(client, 'update_transaction', {
+                        'id': transaction_id, 'amount': request_number - worker_number,
+                        'category': 'food', 'transaction_at': '2021-08-12'
+                    })
+                assert response.status_code == 200, response.content
+
+        self.assertEquals(run_workers(write), [])
+        self.assertAggregatesMatchTransactions()
+
+
+class TestRetryOnLock(TransactionTestCase):
+
+    def test_connections_wait_for_locks(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEquals(cursor.fetchone()[0], 5000)
+
+
+    def test_lock_errors_are_recognized(self):
+        self.assertTrue(is_lock_error(OperationalError('database is locked')))
+        self.assertFalse(is_lock_error(OperationalError('no such table: app_budget')))
+
+
+    @override_settings(WRITE_RETRY_BASE_DELAY=0)
+    def test_view_is_retried_until_the_lock_is_released(self):
+        calls = []
+
+        @retry_on_lock
+        def mocked_view(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return True
+
+        self.assertEquals(mocked_view(RequestFactory().post('/')), True)
+        self.assertEquals(len(calls), 3)
+
+
+    @override_settings(WRITE_RETRY_ATTEMPTS=2, WRITE_RETRY_BASE_DELAY=0)
+    def test_retries_are_bounded(self):
+        calls = []
+
+        @retry_on_lock
+        def mocked_view(request):
+            calls.append(request)
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(OperationalError):
+            mocked_view(RequestFactory().post('/'))
+        self.assertEquals(len(calls), 3)
+
+
+    def test_other_errors_and_outer_transactions_are_not_retried(self):
+        calls = []
+
+        @retry_on_lock
+        def mocked_view(request, message):
+            calls.append(request)
+            raise OperationalError(message)
+
+        with self.assertRaises(OperationalError):
+            mocked_view(RequestFactory().post('/'), 'no such table: app_budget')
+        with self.assertRaises(OperationalError), db_transaction.atomic():
+            mocked_view(RequestFactory().post('/'), 'database is locked')
+        self.assertEquals(len(calls), 2)
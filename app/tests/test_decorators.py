@@ -1,6 +1,6 @@
 from django.test import TestCase, Client, RequestFactory
 
-from app.views_decorators import allowed_method, parse_request_args, parse_request_dates
+from app.views_decorators import allowed_method, parse_request_args, parse_request_dates, parse_request_rows
 from app.forms import TransactionForm, FilteredDatesForm, FilteredTransactionsForm
 
 
@@ -41,7 +41,7 @@ class TestViews(TestCase):
         data = {'amou': 100, 'category': 'general', 'transaction_at': '2021-01-01'}
         request = RequestFactory().post('/', data, content_type='application/json')
         mappings = mocked_view(request)
-        self.assertEquals(mappings.content.decode(), '{"message": "wrong or missing fieldnames"}')
+        self.assertEquals(mappings.content.decode(), '{"message":"wrong or missing fieldnames"}')
 
 
     def test_parse_request_args_fails_with_missing_fieldnames(self):
@@ -54,7 +54,7 @@ class TestViews(TestCase):
         data = {'category': 'general', 'transaction_at': '2021-01-01'}
         request = RequestFactory().post('/', data, content_type='application/json')
         mappings = mocked_view(request)
-        self.assertEquals(mappings.content.decode(), '{"message": "wrong or missing fieldnames"}')
+        self.assertEquals(mappings.content.decode(), '{"message":"wrong or missing fieldnames"}')
 
 
     def test_parse_request_args_fails_with_no_json_data(self):
@@ -67,7 +67,7 @@ class TestViews(TestCase):
         data = 'category'
         request = RequestFactory().post('/', data, content_type='application/json')
         response = mocked_view(request)
-        self.assertEquals(response.content.decode(), '{"message": "failed to load json data"}')
+        self.assertEquals(response.content.decode(), '{"message":"failed to load json data"}')
 
 
     def test_parse_request_dates_fails_with_wrong_fieldnames(self):
@@ -79,7 +79,7 @@ class TestViews(TestCase):
         data = {'start_te': '20-02-2021', 'end_date': '21-2-2021'}
         request = RequestFactory().get('/', data, content_type='application/json')
         response = mocked_view(request, 'income')
-        self.assertEquals(response.content.decode(), '{"message": "wrong or missing fieldnames"}')
+        self.assertEquals(response.content.decode(), '{"message":"wrong or missing fieldnames"}')
 
 
     def test_parse_request_dates_passes_with_right_data(self):
@@ -93,3 +93,25 @@ class TestViews(TestCase):
         response = mocked_view(request, 'expenses')
         self.assertEquals(response, True)
 
+
+    def test_parse_request_rows_fails_with_invalid_ndjson_line(self):
+
+        @parse_request_rows
+        def mocked_view(request, *args, **kwargs):
+            return args[0]
+
+        data = '{"amount": 1}\n{"amount"'
+        request = RequestFactory().post('/', data, content_type='application/x-ndjson')
+        response = mocked_view(request)
+        self.assertEquals(response.content.decode(), '{"message":"failed to load json data"}')
+
+
+    def test_parse_request_rows_passes_with_json_array(self):
+
+        @parse_request_rows
+        def mocked_view(request, *args, **kwargs):
+            return args[0]
+
+        data = [{'amount': 1}, {'amount': 2}]
+        request = RequestFactory().post('/', data, content_type='application/json')
+        self.assertEquals(mocked_view(request), data)
@@ -0,0 +1,38 @@
+import datetime
+
+from django.test import SimpleTestCase, override_settings
+
+from app.encoders import ENCODERS, JsonResponse, get_encoder
+from app.forms import FilteredDatesForm
+
+
+class TestEncoders(SimpleTestCase):
+
+    def test_installed_encoders_write_the_same_json(self):
+        form_obj = FilteredDatesForm({'start_date': 'x'})
+        form_obj.is_valid()
+        data = {
+            'message': 'wrong input',
+            'errors': form_obj.errors,
+            'results': [{'id': 1, 'amount': -12.5, 'category__type': 'café/bar', 'transaction_at': datetime.date(2021, 1, 1)}]
+        }
+
+        encoded = {name: dumps(data) for name, dumps in ENCODERS.items()}
+
+        self.assertEquals(encoded['json'], (
+            '{"message":"wrong input","errors":{"start_date":["Enter a valid date/time."],"end_date":["This field is required."]},'
+            '"results":[{"id":1,"amount":-12.5,"category__type":"café/bar","transaction_at":"2021-01-01"}]}'
+        ).encode())
+        for name, content in encoded.items():
+            self.assertEquals(content, encoded['json'], name)
+
+
+    def test_json_response_uses_the_configured_encoder(self):
+        with override_settings(JSON_ENCODER='json'):
+            response = JsonResponse({'balance': None}, status=400)
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response['Content-Type'], 'application/json')
+        self.assertEquals(response.content, b'{"balance":null}')
+        with self.assertRaises(ValueError):
+            get_encoder('missing')
@@ -0,0 +1,58 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from app.fields import from_cents, to_cents
+from app.models import Budget, Category
+
+
+class TestCentsField(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+
+    def test_to_cents_converts_amounts_exactly(self):
+        self.assertEquals(to_cents(0.1), 10)
+        self.assertEquals(to_cents('-300'), -30000)
+        self.assertEquals(to_cents(1234567.89), 123456789)
+        self.assertEquals(from_cents(-30000), -300.0)
+
+
+    def test_amount_is_stored_as_cents(self):
+        Budget.objects.create(amount=12.34, category=Category.objects.create(type='general'), transaction_at='2021-01-01')
+
+        self.assertEquals(Budget.objects.values_list('amount', flat=True).get(), 12.34)
+        self.assertEquals(Budget.objects.filter(amount__gt=12.33).count(), 1)
+
+
+    def test_sums_of_decimal_amounts_are_exact(self):
+        for amount in [0.1, 0.2, -0.3, 0.7]:
+            self.obj.post(reverse('add_transaction'), {'amount': amount, 'category': 'general', 'transaction_at': '2021-01-01'}, content_type='application/json')
+
+        balance = self.obj.get(reverse('get_balance'))
+        income = self.obj.get(reverse('get_income_sum_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-01'})
+
+        self.assertEquals(balance.content.decode(), '{"balance":0.7}')
+        self.assertEquals(income.content.decode(), '{"total_income":1.0}')
+
+
+    def test_add_transaction_rejects_fractions_of_cents(self):
+        response = self.obj.post(reverse('add_transaction'), {'amount': 1.005, 'category': 'general', 'transaction_at': '2021-01-01'}, content_type='application/json')
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json()['errors'], {'amount': ['Ensure that there are no more than 2 decimal places.']})
+
+
+    def test_add_transaction_stores_large_amounts_exactly(self):
+        # Apart, as their sums would not fit in the columns either.
+        for amount, category in (('92233720368547758.07', 'general'), ('-92233720368547758.08', 'general'), ('1234567890123456.78', 'rent')):
+            response = self.obj.post(
+                reverse('add_transaction'), f'{{"amount": {amount}, "category": "{category}", "transaction_at": "2021-01-01"}}',
+                content_type='application/json'
+            )
+            self.assertEquals(response.status_code, 200)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT amount FROM app_budget ORDER BY amount')
+            cents = [row[0] for row in cursor.fetchall()]
+        self.assertEquals(cents, [-9223372036854775808, 123456789012345678, 9223372036854775807])
@@ -0,0 +1,66 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from app.ledger import get_ledger
+from app.models import Budget, IdempotencyKey
+
+
+class TestIdempotencyKeys(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        self.data = {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'}
+
+    def post(self, url_name, data, key):
+        return self.obj.post(reverse(url_name), data, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_add_is_answered_from_the_stored_response(self):
+        response1 = self.post('add_transaction', self.data, 'add-1')
+        with self.assertNumQueries(1):
+            response2 = self.post('add_transaction', self.data, 'add-1')
+
+        self.assertEquals(response2.content, response1.content)
+        self.assertEquals(response2['Idempotent-Replayed'], 'true')
+        self.assertEquals(Budget.objects.count(), 1)
+        self.assertEquals(get_ledger().amount, 100)
+
+
+    def test_update_and_delete_are_not_written_twice(self):
+        self.post('add_transaction', self.data, 'add-1')
+        transaction_id = Budget.objects.get().id
+
+        self.post('update_transaction', {'id': transaction_id, **self.data, 'amount': 50}, 'update-1')
+        self.post('delete_transaction', {'id': transaction_id}, 'delete-1')
+        response = self.post('delete_transaction', {'id': transaction_id}, 'delete-1')
+
+        self.assertEquals(json.loads(response.content)['message'], 'transaction general 50.0 of 2021-01-01 deleted')
+        self.assertEquals(get_ledger().transactions_count, 0)
+
+
+    def test_key_reused_for_another_request_fails(self):
+        self.post('add_transaction', self.data, 'add-1')
+
+        response = self.post('add_transaction', {**self.data, 'amount': 5}, 'add-1')
+
+        self.assertEquals(response.status_code, 422)
+        self.assertEquals(Budget.objects.count(), 1)
+
+
+    def test_expired_keys_are_ignored_and_cleared(self):
+        self.post('add_transaction', self.data, 'add-1')
+        self.post('add_transaction', self.data, 'add-2')
+        IdempotencyKey.objects.filter(key='add-1').update(created_at=timezone.now() - datetime.timedelta(days=2))
+
+        self.post('add_transaction', self.data, 'add-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - datetime.timedelta(days=2))
+        output = StringIO()
+        call_command('clear_idempotency_keys', stdout=output)
+
+        self.assertEquals(Budget.objects.count(), 3)
+        self.assertIn('2 expired idempotency keys deleted', output.getvalue())
@@ -0,0 +1,152 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, Client, override_settings
+from django.urls import reverse
+
+from app import ingest
+from app.categories import clear_category_cache
+from app.ingest import claim_batch, close_queue_connection, commit_batch, ensure_worker, process_batch, queue_connection, stop_worker
+from app.ledger import get_ledger
+from app.models import Budget, IdempotencyKey, IngestTicket
+
+
+class TestAsyncIngest(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            INGEST_ASYNC=True, INGEST_START_WORKER=False, INGEST_QUEUE_PATH=os.path.join(self.directory, 'queue.sqlite3')
+        )
+        self.settings.enable()
+        self.obj = Client()
+        clear_category_cache()
+
+    def tearDown(self):
+        stop_worker()
+        close_queue_connection()
+        self.settings.disable()
+        clear_category_cache()
+        shutil.rmtree(self.directory)
+
+    def add(self, amount, **headers):
+        data = {'amount': amount, 'category': 'general', 'transaction_at': '2021-01-01'}
+        return self.obj.post(reverse('add_transaction'), data, content_type='application/json', **headers)
+
+    def status(self, ticket):
+        return self.obj.get(reverse('get_ingest_status'), {'ticket': ticket})
+
+
+    def test_accepted_transaction_is_saved_by_the_next_batch(self):
+        response = self.add(100)
+        ticket = response.json()['ticket']
+
+        self.assertEquals(response.status_code, 202)
+        self.assertEquals(response['Location'], f"{reverse('get_ingest_status')}?ticket={ticket}")
+        self.assertEquals(self.status(ticket).json()['status'], 'pending')
+        self.assertEquals(Budget.objects.count(), 0)
+
+        self.assertEquals(process_batch(), 1)
+
+        self.assertEquals(self.status(ticket).json(), {'ticket': ticket, 'status': 'done'})
+        self.assertEquals(float(Budget.objects.get().amount), 100)
+        self.assertEquals(get_ledger().amount, 100)
+        self.assertEquals(self.status('unknown').status_code, 404)
+
+
+    def test_invalid_transactions_are_rejected_before_or_after_queueing(self):
+        self.assertEquals(self.add('abc').status_code, 400)
+
+        # Queued before a release which validates the rows differently.
+        ingest.enqueue({'amount': 10, 'category': 'x' * 31, 'transaction_at': datetime.date(2021, 1, 1)})
+        process_batch()
+
+        failed = IngestTicket.objects.get()
+        self.assertEquals(failed.status, IngestTicket.FAILED)
+        self.assertEquals(self.status(failed.ticket).json()['errors']['category'][0]['code'], 'max_length')
+        self.assertEquals(Budget.objects.count(), 0)
+
+
+    def test_row_failing_in_a_batch_does_not_hold_back_the_others(self):
+        self.assertEquals(self.add(99999999999999999999).status_code, 400)
+        queue_connection().execute("INSERT INTO ingest_queue (ticket, payload) VALUES ('broken', 'not json')")
+        ticket = self.add(10).json()['ticket']
+
+        with self.assertLogs('app.ingest', 'ERROR'):
+            self.assertEquals(process_batch(), 2)
+
+        self.assertEquals(self.status('broken').json()['status'], 'failed')
+        self.assertEquals(self.status(ticket).json()['status'], 'done')
+        self.assertEquals(get_ledger().amount, 10)
+
+
+    def test_idempotency_key_is_not_kept_when_queueing_fails(self):
+        with override_settings(INGEST_QUEUE_PATH=os.path.join(self.directory, 'missing', 'queue.sqlite3')):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.add(10, HTTP_IDEMPOTENCY_KEY='add-1')
+        self.assertEquals(IdempotencyKey.objects.count(), 0)
+
+        response = self.add(10, HTTP_IDEMPOTENCY_KEY='add-1')
+
+        self.assertEquals(self.status(response.json()['ticket']).json()['status'], 'pending')
+
+
+    def test_status_does_not_open_the_queue_when_the_mode_is_off(self):
+        with override_settings(INGEST_ASYNC=False, INGEST_START_WORKER=True):
+            self.assertEquals(self.status('unknown').status_code, 404)
+
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'queue.sqlite3')))
+        self.assertIsNone(ingest._worker)
+
+
+    def test_queued_transactions_survive_a_restart(self):
+        tickets = [self.add(amount).json()['ticket'] for amount in (10, 20, 30)]
+        # A new process opens the queue file again.
+        close_queue_connection()
+
+        self.assertEquals([self.status(ticket).json()['status'] for ticket in tickets], ['pending'] * 3)
+        call_command('process_ingest_queue', '--drain', stdout=StringIO())
+        self.assertEquals(get_ledger().amount, 60)
+
+
+    def test_batch_committed_before_a_crash_is_not_saved_twice(self):
+        self.add(10)
+        with override_settings(INGEST_LEASE_SECONDS=0):
+            rows = claim_batch(10)
+        # The worker commits the batch and stops before deleting it from the queue.
+        commit_batch(rows)
+        time.sleep(0.01)
+
+        self.assertEquals(process_batch(), 1)
+
+        self.assertEquals((Budget.objects.count(), get_ledger().transactions_count), (1, 1))
+        self.assertEquals(process_batch(), 0)
+
+
+    def test_idempotent_retry_is_queued_once(self):
+        response1 = self.add(10, HTTP_IDEMPOTENCY_KEY='add-1')
+        response2 = self.add(10, HTTP_IDEMPOTENCY_KEY='add-1')
+
+        self.assertEquals(response2.json()['ticket'], response1.json()['ticket'])
+        self.assertEquals(process_batch(), 1)
+
+
+    @override_settings(INGEST_START_WORKER=True, INGEST_BATCH_INTERVAL=10)
+    def test_worker_thread_saves_queued_transactions(self):
+        ticket = self.add(100).json()['ticket']
+        ensure_worker()
+
+        for _ in range(200):
+            if self.status(ticket).json()['status'] == 'done':
+                break
+            time.sleep(0.01)
+        stop_worker()
+
+        self.assertEquals(self.status(ticket).json()['status'], 'done')
+        self.assertEquals(Budget.objects.count(), 1)
@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib import admin
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from app.ledger import get_ledger
+from app.models import BalanceLedger, Budget, Category
+
+
+class TestBalanceLedger(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        self.category_obj = Category.objects.create(type='general')
+
+    def test_ledger_is_built_from_existing_records(self):
+        Budget.objects.create(amount=200, category=self.category_obj, transaction_at='2021-01-01')
+
+        ledger = get_ledger()
+
+        self.assertEquals(ledger.amount, 200)
+        self.assertEquals(ledger.transactions_count, 1)
+
+
+    def test_write_views_keep_ledger_in_sync(self):
+        self.obj.post(reverse('add_transaction'), {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'}, content_type='application/json')
+        self.obj.post(reverse('add_transaction'), {'amount': -40, 'category': 'rent', 'transaction_at': '2021-01-02'}, content_type='application/json')
+        transaction_id = Budget.objects.get(amount=100).id
+        self.obj.post(reverse('update_transaction'), {'id': transaction_id, 'amount': 250, 'category': 'general', 'transaction_at': '2021-01-01'}, content_type='application/json')
+        self.obj.post(reverse('delete_transaction'), {'id': Budget.objects.get(amount=-40).id}, content_type='application/json')
+
+        ledger = BalanceLedger.objects.get()
+
+        self.assertEquals(ledger.amount, 250)
+        self.assertEquals(ledger.transactions_count, 1)
+        self.assertEquals(self.obj.get(reverse('get_balance')).content.decode(), '{"balance":250.0}')
+
+
+    def test_admin_changes_keep_ledger_in_sync(self):
+        budget_admin = admin.site._registry[Budget]
+        first = Budget(amount=100, category=self.category_obj, transaction_at='2021-01-01')
+        second = Budget(amount=-40, category=self.category_obj, transaction_at='2021-01-02')
+        budget_admin.save_model(None, first, None, False)
+        budget_admin.save_model(None, second, None, False)
+        first.amount = 250
+        budget_admin.save_model(None, first, None, True)
+        budget_admin.delete_model(None, second)
+
+        self.assertEquals((get_ledger().amount, get_ledger().transactions_count), (250, 1))
+        budget_admin.delete_queryset(None, Budget.objects.all())
+        self.assertEquals((get_ledger().amount, get_ledger().transactions_count), (0, 0))
+
+
+    def test_admin_can_not_edit_the_ledger(self):
+        ledger_admin = admin.site._registry[BalanceLedger]
+
+        self.assertFalse(ledger_admin.has_add_permission(None))
+        self.assertFalse(ledger_admin.has_change_permission(None))
+        self.assertFalse(ledger_admin.has_delete_permission(None))
+
+
+    def test_get_balance_with_no_records_returns_null(self):
+        response = self.obj.get(reverse('get_balance'))
+
+        self.assertEquals(response.content.decode(), '{"balance":null}')
+
+
+    def test_rebuild_balance_command_fixes_drift(self):
+        Budget.objects.create(amount=200, category=self.category_obj, transaction_at='2021-01-01')
+        BalanceLedger.objects.create(id=1, amount=5, transactions_count=3)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balance', '--verify', stdout=StringIO())
+        call_command('rebuild_balance', stdout=StringIO())
+        call_command('rebuild_balance', '--verify', stdout=StringIO())
+
+        self.assertEquals(BalanceLedger.objects.get().amount, 200)
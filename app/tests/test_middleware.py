@@ -0,0 +1,67 @@
+import asyncio
+import os
+import tempfile
+
+from django.test import TestCase, AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from app.archive import get_archive_bounds
+from app.metrics import request_metrics
+from app.middleware import RequestMetricsMiddleware
+from app.models import Budget, Category
+
+
+class TestRequestMetricsMiddleware(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        request_metrics.reset()
+
+    def test_server_timing_header_counts_queries_and_duplicates(self):
+        category_obj = Category.objects.create(type='general')
+        Budget.objects.create(amount=10, category=category_obj, transaction_at='2021-01-01')
+        get_archive_bounds()
+
+        response = self.obj.get(reverse('get_filtered_transactions'), {'category': 'general'})
+
+        self.assertIn('app;dur=', response['Server-Timing'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="1 queries, 0 duplicates"', response['Server-Timing'])
+
+
+    async def test_async_requests_are_recorded_without_a_thread(self):
+        async def get_response(request):
+            return None
+
+        await AsyncClient().get(reverse('get_balance'))
+        response = await AsyncClient().get(reverse('get_balance'))
+
+        self.assertTrue(asyncio.iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        self.assertIn('desc="1 queries, 0 duplicates"', response['Server-Timing'])
+
+
+    def test_metrics_are_grouped_by_url_name(self):
+        self.obj.get(reverse('get_balance'))
+        self.obj.get(reverse('get_balance'))
+        self.obj.post(reverse('get_balance'))
+
+        metrics = self.obj.get(reverse('metrics')).content.decode()
+
+        self.assertIn('money_handler_request_duration_seconds_count{view="get_balance"} 3', metrics)
+        self.assertIn('money_handler_requests_total{view="get_balance",status="200"} 2', metrics)
+        self.assertIn('money_handler_requests_total{view="get_balance",status="405"} 1', metrics)
+        self.assertIn('money_handler_request_queries_bucket{view="get_balance",le="+Inf"} 3', metrics)
+        self.assertNotIn('view="metrics"', metrics)
+
+
+    def test_slow_sampled_requests_are_profiled_to_disk(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with override_settings(REQUEST_PROFILER_SAMPLE_RATE=1, REQUEST_PROFILER_SLOW_MS=0, REQUEST_PROFILER_DIR=profile_dir):
+                with self.assertLogs('app.middleware', 'WARNING'):
+                    self.obj.get(reverse('get_balance'))
+
+            file_names = sorted(os.listdir(profile_dir))
+            self.assertEquals(len(file_names), 2)
+            self.assertTrue(file_names[0].endswith('.prof'))
+            with open(os.path.join(profile_dir, file_names[1])) as summary_file:
+                self.assertIn('GET / took', summary_file.read())
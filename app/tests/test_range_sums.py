@@ -0,0 +1,144 @@
+import copy
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import F
+from django.test import TransactionTestCase, Client, override_settings
+from django.urls import reverse
+
+from app import range_sums
+from app.archive import archive_transactions
+from app.categories import clear_category_cache
+from app.models import Category, DailyRollup
+from app.range_sums import clear_range_sums, find_range_sums_drift, get_range_sums
+from app.rollups import get_range_totals
+
+
+class TestRangeSums(TransactionTestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        clear_category_cache()
+        clear_range_sums()
+        self.add(100, 'general', '2021-01-05')
+        self.add(-40.5, 'rent', '2021-01-10')
+        self.add(30, 'general', '2021-02-15')
+
+    def tearDown(self):
+        clear_category_cache()
+        clear_range_sums()
+
+    def add(self, amount, category, transaction_at):
+        data = {'amount': amount, 'category': category, 'transaction_at': transaction_at}
+        self.obj.post(reverse('add_transaction'), data, content_type='application/json')
+
+    def sums(self, start_date, end_date):
+        return get_range_sums(datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date))
+
+    def load(self):
+        # The first sum falls back to the rollups while the range sums load in the background.
+        if self.sums('2021-01-01', '2021-01-01') is None:
+            range_sums._loader.join()
+
+    def rollup_sums(self, start_date, end_date):
+        with override_settings(RANGE_SUMS_INDEX=False):
+            return get_range_totals(datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date))
+
+
+    def test_range_sums_match_the_rollups_without_queries_once_loaded(self):
+        self.load()
+
+        with self.assertNumQueries(0):
+            sums = [self.sums(*dates) for dates in (('2021-01-01', '2021-12-31'), ('2021-01-06', '2021-02-15'), ('1990-01-01', '2021-01-05'))]
+
+        self.assertEquals(sums[0], {'income_sum': 130.0, 'income_count': 2, 'expenses_sum': -40.5, 'expenses_count': 1})
+        self.assertEquals(sums[1], {'income_sum': 30.0, 'income_count': 1, 'expenses_sum': -40.5, 'expenses_count': 1})
+        self.assertEquals(sums[2], {'income_sum': 100.0, 'income_count': 1, 'expenses_sum': 0.0, 'expenses_count': 0})
+        self.assertEquals(self.sums('2021-03-01', '2021-01-01'), {'income_sum': 0.0, 'income_count': 0, 'expenses_sum': 0.0, 'expenses_count': 0})
+        self.assertEquals(sums[0]['income_sum'], self.rollup_sums('2021-01-01', '2021-12-31')['income_sum'])
+
+
+    def test_own_writes_update_the_loaded_range_sums(self):
+        self.load()
+        self.add(-9.5, 'rent', '2021-01-06')
+        self.obj.post(reverse('update_bulk_transactions'), {
+            'filter': {'category': 'general'}, 'changes': {'transaction_at': '2021-03-01'}
+        }, content_type='application/json')
+
+        with self.assertNumQueries(0):
+            january = self.sums('2021-01-01', '2021-01-31')
+
+        self.assertEquals(january, {'income_sum': 0.0, 'income_count': 0, 'expenses_sum': -50.0, 'expenses_count': 2})
+        self.assertEquals(find_range_sums_drift(), {})
+
+
+    @override_settings(RANGE_SUMS_CHECK_INTERVAL=0)
+    def test_writes_of_another_worker_are_seen_through_the_generation(self):
+        self.load()
+        loaded = copy.deepcopy(range_sums._range_sums)
+        self.add(20, 'general', '2021-01-07')
+        # The write was applied to the range sums of another process.
+        range_sums._range_sums = loaded
+
+        # The stale index is left to the rollups, while it is loaded again in the background.
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.sums('2021-01-01', '2021-01-31'))
+        self.assertEquals(self.rollup_sums('2021-01-01', '2021-01-31')['income_sum'], 120.0)
+        range_sums._loader.join()
+        with self.assertNumQueries(1):
+            sums = self.sums('2021-01-01', '2021-01-31')
+
+        self.assertEquals(sums['income_sum'], 120.0)
+        self.assertIsNot(range_sums._range_sums, loaded)
+
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=60)
+    def test_cached_sums_do_not_miss_writes_of_another_worker(self):
+        self.load()
+        loaded = copy.deepcopy(range_sums._range_sums)
+        self.add(20, 'general', '2021-01-07')
+        range_sums._range_sums = loaded
+
+        response = self.obj.get(reverse('get_income_sum_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-31'})
+
+        self.assertEquals(response.json(), {'total_income': 120.0})
+
+
+    def test_range_sums_are_not_used_inside_atomic_blocks(self):
+        with transaction.atomic():
+            self.assertIsNone(self.sums('2021-01-01', '2021-12-31'))
+
+        with override_settings(RANGE_SUMS_INDEX=False):
+            self.assertIsNone(self.sums('2021-01-01', '2021-12-31'))
+
+
+    @override_settings(ARCHIVE_AFTER_DAYS=365)
+    def test_archiving_and_deleting_a_category_keep_the_range_sums_right(self):
+        self.load()
+        archive_transactions(datetime.date(2021, 2, 1))
+        self.load()
+        self.assertEquals(self.sums('2021-01-01', '2021-12-31')['income_sum'], 130.0)
+
+        Category.objects.get(type='rent').delete()
+
+        self.load()
+        self.assertEquals(self.sums('2021-01-01', '2021-12-31')['expenses_count'], 0)
+        self.assertEquals(find_range_sums_drift(), {})
+
+
+    def test_check_range_sums_command_reports_and_fixes_drift(self):
+        DailyRollup.objects.filter(day='2021-01-05').update(income_sum=F('income_sum') + 10000)
+        clear_range_sums()
+
+        self.assertEquals(find_range_sums_drift(), {
+            datetime.date(2021, 1, 5): ((20000, 1, 0, 0), (10000, 1, 0, 0))
+        })
+        with self.assertRaises(CommandError):
+            call_command('check_range_sums', stdout=StringIO())
+        call_command('check_range_sums', '--fix', stdout=StringIO())
+        self.assertEquals(find_range_sums_drift(), {})
+        self.load()
+        self.assertEquals(self.sums('2021-01-01', '2021-01-31')['income_sum'], 100.0)
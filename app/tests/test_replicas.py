@@ -0,0 +1,122 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TransactionTestCase, AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from app import replicas
+from app.categories import clear_category_cache
+from app.models import BalanceLedger, Budget
+from app.replicas import ReplicaRouter, choose_replica
+from money_handler.database_url import database_config
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], RESPONSE_CACHE_TIMEOUT=0)
+class TestReplicaRouting(TransactionTestCase):
+    """The test database is the primary and a copy of it in a second SQLite file the replica."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.replica_file = os.path.join(self.directory, 'replica.sqlite3')
+        connections.databases['replica'] = database_config(f'sqlite:///{self.replica_file}', read_only=True)
+        replicas._unavailable_until.clear()
+        cache.clear()
+        clear_category_cache()
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        replicas._unavailable_until.clear()
+        clear_category_cache()
+        shutil.rmtree(self.directory)
+
+    def copy_primary_to_replica(self):
+        connection.ensure_connection()
+        replica = sqlite3.connect(self.replica_file)
+        connection.connection.backup(replica)
+        replica.close()
+
+    def add(self, client, amount):
+        data = {'amount': amount, 'category': 'general', 'transaction_at': '2021-01-01'}
+        return client.post(reverse('add_transaction'), data, content_type='application/json')
+
+    def amounts(self, client):
+        response = client.get(reverse('get_filtered_transactions'), {'category': 'general'}).json()
+        return [result['amount'] for result in response.get('results', [])]
+
+    def test_reads_go_to_replica_except_after_own_writes(self):
+        writer, reader = Client(), Client()
+        self.add(writer, 100)
+        self.copy_primary_to_replica()
+
+        response = self.add(writer, 50)
+
+        self.assertEquals(response.cookies['read_primary']['max-age'], 5)
+        self.assertEquals(Budget.objects.count(), 2)
+        self.assertEquals(self.amounts(writer), [100.0, 50.0])
+        self.assertEquals(self.amounts(reader), [100.0])
+
+
+    async def test_async_requests_read_from_replica_except_after_own_writes(self):
+        writer, reader = AsyncClient(), AsyncClient()
+        data = {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-01'}
+        await writer.post(reverse('add_transaction'), data, content_type='application/json')
+        await sync_to_async(self.copy_primary_to_replica)()
+
+        response = await writer.post(reverse('add_transaction'), {**data, 'amount': 50}, content_type='application/json')
+        reader_balance = await reader.get(reverse('get_balance'))
+        writer_balance = await writer.get(reverse('get_balance'))
+
+        self.assertEquals(response.cookies['read_primary']['max-age'], 5)
+        self.assertEquals(reader_balance.json(), {'balance': 100.0})
+        self.assertEquals(writer_balance.json(), {'balance': 150.0})
+
+
+    def test_ledger_is_rebuilt_from_the_primary(self):
+        writer, reader = Client(), Client()
+        self.add(writer, 100)
+        BalanceLedger.objects.all().delete()
+        self.copy_primary_to_replica()
+        self.add(writer, 50)
+        BalanceLedger.objects.all().delete()
+
+        response = reader.get(reverse('get_balance'))
+
+        self.assertEquals(response.json(), {'balance': 150.0})
+        self.assertEquals(BalanceLedger.objects.get().amount, 150.0)
+
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=60)
+    def test_writer_is_not_served_responses_cached_from_the_replica(self):
+        writer, reader = Client(), Client()
+        self.add(writer, 100)
+        self.copy_primary_to_replica()
+        self.add(writer, 50)
+
+        self.assertEquals(self.amounts(reader), [100.0])
+        self.assertEquals(self.amounts(writer), [100.0, 50.0])
+
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.add(Client(), 100)
+
+        with self.assertLogs('app.replicas', 'WARNING'):
+            amounts = self.amounts(Client())
+
+        self.assertEquals(amounts, [100.0])
+        self.assertIn('replica', replicas._unavailable_until)
+        self.assertIsNone(choose_replica())
+
+
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'app'))
+        self.assertIsNone(router.allow_migrate('default', 'app'))
+        self.assertEquals(router.db_for_write(Budget), 'default')
@@ -0,0 +1,129 @@
+import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.categories import clear_category_cache, get_category_ids
+from app.response_cache import Coverage, get_response, invalidate_responses, store_response
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=60)
+class TestResponseCache(TransactionTestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        cache.clear()
+        clear_category_cache()
+
+    def tearDown(self):
+        cache.clear()
+        clear_category_cache()
+
+    def add(self, amount, category, transaction_at):
+        data = {'amount': amount, 'category': category, 'transaction_at': transaction_at}
+        self.obj.post(reverse('add_transaction'), data, content_type='application/json')
+
+    def get_income(self, start_date, end_date):
+        return self.obj.get(reverse('get_income_sum_from_dates'), {'start_date': start_date, 'end_date': end_date})
+
+    def test_cached_response_is_served_without_queries(self):
+        self.add(100, 'general', '2021-01-01')
+        self.obj.get(reverse('get_balance'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.obj.get(reverse('get_balance'))
+
+        self.assertEquals(len(queries), 0)
+        self.assertEquals(response.content.decode(), '{"balance":100.0}')
+
+
+    def test_write_invalidates_responses_covering_all_dates(self):
+        self.add(10, 'general', '2021-01-01')
+        self.obj.get(reverse('get_balance'))
+        self.obj.get(reverse('get_categories_totals'))
+        self.obj.get(reverse('get_filtered_transactions'))
+        self.get_income('2020-01-01', '2024-12-31')
+
+        self.add(5, 'general', '2021-02-01')
+        self.add(7, 'rent', '2023-06-01')
+
+        self.assertEquals(self.obj.get(reverse('get_balance')).content.decode(), '{"balance":22.0}')
+        categories = self.obj.get(reverse('get_categories_totals')).json()['results']
+        self.assertEquals(sorted((row['category'], row['count']) for row in categories), [('general', 2), ('rent', 1)])
+        listing = self.obj.get(reverse('get_filtered_transactions')).json()['results']
+        self.assertEquals([result['amount'] for result in listing], [10.0, 5.0, 7.0])
+        self.assertEquals(self.get_income('2020-01-01', '2024-12-31').content.decode(), '{"total_income":22.0}')
+
+
+    def test_matching_etag_returns_not_modified(self):
+        self.add(100, 'general', '2021-01-01')
+        etag = self.obj.get(reverse('get_balance'))['ETag']
+
+        response = self.obj.get(reverse('get_balance'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response.content, b'')
+
+
+    def test_write_only_invalidates_covering_date_ranges(self):
+        self.add(100, 'general', '2021-01-10')
+        self.get_income('2021-01-01', '2021-01-31')
+        self.get_income('2021-02-01', '2021-02-28')
+
+        self.add(50, 'general', '2021-01-20')
+
+        with CaptureQueriesContext(connection) as queries:
+            february = self.get_income('2021-02-01', '2021-02-28')
+        self.assertEquals(len(queries), 0)
+        self.assertEquals(february.content.decode(), '{"total_income":"no values with these criteria"}')
+        self.assertEquals(self.get_income('2021-01-01', '2021-01-31').content.decode(), '{"total_income":150.0}')
+
+
+    def test_write_only_invalidates_covering_categories(self):
+        self.add(100, 'general', '2021-01-10')
+        self.add(-30, 'rent', '2021-01-10')
+        self.obj.get(reverse('get_filtered_transactions'), {'category': 'general'})
+        self.obj.get(reverse('get_filtered_transactions'), {'category': 'rent'})
+
+        self.add(-20, 'rent', '2021-01-11')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.obj.get(reverse('get_filtered_transactions'), {'category': 'general'})
+        self.assertEquals(len(queries), 0)
+        rent = self.obj.get(reverse('get_filtered_transactions'), {'category': 'rent'}).json()
+        self.assertEquals([result['amount'] for result in rent['results']], [-30.0, -20.0])
+
+
+    def test_filtered_transactions_cover_only_their_date_range(self):
+        self.add(100, 'general', '2021-01-10')
+        january = {'start_date': '2021-01-01', 'end_date': '2021-01-31', 'categories': 'general,rent'}
+        self.obj.get(reverse('get_filtered_transactions'), january)
+
+        self.add(-20, 'rent', '2021-02-11')
+        with CaptureQueriesContext(connection) as queries:
+            self.obj.get(reverse('get_filtered_transactions'), january)
+        self.assertEquals(len(queries), 0)
+
+        self.add(-30, 'rent', '2021-01-11')
+        results = self.obj.get(reverse('get_filtered_transactions'), january).json()['results']
+        self.assertEquals([result['amount'] for result in results], [100.0, -30.0])
+
+
+
+    def test_response_built_during_a_write_is_not_stored(self):
+        self.add(100, 'general', '2021-01-10')
+        coverage = Coverage(None, datetime.date(2021, 1, 1), datetime.date(2021, 1, 31))
+        _, writes_version = get_response('key')
+
+        invalidate_responses([(datetime.date(2021, 3, 1), get_category_ids()['general'])])
+        store_response('key', 'stale', coverage, writes_version)
+        self.assertEquals(get_response('key')[0], None)
+
+        _, writes_version = get_response('key')
+        store_response('key', 'fresh', coverage, writes_version)
+        self.assertEquals(get_response('key')[0], 'fresh')
+        invalidate_responses([(datetime.date(2021, 1, 31), get_category_ids()['general'])])
+        self.assertEquals(get_response('key')[0], None)
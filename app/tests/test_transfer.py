@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from app.ledger import get_ledger
+from app.models import Budget, Category, ImportCheckpoint
+from app.transfer import import_rows
+
+
+class TestTransfer(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+
+    def add_transactions(self):
+        category_obj = Category.objects.create(type='general')
+        Budget.objects.create(amount=200.5, category=category_obj, transaction_at='2021-01-02')
+        Budget.objects.create(amount=-30, category=category_obj, transaction_at='2021-01-01')
+
+    def test_export_transactions_streams_csv_in_date_order(self):
+        self.add_transactions()
+
+        response = self.obj.get(reverse('export_transactions'))
+
+        self.assertEquals(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        self.assertEquals(b''.join(response.streaming_content).decode().splitlines(), [
+            'id,amount,category,transaction_at',
+            '2,-30.0,general,2021-01-01',
+            '1,200.5,general,2021-01-02'
+        ])
+
+
+    def test_exported_gzipped_ndjson_imports_back(self):
+        self.add_transactions()
+        response = self.obj.get(reverse('export_transactions'), {'format': 'ndjson', 'gzip': 'true', 'start_date': '2021-01-02'})
+        content = b''.join(response.streaming_content)
+
+        self.assertEquals(gzip.decompress(content), b'{"id":1,"amount":200.5,"category":"general","transaction_at":"2021-01-02"}\n')
+
+        response = self.obj.post(reverse('import_transactions'), {'file': SimpleUploadedFile('transactions.ndjson.gz', content)})
+
+        self.assertEquals(json.loads(response.content)['message'], '1 transactions imported')
+        self.assertEquals(Budget.objects.filter(amount=200.5).count(), 2)
+        self.assertEquals(get_ledger().amount, 371)
+
+
+    def test_import_transactions_skips_and_reports_invalid_rows(self):
+        data = '{"amount": 10, "category": "rent", "transaction_at": "2021-01-01"}\nnot json\n{"amount": "x", "category": "rent", "transaction_at": "2021-01-01"}\n'
+
+        response = self.obj.post(reverse('import_transactions'), data, content_type='application/x-ndjson')
+
+        report = json.loads(response.content)
+        self.assertEquals((report['imported'], report['rows_read'], report['error_count']), (1, 3, 2))
+        self.assertEquals([error['row'] for error in report['errors']], [1, 2])
+
+
+    def test_import_with_checkpoint_resumes_after_the_rows_read(self):
+        rows = [{'amount': index, 'category': 'general', 'transaction_at': '2021-01-01'} for index in range(1, 6)]
+
+        def interrupted_rows():
+            yield from rows[:3]
+            raise OSError('connection lost')
+
+        with self.assertRaises(OSError):
+            import_rows(interrupted_rows(), batch_size=2, checkpoint_name='nightly')
+        report = import_rows(iter(rows), batch_size=2, checkpoint_name='nightly')
+
+        self.assertEquals((report['resumed_at'], report['imported']), (2, 3))
+        self.assertEquals(sorted(Budget.objects.values_list('amount', flat=True)), [1, 2, 3, 4, 5])
+        self.assertEquals(ImportCheckpoint.objects.get(name='nightly').rows_imported, 5)
+
+
+    def test_commands_export_and_import_files(self):
+        self.add_transactions()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'transactions.csv.gz')
+            call_command('export_transactions', '--gzip', '--output', path, stdout=StringIO())
+            Budget.objects.all().delete()
+
+            output = StringIO()
+            call_command('import_transactions', path, stdout=output)
+
+        self.assertIn('2 transactions imported from 2 rows, 0 rows skipped', output.getvalue())
+        self.assertEquals(sorted(Budget.objects.values_list('amount', flat=True)), [-30, 200.5])
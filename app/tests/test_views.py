@@ -1,10 +1,15 @@
+import base64
 import datetime
 import json
 
-from django.test import TestCase, Client
+from django.db.models import Sum
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 
+from app.archive import get_archive_bounds
+from app.ledger import get_ledger
 from app.models import Budget, Category
+from app.rollups import backfill_rollups, get_range_totals
 
 
 class TestViewAddTransaction(TestCase):
@@ -30,7 +35,56 @@ class TestViewAddTransaction(TestCase):
         response = self.obj.post(reverse('add_transaction'), data, content_type='application/json')
         
         self.assertEquals(response.status_code, 400)
-        self.assertEquals(response.content.decode(), '{"message": "wrong input data", "errors": {"amount": ["Enter a number."]}}')
+        self.assertEquals(response.content.decode(), '{"message":"wrong input data","errors":{"amount":["Enter a number."]}}')
+
+
+class TestViewAddBulkTransactions(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        Category.objects.create(type='general')
+
+    def test_add_bulk_transactions_saves_json_array(self):
+        data = [
+            {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-21'},
+            {'amount': -40, 'category': 'rent', 'transaction_at': '2021-01-22'}
+        ]
+
+        response = self.obj.post(reverse('add_bulk_transactions'), data, content_type='application/json')
+
+        self.assertEquals(response.content.decode(), '{"message":"2 transactions saved"}')
+        self.assertEquals(Category.objects.count(), 2)
+        self.assertEquals(Budget.objects.get(amount=-40).category.type, 'rent')
+        self.assertEquals(self.obj.get(reverse('get_balance')).content.decode(), '{"balance":60.0}')
+
+
+    def test_add_bulk_transactions_saves_ndjson(self):
+        data = '{"amount": 100, "category": "general", "transaction_at": "2021-01-21"}\n{"amount": 5, "category": "general", "transaction_at": "2021-01-21"}\n'
+
+        response = self.obj.post(reverse('add_bulk_transactions'), data, content_type='application/x-ndjson')
+        income = self.obj.get(reverse('get_income_sum_from_dates'), {'start_date': '2021-01-21', 'end_date': '2021-01-21'})
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(income.content.decode(), '{"total_income":105.0}')
+
+
+    def test_add_bulk_transactions_reports_row_errors_and_saves_nothing(self):
+        data = [
+            {'amount': 100, 'category': 'general', 'transaction_at': '2021-01-21'},
+            {'amount': 'a string', 'category': 'general', 'transaction_at': '2021-01-21'},
+            'not an object',
+            {'amount': 99999999999999999999, 'category': 'general', 'transaction_at': '2021-01-21'}
+        ]
+
+        response = self.obj.post(reverse('add_bulk_transactions'), data, content_type='application/json')
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json()['errors'], [
+            {'row': 1, 'errors': {'amount': ['Enter a number.']}},
+            {'row': 2, 'errors': {'__all__': ['Expected a json object.']}},
+            {'row': 3, 'errors': {'amount': ['Ensure this value is less than or equal to 92233720368547758.07.']}}
+        ])
+        self.assertEquals(Budget.objects.count(), 0)
 
 
 class TestViewGetBalance(TestCase):
@@ -49,7 +103,7 @@ class TestViewGetBalance(TestCase):
         response = self.obj.get(reverse('get_balance'))
         
         self.assertEquals(response.status_code, 200)
-        self.assertEquals(response.content.decode(), '{"balance": 70.0}')
+        self.assertEquals(response.content.decode(), '{"balance":70.0}')
 
 
 class TestViewGetSumFromDates(TestCase):
@@ -58,6 +112,23 @@ class TestViewGetSumFromDates(TestCase):
         self.obj = Client()
         self.category_obj = Category.objects.create(type='general')
 
+    def test_get_sum_from_dates_follows_write_views(self):
+        self.obj.post(reverse('add_transaction'), {'amount': 500, 'category': 'general', 'transaction_at': '2021-01-05'}, content_type='application/json')
+        self.obj.post(reverse('add_transaction'), {'amount': -50, 'category': 'rent', 'transaction_at': '2021-01-06'}, content_type='application/json')
+        self.obj.post(reverse('update_transaction'), {'id': Budget.objects.get(amount=500).id, 'amount': -20, 'category': 'general', 'transaction_at': '2021-01-07'}, content_type='application/json')
+
+        response1 = self.obj.get(reverse('get_income_sum_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-31'})
+        response2 = self.obj.get(reverse('get_expenses_sum_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-31'})
+
+        self.assertEquals(response1.content.decode(), '{"total_income":null}')
+        self.assertEquals(response2.content.decode(), '{"total_expenses":-70.0}')
+
+        self.obj.post(reverse('delete_transaction'), {'id': Budget.objects.get(amount=-50).id}, content_type='application/json')
+        response3 = self.obj.get(reverse('get_expenses_sum_from_dates'), {'start_date': '2021-01-06', 'end_date': '2021-01-06'})
+
+        self.assertEquals(response3.content.decode(), '{"total_expenses":"no values with these criteria"}')
+
+
     def test_get_sum_from_dates_with_no_values_for_the_criteria(self):
         Budget.objects.create(amount=2300, category=self.category_obj, transaction_at='2021-01-01')
         
@@ -66,8 +137,8 @@ class TestViewGetSumFromDates(TestCase):
         
         self.assertEquals(response1.status_code, 200)
         self.assertEquals(response2.status_code, 200)
-        self.assertEquals(response1.content.decode(), '{"total_income": "no values with these criteria"}')
-        self.assertEquals(response2.content.decode(), '{"total_expenses": "no values with these criteria"}')
+        self.assertEquals(response1.content.decode(), '{"total_income":"no values with these criteria"}')
+        self.assertEquals(response2.content.decode(), '{"total_expenses":"no values with these criteria"}')
 
 
     def test_get_sum_from_dates_returns_right_total_income(self):
@@ -78,10 +149,11 @@ class TestViewGetSumFromDates(TestCase):
                 Budget(amount=-100, category=self.category_obj, transaction_at='2021-01-01')
             ]
         )
+        backfill_rollups()
         
         response = self.obj.get(reverse('get_income_sum_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-31'})
         
-        self.assertEquals(response.content.decode(), '{"total_income": 2300.0}')
+        self.assertEquals(response.content.decode(), '{"total_income":2300.0}')
 
 
     def test_get_sum_from_dates_returns_right_total_expenses(self):
@@ -93,10 +165,106 @@ class TestViewGetSumFromDates(TestCase):
                 Budget(amount=-200, category=self.category_obj, transaction_at='2021-02-01')
             ]
         )
+        backfill_rollups()
         
         response = self.obj.get(reverse('get_expenses_sum_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-31'})
         
-        self.assertEquals(response.content.decode(), '{"total_expenses": -100.0}')
+        self.assertEquals(response.content.decode(), '{"total_expenses":-100.0}')
+
+
+class TestViewGetSummaryFromDates(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        general = Category.objects.create(type='general')
+        rent = Category.objects.create(type='rent')
+        Budget.objects.bulk_create(
+            [
+                Budget(amount=2300, category=general, transaction_at='2021-01-01'),
+                Budget(amount=-100.5, category=general, transaction_at='2021-01-11'),
+                Budget(amount=-900, category=rent, transaction_at='2021-02-01'),
+                Budget(amount=50, category=rent, transaction_at='2021-03-01')
+            ]
+        )
+
+    def test_get_summary_from_dates_returns_all_totals_in_one_query(self):
+        # The archive dates are read again once per ARCHIVE_BOUNDS_CHECK_INTERVAL.
+        get_archive_bounds()
+        with self.assertNumQueries(1):
+            response = self.obj.get(reverse('get_summary_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-02-28'})
+
+        self.assertEquals(json.loads(response.content), {
+            'income': 2300.0, 'income_count': 1, 'expenses': -1000.5, 'expenses_count': 2,
+            'net': 1299.5, 'count': 3, 'min': -900.0, 'max': 2300.0, 'avg': 433.17
+        })
+
+
+    def test_get_summary_from_dates_groups_by_category_and_month(self):
+        response1 = self.obj.get(reverse('get_summary_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-12-31', 'group_by': 'category'})
+        response2 = self.obj.get(reverse('get_summary_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-12-31', 'group_by': 'month'})
+
+        results1 = json.loads(response1.content)['results']
+        results2 = json.loads(response2.content)['results']
+        self.assertEquals([(row['category'], row['net']) for row in results1], [('general', 2199.5), ('rent', -850.0)])
+        self.assertEquals([(row['month'], row['count']) for row in results2], [('2021-01-01', 2), ('2021-02-01', 1), ('2021-03-01', 1)])
+
+
+    def test_get_summary_from_dates_with_no_values_or_wrong_input(self):
+        response1 = self.obj.get(reverse('get_summary_from_dates'), {'start_date': '2022-01-01', 'end_date': '2022-12-31'})
+        response2 = self.obj.get(reverse('get_summary_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-12-31', 'group_by': 'hour'})
+
+        self.assertEquals(response1.content.decode(), '{"message":"no values with these criteria"}')
+        self.assertEquals(response2.status_code, 400)
+
+
+class TestViewGetSeriesFromDates(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+
+    def test_get_series_from_dates_fills_empty_buckets(self):
+        self.obj.post(reverse('add_transaction'), {'amount': 100, 'category': 'general', 'transaction_at': '2020-11-15'}, content_type='application/json')
+        self.obj.post(reverse('add_transaction'), {'amount': -40, 'category': 'rent', 'transaction_at': '2021-01-02'}, content_type='application/json')
+        self.obj.post(reverse('add_transaction'), {'amount': -10, 'category': 'general', 'transaction_at': '2021-01-31'}, content_type='application/json')
+
+        response = self.obj.get(reverse('get_series_from_dates'), {'start_date': '2020-11-20', 'end_date': '2021-01-31', 'interval': 'month'})
+
+        self.assertEquals(json.loads(response.content), {
+            'interval': 'month',
+            'dates': ['2020-11-01', '2020-12-01', '2021-01-01'],
+            'income': [0, 0, 0],
+            'expenses': [0, 0, -50.0]
+        })
+
+
+    def test_get_series_from_dates_filters_by_category_per_week(self):
+        self.obj.post(reverse('add_transaction'), {'amount': -40, 'category': 'rent', 'transaction_at': '2021-01-06'}, content_type='application/json')
+        self.obj.post(reverse('add_transaction'), {'amount': -10, 'category': 'general', 'transaction_at': '2021-01-07'}, content_type='application/json')
+
+        response = self.obj.get(reverse('get_series_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-12', 'interval': 'week', 'category': 'rent'})
+
+        response_data = json.loads(response.content)
+        self.assertEquals(response_data['dates'], ['2020-12-28', '2021-01-04', '2021-01-11'])
+        self.assertEquals(response_data['expenses'], [0, -40.0, 0])
+
+
+    def test_get_series_from_dates_with_wrong_interval_fails(self):
+        response = self.obj.get(reverse('get_series_from_dates'), {'start_date': '2021-01-01', 'end_date': '2021-01-31', 'interval': 'hour'})
+
+        self.assertEquals(response.status_code, 400)
+
+
+    def test_get_series_from_dates_stops_at_the_last_date(self):
+        for interval, dates in (('day', ['9999-12-30', '9999-12-31']), ('week', ['9999-12-27']), ('month', ['9999-12-01']), ('year', ['9999-01-01'])):
+            response = self.obj.get(reverse('get_series_from_dates'), {'start_date': '9999-12-30', 'end_date': '9999-12-31', 'interval': interval})
+            self.assertEquals(response.json()['dates'], dates)
+
+
+    def test_get_series_from_dates_with_too_many_buckets_fails(self):
+        response = self.obj.get(reverse('get_series_from_dates'), {'start_date': '0001-01-01', 'end_date': '9999-12-31', 'interval': 'day'})
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json()['errors'], {'__all__': ['Enter a date range of at most 10000 days.']})
 
 
 class TestViewGetFilteredTransactions(TestCase):
@@ -119,13 +287,13 @@ class TestViewGetFilteredTransactions(TestCase):
             {"id": 1, "amount": 2300.0, "category__type": "general", "transaction_at": "2021-01-01"},
             {"id": 2, "amount": -100.0, "category__type": "general", "transaction_at": "2021-01-01"}
         ]
-        self.assertEquals(response.content.decode(), json.dumps({'results': results}))
+        self.assertEquals(response.content.decode(), json.dumps({'results': results}, separators=(',', ':')))
 
 
     def test_get_filtered_transactions_with_invalid_form_fails(self):
         response = self.obj.get(reverse('get_filtered_transactions'), data={'category': 'general', 'transaction_at': '11/1/2020'})
         
-        self.assertEquals(response.content.decode(), '{"message": "wrong input", "errors": {"transaction_at": ["Enter a valid date/time."]}}')
+        self.assertEquals(response.content.decode(), '{"message":"wrong input","errors":{"transaction_at":["Enter a valid date/time."]}}')
 
 
     def test_get_filtered_transactions_with_no_values_for_the_criteria(self):
@@ -135,8 +303,8 @@ class TestViewGetFilteredTransactions(TestCase):
         response1 = self.obj.get(reverse('get_filtered_transactions'), data={'category': 'transfer'})
         response2 = self.obj.get(reverse('get_filtered_transactions'), data={'something': 'transfer'})
         
-        self.assertEquals(response1.content.decode(), '{"message": "no values with these criteria"}')
-        self.assertEquals(response2.content.decode(), '{"message": "wrong field or no value for field"}')
+        self.assertEquals(response1.content.decode(), '{"message":"no values with these criteria"}')
+        self.assertEquals(response2.content.decode(), '{"message":"wrong field or no value for field"}')
 
 
     def test_get_filtered_transactions_with_filters_returns_right_records(self):
@@ -151,7 +319,93 @@ class TestViewGetFilteredTransactions(TestCase):
         response = self.obj.get(reverse('get_filtered_transactions'), data={'category': 'general', 'transaction_at': '2021-01-01'})
        
         self.assertEquals(response.content.decode(), 
-            '{"results": [{"id": 1, "amount": 2300.0, "category__type": "general", "transaction_at": "2021-01-01"}]}')
+            '{"results":[{"id":1,"amount":2300.0,"category__type":"general","transaction_at":"2021-01-01"}]}')
+
+
+    def test_get_filtered_transactions_by_amount_date_range_and_categories(self):
+        general_obj = Category.objects.create(type='general')
+        rent_obj = Category.objects.create(type='rent')
+        food_obj = Category.objects.create(type='food')
+        Budget.objects.bulk_create(
+            [
+                Budget(amount=-50, category=rent_obj, transaction_at='2021-01-03'),
+                Budget(amount=-20.5, category=general_obj, transaction_at='2021-01-02'),
+                Budget(amount=-10, category=food_obj, transaction_at='2021-01-02'),
+                Budget(amount=-5, category=general_obj, transaction_at='2021-01-02'),
+                Budget(amount=-30, category=general_obj, transaction_at='2021-01-05'),
+                Budget(amount=100, category=rent_obj, transaction_at='2021-01-02')
+            ]
+        )
+
+        response = self.obj.get(reverse('get_filtered_transactions'), data={
+            'categories': 'general,rent', 'start_date': '2021-01-02', 'end_date': '2021-01-04',
+            'min_amount': -50, 'max_amount': -10
+        })
+
+        self.assertEquals([(result['amount'], result['transaction_at']) for result in response.json()['results']],
+            [(-20.5, '2021-01-02'), (-50.0, '2021-01-03')])
+
+
+    def test_get_filtered_transactions_with_inverted_ranges_fails(self):
+        response1 = self.obj.get(reverse('get_filtered_transactions'), data={'start_date': '2021-01-02', 'end_date': '2021-01-01'})
+        response2 = self.obj.get(reverse('get_filtered_transactions'), data={'min_amount': 10, 'max_amount': -10})
+
+        self.assertEquals(response1.status_code, 400)
+        self.assertEquals(response2.json()['errors'], {'__all__': ['The minimum amount must not be above the maximum amount.']})
+
+
+    def test_get_filtered_transactions_with_amounts_out_of_range_fails(self):
+        response1 = self.obj.get(reverse('get_filtered_transactions'), data={'min_amount': '1e400'})
+        response2 = self.obj.get(reverse('get_filtered_transactions'), data={'max_amount': '99999999999999999999'})
+
+        self.assertEquals((response1.status_code, response2.status_code), (400, 400))
+
+
+    def test_get_filtered_transactions_paginates_with_cursor(self):
+        category_obj = Category.objects.create(type='general')
+        Budget.objects.bulk_create(
+            [
+                Budget(amount=10, category=category_obj, transaction_at='2021-01-02'),
+                Budget(amount=20, category=category_obj, transaction_at='2021-01-01'),
+                Budget(amount=30, category=category_obj, transaction_at='2021-01-02')
+            ]
+        )
+
+        response1 = self.obj.get(reverse('get_filtered_transactions'), data={'limit': 2}).json()
+        response2 = self.obj.get(reverse('get_filtered_transactions'), data={'limit': 2, 'cursor': response1['next']}).json()
+
+        self.assertEquals([result['amount'] for result in response1['results']], [20.0, 10.0])
+        self.assertEquals([result['amount'] for result in response2['results']], [30.0])
+        self.assertNotIn('next', response2)
+
+
+    def test_get_filtered_transactions_with_invalid_cursor_fails(self):
+        response = self.obj.get(reverse('get_filtered_transactions'), data={'cursor': 'not-a-cursor'})
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.content.decode(), '{"message":"wrong input","errors":{"cursor":["Enter a valid cursor."]}}')
+        for raw_cursor in (b'["2021-01-01", 1e100]', b'["2021-01-01", 9223372036854775808]', b'["2021-01-01", Infinity]'):
+            cursor = base64.urlsafe_b64encode(raw_cursor).decode()
+            response = self.obj.get(reverse('get_filtered_transactions'), data={'cursor': cursor})
+            self.assertEquals(response.status_code, 400)
+
+
+    def test_get_filtered_transactions_streams_all_records(self):
+        category_obj = Category.objects.create(type='general')
+        Budget.objects.bulk_create(
+            [
+                Budget(amount=2300, category=category_obj, transaction_at='2021-01-01'),
+                Budget(amount=-100, category=category_obj, transaction_at='2021-01-01')
+            ]
+        )
+
+        response = self.obj.get(reverse('get_filtered_transactions'), data={'stream': 'true', 'category': 'general'})
+        results = [
+            {"id": 1, "amount": 2300.0, "category__type": "general", "transaction_at": "2021-01-01"},
+            {"id": 2, "amount": -100.0, "category__type": "general", "transaction_at": "2021-01-01"}
+        ]
+
+        self.assertEquals(b''.join(response.streaming_content).decode(), json.dumps({'results': results}, separators=(',', ':')))
 
 
 class TestViewUpdateTransaction(TestCase):
@@ -165,7 +419,7 @@ class TestViewUpdateTransaction(TestCase):
     
         response = self.obj.post(reverse('update_transaction'), {'id': 1, 'amount': -300, 'category': 'rent', 'transaction_at':'2021-01-01'}, content_type='application/json')
         
-        self.assertEquals(response.content.decode(), '{"message": "transaction rent -300.0 of 2021-01-01 updated"}')
+        self.assertEquals(response.content.decode(), '{"message":"transaction rent -300.0 of 2021-01-01 updated"}')
         
         saved_transaction = Budget.objects.first()
         
@@ -179,7 +433,7 @@ class TestViewUpdateTransaction(TestCase):
     
         response = self.obj.post(reverse('update_transaction'), {'id': 10, 'amount': -300, 'category': 'rent', 'transaction_at':'2021-01-01'}, content_type='application/json')
         
-        self.assertEquals(response.content.decode(), '{"message": "no transaction with this id"}')
+        self.assertEquals(response.content.decode(), '{"message":"no transaction with this id"}')
         
         saved_transaction = Budget.objects.first()
         
@@ -214,5 +468,90 @@ class TestViewDeleteTransaction(TestCase):
 
         response = self.obj.post(reverse('delete_transaction'), {'id': 2}, content_type='application/json')
 
-        self.assertEquals(response.content.decode(), '{"message": "no transaction with this id"}')
+        self.assertEquals(response.content.decode(), '{"message":"no transaction with this id"}')
         
+
+
+class TestViewBulkChanges(TestCase):
+
+    def setUp(self):
+        self.obj = Client()
+        rows = [
+            {'amount': 10 * day, 'category': 'general' if day % 2 else 'rent', 'transaction_at': f'2021-01-{day:02}'}
+            for day in range(1, 21)
+        ]
+        self.obj.post(reverse('add_bulk_transactions'), rows, content_type='application/json')
+
+    def assertAggregatesMatchTable(self):
+        income = Budget.objects.filter(amount__gt=0).aggregate(total=Sum('amount'))['total']
+        expenses = Budget.objects.filter(amount__lte=0).aggregate(total=Sum('amount'))['total']
+        totals = get_range_totals(datetime.date(2000, 1, 1), datetime.date(2100, 1, 1))
+
+        self.assertEquals(get_ledger().amount, (income or 0) + (expenses or 0))
+        self.assertEquals(get_ledger().transactions_count, Budget.objects.count())
+        self.assertEquals((totals['income_sum'] or 0, totals['expenses_sum'] or 0), (income or 0, expenses or 0))
+
+    def test_update_bulk_transactions_changes_ids_and_reports_missing_ones(self):
+        ids = list(Budget.objects.filter(transaction_at__lte='2021-01-03').values_list('id', flat=True))
+
+        with self.assertNumQueries(15):
+            response = self.obj.post(reverse('update_bulk_transactions'), {
+                'ids': ids + [999], 'changes': {'amount': -5, 'category': 'groceries'}
+            }, content_type='application/json')
+
+        self.assertEquals(json.loads(response.content), {'message': '3 transactions updated', 'updated': ids, 'missing': [999]})
+        self.assertEquals(list(Budget.objects.filter(category__type='groceries').values_list('amount', flat=True)), [-5, -5, -5])
+        self.assertAggregatesMatchTable()
+
+
+    def test_update_bulk_transactions_by_filter_moves_dates(self):
+        response = self.obj.post(reverse('update_bulk_transactions'), {
+            'filter': {'start_date': '2021-01-11', 'category': 'rent'}, 'changes': {'transaction_at': '2021-02-01'}
+        }, content_type='application/json')
+
+        self.assertEquals(json.loads(response.content)['message'], '5 transactions updated')
+        self.assertEquals(Budget.objects.filter(transaction_at='2021-02-01').count(), 5)
+        self.assertAggregatesMatchTable()
+
+
+    def test_delete_bulk_transactions_by_ids_and_filter(self):
+        ids = list(Budget.objects.filter(amount__gte=150).values_list('id', flat=True))
+
+        response1 = self.obj.post(reverse('delete_bulk_transactions'), {'ids': ids}, content_type='application/json')
+        response2 = self.obj.post(reverse('delete_bulk_transactions'), {'filter': {'end_date': '2021-01-05'}}, content_type='application/json')
+
+        self.assertEquals(json.loads(response1.content)['message'], '6 transactions deleted')
+        self.assertEquals(json.loads(response2.content)['message'], '5 transactions deleted')
+        self.assertEquals(Budget.objects.count(), 9)
+        self.assertAggregatesMatchTable()
+
+
+    @override_settings(BULK_MAX_IDS=4)
+    def test_bulk_changes_refuse_filters_matching_too_many_transactions(self):
+        response1 = self.obj.post(reverse('delete_bulk_transactions'), {'filter': {'end_date': '2021-01-05'}}, content_type='application/json')
+        response2 = self.obj.post(reverse('update_bulk_transactions'), {
+            'filter': {'start_date': '0001-01-01'}, 'changes': {'amount': 1}
+        }, content_type='application/json')
+
+        self.assertEquals(response1.status_code, 400)
+        self.assertEquals(json.loads(response1.content)['errors'], {'filter': ['Enter a filter matching at most 4 transactions.']})
+        self.assertEquals(response2.status_code, 400)
+        self.assertEquals(Budget.objects.count(), 20)
+        self.assertFalse(Budget.objects.filter(amount=1).exists())
+
+
+    def test_bulk_changes_with_wrong_input_fail(self):
+        response1 = self.obj.post(reverse('delete_bulk_transactions'), {'ids': [1], 'filter': {}}, content_type='application/json')
+        response2 = self.obj.post(reverse('delete_bulk_transactions'), {'filter': {}}, content_type='application/json')
+        response3 = self.obj.post(reverse('update_bulk_transactions'), {'ids': ['a']}, content_type='application/json')
+        response4 = self.obj.post(reverse('update_bulk_transactions'), {'ids': [1], 'changes': {}}, content_type='application/json')
+        response5 = self.obj.post(reverse('update_bulk_transactions'), {
+            'ids': [1], 'changes': {'amount': -99999999999999999999}
+        }, content_type='application/json')
+
+        self.assertEquals(response1.content.decode(), '{"message":"wrong or missing fieldnames"}')
+        self.assertEquals(response2.content.decode(), '{"message":"wrong input data","errors":{"__all__":["Enter at least one filter."]}}')
+        self.assertEquals(response3.content.decode(), '{"message":"wrong input data","errors":{"ids":["Enter a list of ids."]}}')
+        self.assertEquals(response4.content.decode(), '{"message":"wrong input data","errors":{"__all__":["Enter at least one change."]}}')
+        self.assertEquals(response5.status_code, 400)
+        self.assertEquals(Budget.objects.count(), 20)
@@ -0,0 +1,150 @@
+import csv
+import gzip
+import io
+import json
+import zlib
+from decimal import Decimal
+from itertools import islice
+from operator import itemgetter
+
+from django.db import transaction
+
+from .bulk import insert_transactions, validate_rows
+from .encoders import dumps
+from .archive import overlaps_archive
+from .models import ArchivedBudget, Budget, ImportCheckpoint
+from .pagination import ordered_rows
+
+
+EXPORT_FIELDS = ('id', 'amount', 'category', 'transaction_at')
+
+
+def export_querysets(start_date=None, end_date=None, category=None):
+    """Return the querysets of (id, amount, category, transaction_at) tuples of the transactions to export.
+
+    The archive is included when the dates may be in it.
+    """
+
+    querysets = []
+    for model in [Budget, ArchivedBudget] if overlaps_archive(start_date, end_date) else [Budget]:
+        transactions = model.objects.all()
+        if start_date:
+            transactions = transactions.filter(transaction_at__gte=start_date)
+        if end_date:
+            transactions = transactions.filter(transaction_at__lte=end_date)
+        if category:
+            transactions = transactions.filter(category__type=category)
+        querysets.append(transactions.values_list('id', 'amount', 'category__type', 'transaction_at'))
+    return querysets
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson_chunk(rows):
+    return b''.join(dumps(dict(zip(EXPORT_FIELDS, row))) + b'\n' for row in rows)
+
+
+def export_chunks(querysets, file_format, chunk_size):
+    """Yield the rows of the querysets in date order as csv (with a header) or ndjson bytes, one chunk of rows at a time.
+
+    The rows come from server side cursors, so memory use does not grow with the export.
+    """
+
+    encode_chunk = _csv_chunk if file_format == 'csv' else _ndjson_chunk
+    if file_format == 'csv':
+        yield _csv_chunk([EXPORT_FIELDS])
+    rows = ordered_rows(querysets, chunk_size=chunk_size, key=itemgetter(3, 0))
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield encode_chunk(chunk)
+
+
+def gzip_chunks(chunks, level=6):
+    """Yield the chunks compressed as a single gzip stream."""
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class ReadStream(io.RawIOBase):
+    """Raw binary stream over any object with a read(size) method, like a request or an uploaded file."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def read_rows(binary_file, file_format, compressed=False):
+    """Yield the rows of a csv or ndjson file one by one, without reading the whole file.
+
+    Lines that are not valid json are yielded as None, so that they are reported as row errors.
+    """
+
+    if not isinstance(binary_file, io.IOBase):
+        binary_file = io.BufferedReader(ReadStream(binary_file))
+    if compressed:
+        binary_file = gzip.GzipFile(fileobj=binary_file)
+    text_file = io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+    if file_format == 'csv':
+        yield from csv.DictReader(text_file)
+        return
+    for line in text_file:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line, parse_float=Decimal)
+        except ValueError:
+            yield None
+
+
+def import_rows(rows, batch_size, checkpoint_name=None, max_errors=100):
+    """Save the valid rows in batches of batch_size and return a report of the import.
+
+    Each batch is saved in its own database transaction. With a checkpoint name the
+    number of rows read is saved along with each batch, and a later import with the
+    same name skips the rows read before, so an interrupted import can be run again
+    from the start of the file. Invalid rows are skipped, the first max_errors of
+    them are reported.
+    """
+
+    report = {'rows_read': 0, 'imported': 0, 'resumed_at': 0, 'error_count': 0, 'errors': []}
+    if checkpoint_name:
+        checkpoint = ImportCheckpoint.objects.get_or_create(name=checkpoint_name)[0]
+        report['resumed_at'] = report['rows_read'] = checkpoint.rows_read
+        rows = islice(rows, checkpoint.rows_read, None)
+
+    while True:
+        loaded_rows = list(islice(rows, batch_size))
+        if not loaded_rows:
+            break
+        cleaned_rows, errors = validate_rows(loaded_rows)
+        for error in errors:
+            error['row'] += report['rows_read']
+        report['error_count'] += len(errors)
+        report['errors'] += errors[:max_errors - len(report['errors'])]
+        report['rows_read'] += len(loaded_rows)
+        with transaction.atomic():
+            if cleaned_rows:
+                report['imported'] += insert_transactions(cleaned_rows, batch_size)
+            if checkpoint_name:
+                ImportCheckpoint.objects.filter(name=checkpoint_name).update(
+                    rows_read=report['rows_read'], rows_imported=checkpoint.rows_imported + report['imported']
+                )
+    return report
@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
+
 urlpatterns = [
-    path('income/', views.get_sum_from_dates, {'category': 'income'}, name='get_income_sum_from_dates'),
-    path('expenses/', views.get_sum_from_dates, {'category': 'expenses'}, name='get_expenses_sum_from_dates'),
-    path('transactions/', views.get_filtered_transactions, name='get_filtered_transactions')
+    path('income/', read_views.get_sum_from_dates, {'category': 'income'}, name='get_income_sum_from_dates'),
+    path('expenses/', read_views.get_sum_from_dates, {'category': 'expenses'}, name='get_expenses_sum_from_dates'),
+    path('summary/', read_views.get_summary_from_dates, name='get_summary_from_dates'),
+    path('series/', read_views.get_series_from_dates, name='get_series_from_dates'),
+    path('categories/', read_views.get_categories_totals, name='get_categories_totals'),
+    path('categories/search/', read_views.search_categories, name='search_categories'),
+    path('transactions/', read_views.get_filtered_transactions, name='get_filtered_transactions')
 ]
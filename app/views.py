@@ -1,77 +1,225 @@
-from django.http import JsonResponse
+import csv
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Sum
+from django.db import transaction as db_transaction
 
-from .models import Category, Budget
-from .forms import TransactionForm, FilteredDatesForm, FilteredTransactionsForm, DeleteForm
+from .models import ArchivedBudget, Budget
+from .forms import BulkChangesForm, BulkTransactionForm, CategorySearchForm, TransactionForm, FilteredDatesForm, FilteredTransactionsForm, DeleteForm, ExportForm, ImportForm, SeriesForm, SummaryForm
+from .aggregates import record_transaction_change, transaction_state
+from .archive import overlaps_archive, restore_transactions
+from .categories import match_categories
+from .category_totals import get_category_totals
+from .bulk import TooManyTransactions, delete_transactions, insert_transactions, select_transactions, update_transactions, validate_rows
+from .encoders import JsonResponse
+from .idempotency import IDEMPOTENCY_HEADER
+from .ingest import enqueue, ensure_worker, get_ticket_status
+from .ledger import get_ledger
+from .metrics import request_metrics
+from .pagination import paginate, stream_results
+from .reports import get_series, get_summary
+from .response_cache import Coverage
+from .rollups import get_range_totals
+from .transfer import export_chunks, export_querysets, gzip_chunks, import_rows, read_rows
 
 from .views_decorators import (
     allowed_method,
+    cached_response,
+    idempotent,
     parse_request_args,
-    parse_request_dates
+    parse_request_dates,
+    parse_request_rows,
+    parse_request_selection,
+    retry_on_lock
 )
 
 
 @csrf_exempt
 @allowed_method('POST')
+@retry_on_lock
+@idempotent
 @parse_request_args(TransactionForm)
 def add_transaction(request, loaded_data):
-    """Saves a new transaction (income or expense)."""
+    """Saves a new transaction (income or expense), or queues it in the asynchronous ingest mode."""
+
+    if settings.INGEST_ASYNC:
+        return queue_transaction(request, loaded_data)
 
-    category_obj, _ = Category.objects.get_or_create(type=loaded_data['category'])
-    loaded_data['category'] = category_obj
     budget_form = TransactionForm(loaded_data)
     if not budget_form.is_valid():
         return JsonResponse({'message': 'wrong input data', 'errors': budget_form.errors}, status=400)
          
-    budget_form.save()
+    with db_transaction.atomic():
+        new_transaction = budget_form.save()
+        record_transaction_change(new=transaction_state(new_transaction))
     return JsonResponse({'message': 'transaction saved'}) 
 
 
+def queue_transaction(request, loaded_data):
+    """Queues a new transaction for the ingest worker and answers with its ticket."""
+
+    budget_form = BulkTransactionForm(loaded_data)
+    if not budget_form.is_valid():
+        return JsonResponse({'message': 'wrong input data', 'errors': budget_form.errors}, status=400)
+
+    ensure_worker()
+    ticket = enqueue(budget_form.cleaned_data, request.headers.get(IDEMPOTENCY_HEADER))
+    response = JsonResponse({'message': 'transaction accepted', 'ticket': ticket}, status=202)
+    response['Location'] = f"{reverse('get_ingest_status')}?ticket={ticket}"
+    return response
+
+
+@allowed_method('GET')
+def get_ingest_status(request):
+    """Returns whether a transaction queued in the asynchronous ingest mode is pending, saved or rejected."""
+
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return JsonResponse({'message': 'wrong or missing fieldnames'}, status=400)
+
+    ensure_worker()
+    status = get_ticket_status(ticket)
+    if status is None:
+        return JsonResponse({'message': 'ticket not found'}, status=404)
+    return JsonResponse(status)
+
+
 @csrf_exempt
 @allowed_method('POST')
+@retry_on_lock
+@parse_request_rows
+def add_bulk_transactions(request, loaded_rows):
+    """Saves many new transactions at once, either all of them or none."""
+
+    cleaned_rows, errors = validate_rows(loaded_rows)
+    if errors:
+        return JsonResponse({'message': 'wrong input data', 'errors': errors}, status=400)
+
+    saved_count = insert_transactions(cleaned_rows, settings.BULK_INSERT_BATCH_SIZE)
+    return JsonResponse({'message': f'{saved_count} transactions saved'})
+
+
+@csrf_exempt
+@allowed_method('POST')
+@retry_on_lock
+@idempotent
 @parse_request_args(TransactionForm)
 def update_transaction(request, loaded_data):
     """Update specific transaction based on given id."""
 
-    category_obj,_ = Category.objects.get_or_create(type=loaded_data['category'])
-    loaded_data['category'] = category_obj
-    try:
-        transaction = Budget.objects.get(id=loaded_data['id'])
-    except ObjectDoesNotExist:
-        return JsonResponse({'message': 'no transaction with this id'})
-    budget_form = TransactionForm(loaded_data, instance=transaction)
-    if not budget_form.is_valid():
-        return JsonResponse({'message': 'wrong input data', 'errors': budget_form.errors}, status=400) 
-    budget_form.save()
+    # The row is read and locked in the transaction that writes it, so that the change
+    # recorded in the aggregates is computed from the values being replaced.
+    with db_transaction.atomic():
+        try:
+            transaction = Budget.objects.select_for_update().get(id=loaded_data['id'])
+        except ObjectDoesNotExist:
+            if not restore_transactions(ids=[loaded_data['id']]):
+                return JsonResponse({'message': 'no transaction with this id'})
+            transaction = Budget.objects.select_for_update().get(id=loaded_data['id'])
+        old_state = transaction_state(transaction)
+        budget_form = TransactionForm(loaded_data, instance=transaction)
+        if not budget_form.is_valid():
+            return JsonResponse({'message': 'wrong input data', 'errors': budget_form.errors}, status=400)
+        budget_form.save()
+        record_transaction_change(old_state, transaction_state(transaction))
     return JsonResponse({'message': f'transaction {transaction.__str__()} updated'})
 
 
 @csrf_exempt
 @allowed_method('POST')
+@retry_on_lock
+@idempotent
 @parse_request_args(DeleteForm)
 def delete_transaction(request, loaded_data):
     """Delete specific transaction based on given id."""
 
-    try:
-        transaction = Budget.objects.get(id=loaded_data['id'])
-    except ObjectDoesNotExist:
-        return JsonResponse({'message': 'no transaction with this id'})
-    transaction.delete()
+    with db_transaction.atomic():
+        try:
+            transaction = Budget.objects.select_for_update().get(id=loaded_data['id'])
+        except ObjectDoesNotExist:
+            if not restore_transactions(ids=[loaded_data['id']]):
+                return JsonResponse({'message': 'no transaction with this id'})
+            transaction = Budget.objects.select_for_update().get(id=loaded_data['id'])
+        transaction.delete()
+        record_transaction_change(old=transaction_state(transaction))
     return JsonResponse({'message': f'transaction {transaction.__str__()} deleted'})
 
 
+@csrf_exempt
+@allowed_method('POST')
+@retry_on_lock
+@idempotent
+@parse_request_selection
+def update_bulk_transactions(request, loaded_data, ids, filters):
+    """Apply the same changes to the transactions of an id list or a filter, in one database transaction."""
+
+    changes_form = BulkChangesForm(loaded_data.get('changes') if isinstance(loaded_data.get('changes'), dict) else {})
+    if not changes_form.is_valid():
+        return JsonResponse({'message': 'wrong input data', 'errors': changes_form.errors}, status=400)
+    try:
+        with db_transaction.atomic():
+            transactions, missing_ids = select_transactions(ids, filters)
+            updated_count = update_transactions(transactions, changes_form.cleaned_data)
+    except TooManyTransactions as error:
+        return JsonResponse({'message': 'wrong input data', 'errors': {'filter': [str(error)]}}, status=400)
+    return JsonResponse({
+        'message': f'{updated_count} transactions updated',
+        'updated': sorted(transaction.id for transaction in transactions),
+        'missing': missing_ids
+    })
+
+
+@csrf_exempt
+@allowed_method('POST')
+@retry_on_lock
+@idempotent
+@parse_request_selection
+def delete_bulk_transactions(request, loaded_data, ids, filters):
+    """Delete the transactions of an id list or a filter, in one database transaction."""
+
+    try:
+        with db_transaction.atomic():
+            transactions, missing_ids = select_transactions(ids, filters)
+            deleted_count = delete_transactions(transactions)
+    except TooManyTransactions as error:
+        return JsonResponse({'message': 'wrong input data', 'errors': {'filter': [str(error)]}}, status=400)
+    return JsonResponse({
+        'message': f'{deleted_count} transactions deleted',
+        'deleted': sorted(transaction.id for transaction in transactions),
+        'missing': missing_ids
+    })
+
+
+def balance_response(ledger):
+    balance = ledger.amount if ledger.transactions_count else None
+    response = JsonResponse({'balance': balance})
+    response.cache_coverage = Coverage(None, None, None)
+    return response
+
+
 @allowed_method('GET')
+@cached_response
 def get_balance(request):
     """Return the balance of the day which is calculated."""
 
-    balance = Budget.objects.aggregate(Sum('amount'))
-    return JsonResponse({'balance': balance['amount__sum']})
+    return balance_response(get_ledger())
+
+
+def sum_from_dates_response(category, start_date, end_date, totals):
+    if not totals['income_count'] and not totals['expenses_count']:
+        response = JsonResponse({f'total_{category}': 'no values with these criteria'})
+    else:
+        result = totals[f'{category}_sum'] if totals[f'{category}_count'] else None
+        response = JsonResponse({f'total_{category}': result})
+    response.cache_coverage = Coverage(None, start_date, end_date)
+    return response
 
     
 @allowed_method('GET')
+@cached_response
 @parse_request_dates(FilteredDatesForm)
 def get_sum_from_dates(request, category):
     """Return total income or expenses from the  given date range."""
@@ -79,40 +227,215 @@ def get_sum_from_dates(request, category):
     form_obj = FilteredDatesForm(request.GET)
     if not form_obj.is_valid():
         return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
-    date_range_query = Budget.objects.filter(transaction_at__range=(request.GET['start_date'], request.GET['end_date']))
-    if not date_range_query:
-        return JsonResponse({f'total_{category}': 'no values with these criteria'})
-    if category == 'income':
-        result = date_range_query.filter(amount__gt=0).aggregate(Sum('amount'))
-    elif category == 'expenses':
-        result = date_range_query.filter(amount__lte=0).aggregate(Sum('amount'))
-    return JsonResponse({f'total_{category}': result['amount__sum']})
+    start_date = form_obj.cleaned_data['start_date'].date()
+    end_date = form_obj.cleaned_data['end_date'].date()
+    return sum_from_dates_response(category, start_date, end_date, get_range_totals(start_date, end_date))
+
+
+def summary_response(start_date, end_date, summary):
+    if not summary or (isinstance(summary, dict) and not summary['count']):
+        response = JsonResponse({'message': 'no values with these criteria'})
+    elif isinstance(summary, dict):
+        response = JsonResponse(summary)
+    else:
+        response = JsonResponse({'results': summary})
+    response.cache_coverage = Coverage(None, start_date, end_date)
+    return response
 
 
 @allowed_method('GET')
-def get_filtered_transactions(request):
-    """Return all records based on the given date and/or category."""
+@cached_response
+def get_summary_from_dates(request):
+    """Return income, expenses, net, count, min, max and average from the given date range, optionally grouped."""
+
+    form_obj = SummaryForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    start_date = form_obj.cleaned_data['start_date'].date()
+    end_date = form_obj.cleaned_data['end_date'].date()
+    summary = get_summary(start_date, end_date, form_obj.cleaned_data['group_by'] or None)
+    return summary_response(start_date, end_date, summary)
+
+
+def series_response(interval, category, start_date, end_date, series):
+    # Columnar json, the parallel lists share the same index.
+    response = JsonResponse({'interval': interval, **series})
+    response.cache_coverage = Coverage(category, start_date, end_date)
+    return response
+
+
+@allowed_method('GET')
+@cached_response
+def get_series_from_dates(request):
+    """Return income and expenses per day, week, month or year of the given date range."""
+
+    form_obj = SeriesForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    start_date = form_obj.cleaned_data['start_date'].date()
+    end_date = form_obj.cleaned_data['end_date'].date()
+    interval = form_obj.cleaned_data['interval']
+    category = form_obj.cleaned_data['category'] or None
+    series = get_series(start_date, end_date, interval, category)
+    return series_response(interval, category, start_date, end_date, series)
+
+
+def category_totals_response(category_totals):
+    response = JsonResponse({'results': category_totals})
+    response.cache_coverage = Coverage(None, None, None)
+    return response
+
+
+@allowed_method('GET')
+@cached_response
+def get_categories_totals(request):
+    """Return the all-time income, expenses, number of transactions and last transaction date of each category."""
 
-    if not request.GET:
-        transactions = Budget.objects.all().values(
-            'id', 'amount', 'category__type', 'transaction_at'
+    return category_totals_response(get_category_totals())
+
+
+@allowed_method('GET')
+def search_categories(request):
+    """Return the category types starting with, then containing, the given text, for autocompletion."""
+
+    form_obj = CategorySearchForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    limit = form_obj.cleaned_data['limit'] or settings.CATEGORY_SEARCH_LIMIT
+    return JsonResponse({'results': match_categories(form_obj.cleaned_data['q'], limit)})
+
+
+def filtered_transactions_query(form_obj):
+    """Return the querysets of the transactions matching a valid FilteredTransactionsForm and the applied filters.
+
+    Every filter is a plain comparison on an indexed column, so the database applies
+    them while walking the (category, transaction_at, id) or (transaction_at, id) index.
+    """
+
+    fieldnames_to_filter = {}
+    if form_obj.cleaned_data['category']:
+        fieldnames_to_filter['category__type'] = form_obj.cleaned_data['category']
+    if form_obj.cleaned_data['categories']:
+        fieldnames_to_filter['category__type__in'] = form_obj.cleaned_data['categories']
+    if form_obj.cleaned_data['transaction_at']:
+        fieldnames_to_filter['transaction_at'] = form_obj.cleaned_data['transaction_at'].date()
+    if form_obj.cleaned_data['start_date']:
+        fieldnames_to_filter['transaction_at__gte'] = form_obj.cleaned_data['start_date'].date()
+    if form_obj.cleaned_data['end_date']:
+        fieldnames_to_filter['transaction_at__lte'] = form_obj.cleaned_data['end_date'].date()
+    if form_obj.cleaned_data['min_amount'] is not None:
+        fieldnames_to_filter['amount__gte'] = form_obj.cleaned_data['min_amount']
+    if form_obj.cleaned_data['max_amount'] is not None:
+        fieldnames_to_filter['amount__lte'] = form_obj.cleaned_data['max_amount']
+    # The archive is only read when the requested dates, after the cursor, may be in it.
+    day = fieldnames_to_filter.get('transaction_at')
+    cursor = form_obj.cleaned_data['cursor']
+    start_date = max(filter(None, [day, fieldnames_to_filter.get('transaction_at__gte'), cursor and cursor[0]]), default=None)
+    end_date = min(filter(None, [day, fieldnames_to_filter.get('transaction_at__lte')]), default=None)
+    models = [Budget, ArchivedBudget] if overlaps_archive(start_date, end_date) else [Budget]
+    transactions = [
+        model.objects.filter(**fieldnames_to_filter).values('id', 'amount', 'category__type', 'transaction_at')
+        for model in models
+    ]
+    return transactions, fieldnames_to_filter
+
+
+def transactions_page_response(fieldnames_to_filter, cursor, results, next_cursor):
+    if not results and fieldnames_to_filter and cursor is None:
+        response = JsonResponse({'message': 'no values with these criteria'})
+    else:
+        response_data = {'results': results}
+        if next_cursor:
+            response_data['next'] = next_cursor
+        response = JsonResponse(response_data)
+
+    # Keyset pages only change when a row lands between the cursor and the last row of the page.
+    if 'transaction_at' in fieldnames_to_filter:
+        first_date = last_date = fieldnames_to_filter['transaction_at']
+    else:
+        first_date = max(filter(None, [cursor and cursor[0], fieldnames_to_filter.get('transaction_at__gte')]), default=None)
+        last_date = min(
+            filter(None, [next_cursor and results[-1]['transaction_at'], fieldnames_to_filter.get('transaction_at__lte')]),
+            default=None
         )
-        return JsonResponse({'results': list(transactions)}) 
-        
+    response.cache_coverage = Coverage(fieldnames_to_filter.get('category__type'), first_date, last_date)
+    return response
+
+
+@allowed_method('GET')
+@cached_response
+def get_filtered_transactions(request):
+    """Return records based on the given dates, categories and/or amounts, one page at a time or streamed."""
+
     form_obj = FilteredTransactionsForm(request.GET)
     if not form_obj.is_valid():
         return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
-    
-    fieldnames_to_filter = {}
-    for key, value in request.GET.items():
-        if key in ['category', 'transaction_at']:
-            fieldnames_to_filter[key] = value
-    if not fieldnames_to_filter:
+    if request.GET and not any(key in form_obj.fields for key in request.GET):
         return JsonResponse({'message': 'wrong field or no value for field'})
-    
-    if fieldnames_to_filter['category']:
-        fieldnames_to_filter['category__type'] = fieldnames_to_filter.pop('category')
-    transactions = Budget.objects.filter(**fieldnames_to_filter).values('id', 'amount', 'category__type', 'transaction_at')
-    if not transactions:
-        return JsonResponse({'message': 'no values with these criteria'})    
-    return JsonResponse({'results': list(transactions)})
+
+    transactions, fieldnames_to_filter = filtered_transactions_query(form_obj)
+    cursor = form_obj.cleaned_data['cursor']
+    if form_obj.cleaned_data['stream']:
+        return StreamingHttpResponse(
+            stream_results(transactions, settings.TRANSACTIONS_STREAM_CHUNK_SIZE, cursor),
+            content_type='application/json'
+        )
+
+    limit = form_obj.cleaned_data['limit'] or settings.TRANSACTIONS_PAGE_SIZE
+    results, next_cursor = paginate(transactions, limit, cursor)
+    return transactions_page_response(fieldnames_to_filter, cursor, results, next_cursor)
+
+
+@allowed_method('GET')
+def export_transactions(request):
+    """Stream the transactions as a csv or ndjson file, optionally gzipped."""
+
+    form_obj = ExportForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    file_format = form_obj.cleaned_data['format'] or 'csv'
+    transactions = export_querysets(
+        form_obj.cleaned_data['start_date'] and form_obj.cleaned_data['start_date'].date(),
+        form_obj.cleaned_data['end_date'] and form_obj.cleaned_data['end_date'].date(),
+        form_obj.cleaned_data['category']
+    )
+    chunks = export_chunks(transactions, file_format, settings.TRANSACTIONS_STREAM_CHUNK_SIZE)
+    file_name = f'transactions.{file_format}'
+    content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    if form_obj.cleaned_data['gzip']:
+        chunks = gzip_chunks(chunks)
+        file_name += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return response
+
+
+@csrf_exempt
+@allowed_method('POST')
+def import_transactions(request):
+    """Import transactions from an uploaded csv or ndjson file (field file) or from the request body."""
+
+    form_obj = ImportForm(request.GET)
+    if not form_obj.is_valid():
+        return JsonResponse({'message': 'wrong input', 'errors': form_obj.errors}, status=400)
+    uploaded_file = request.FILES.get('file') if request.content_type == 'multipart/form-data' else None
+    file_name = uploaded_file.name if uploaded_file else ''
+    file_format = form_obj.cleaned_data['format'] or ('csv' if file_name.endswith(('.csv', '.csv.gz')) else 'ndjson')
+    compressed = (
+        form_obj.cleaned_data['gzip'] or file_name.endswith('.gz') or request.headers.get('Content-Encoding') == 'gzip'
+    )
+    rows = read_rows(uploaded_file or request, file_format, compressed)
+    try:
+        report = import_rows(rows, settings.BULK_INSERT_BATCH_SIZE, form_obj.cleaned_data['checkpoint'] or None)
+    except (OSError, EOFError, UnicodeDecodeError, csv.Error):
+        # The batches saved before stay saved, an import with a checkpoint can be resumed.
+        return JsonResponse({'message': 'failed to read the file'}, status=400)
+    return JsonResponse({'message': f'{report["imported"]} transactions imported', **report})
+
+
+@allowed_method('GET')
+def get_metrics(request):
+    """Return the request metrics of this process in the Prometheus text format."""
+
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
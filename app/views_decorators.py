@@ -1,34 +1,53 @@
+import asyncio
 import json
+import time
+from decimal import Decimal
+from functools import wraps
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, set_response_etag
 
+from .async_db import run_db
+from .db import is_lock_error, retry_delay
+from .encoders import JsonResponse
+from .idempotency import IDEMPOTENCY_HEADER, find_response, request_hash, save_response
+from .forms import BulkFilterForm, BulkSelectionForm
 from .models import Budget
+from .replicas import current_read_alias
+from .response_cache import get_response, response_cache_key, store_response
 
 
 def allowed_method(method): 
-    """Decorator for checking the method of the request."""
+    """Decorator for checking the method of the request, for sync and async views."""
 
     def decorator(func):
-        def wrapper(request, *args, **kwargs):
-            if method == 'GET':
-                if request.method == 'GET':
-                    return func(request, *args, **kwargs)
-                return JsonResponse({'message': 'Method not allowed'}, status=405)
-            elif method == 'POST':
-                if request.method == 'POST':
-                    return func(request, *args, **kwargs)
+        if asyncio.iscoroutinefunction(func):
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method == method:
+                    return await func(request, *args, **kwargs)
                 return JsonResponse({'message': 'Method not allowed'}, status=405)
+            return async_wrapper
+
+        def wrapper(request, *args, **kwargs):
+            if request.method == method:
+                return func(request, *args, **kwargs)
+            return JsonResponse({'message': 'Method not allowed'}, status=405)
         return wrapper
     return decorator
 
 
 def parse_request_args(form):
-    """Decorator for checking that new data from request can be converted to json and required fields are given."""
+    """Decorator for checking that new data from request can be converted to json and required fields are given.
+
+    Json numbers with a fraction are loaded as Decimals, so that amounts reach the forms exactly.
+    """
 
     def decorator(func):
         def wrapper(request, *args, **kwargs):    
             try:
-                loaded_data = json.loads(request.body)
+                loaded_data = json.loads(request.body, parse_float=Decimal)
             except json.decoder.JSONDecodeError:
                 return JsonResponse({'message': 'failed to load json data'}, status=400)
             for field in form.base_fields.keys():
@@ -40,9 +59,17 @@ def parse_request_args(form):
 
 
 def parse_request_dates(form):
-    """Decorator for checking dates from request."""
+    """Decorator for checking dates from request, for sync and async views."""
     
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            async def async_wrapper(request, category, *args, **kwargs):
+                for field in form.base_fields.keys():
+                    if field not in request.GET:
+                        return JsonResponse({'message': 'wrong or missing fieldnames'}, status=400)
+                return await func(request, category, *args, **kwargs)
+            return async_wrapper
+
         def wrapper(request, category, *args, **kwargs):
             for field in form.base_fields.keys():
                 if field not in request.GET:
@@ -50,3 +77,181 @@ def parse_request_dates(form):
             return func(request, category, *args, **kwargs)
         return wrapper
     return decorator
+
+
+
+def parse_request_rows(func):
+    """Decorator for loading a json array or newline delimited json objects from the request."""
+
+    def wrapper(request, *args, **kwargs):
+        body = request.body.strip()
+        try:
+            if body.startswith(b'['):
+                loaded_rows = json.loads(body, parse_float=Decimal)
+            else:
+                loaded_rows = [json.loads(line, parse_float=Decimal) for line in body.splitlines() if line.strip()]
+        except json.decoder.JSONDecodeError:
+            return JsonResponse({'message': 'failed to load json data'}, status=400)
+        if not loaded_rows:
+            return JsonResponse({'message': 'no transactions given'}, status=400)
+        return func(request, loaded_rows, *args, **kwargs)
+    return wrapper
+
+
+def parse_request_selection(func):
+    """Decorator for loading the transactions selection of a bulk request, a list of ids or a filter."""
+
+    def wrapper(request, *args, **kwargs):
+        try:
+            loaded_data = json.loads(request.body, parse_float=Decimal)
+        except json.decoder.JSONDecodeError:
+            return JsonResponse({'message': 'failed to load json data'}, status=400)
+        if not isinstance(loaded_data, dict) or ('ids' in loaded_data) == ('filter' in loaded_data):
+            return JsonResponse({'message': 'wrong or missing fieldnames'}, status=400)
+        if 'ids' in loaded_data:
+            selection_form = BulkSelectionForm(loaded_data)
+        else:
+            selection_form = BulkFilterForm(loaded_data['filter'] if isinstance(loaded_data['filter'], dict) else {})
+        if not selection_form.is_valid():
+            return JsonResponse({'message': 'wrong input data', 'errors': selection_form.errors}, status=400)
+        ids = selection_form.cleaned_data.get('ids')
+        filters = None if 'ids' in loaded_data else selection_form.cleaned_data
+        return func(request, loaded_data, ids, filters, *args, **kwargs)
+    return wrapper
+
+
+def _replayed_response(request, stored, hashed_request):
+    if stored.request_hash != hashed_request:
+        return JsonResponse({'message': 'idempotency key already used for another request'}, status=422)
+    response = HttpResponse(bytes(stored.content), status=stored.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(func):
+    """Decorator for answering retries of a write request carrying an Idempotency-Key header.
+
+    The first response is saved under the key in the same database transaction as
+    the write, so a retry gets the saved response instead of writing again. When two
+    requests with the same key run at once, the second fails on the key's primary key
+    and its write is rolled back.
+    """
+
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return func(request, *args, **kwargs)
+        if len(key) > 255:
+            return JsonResponse({'message': 'idempotency key longer than 255 characters'}, status=400)
+        hashed_request = request_hash(request)
+        stored = find_response(key)
+        if stored is not None:
+            return _replayed_response(request, stored, hashed_request)
+        try:
+            with transaction.atomic():
+                response = func(request, *args, **kwargs)
+                if response.status_code < 500:
+                    save_response(key, hashed_request, response)
+        except IntegrityError:
+            stored = find_response(key)
+            if stored is None:
+                raise
+            return _replayed_response(request, stored, hashed_request)
+        return response
+    return wrapper
+
+
+def retry_on_lock(func):
+    """Decorator for running a write view again when it fails on a lock held by a concurrent transaction.
+
+    The view is retried at most WRITE_RETRY_ATTEMPTS times with a random backoff, so
+    that writers failing together do not collide again. Views running inside an outer
+    atomic block are not retried, their transaction can only be rolled back as a whole.
+    """
+
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        for attempt in range(settings.WRITE_RETRY_ATTEMPTS + 1):
+            try:
+                return func(request, *args, **kwargs)
+            except OperationalError as error:
+                if connection.in_atomic_block or attempt == settings.WRITE_RETRY_ATTEMPTS or not is_lock_error(error):
+                    raise
+            time.sleep(retry_delay(attempt))
+    return wrapper
+
+
+def _finish_response(request, response):
+    """Add an ETag to a response and turn it into a 304 when the client already has it."""
+
+    if response.streaming:
+        return response
+    if not response.has_header('ETag'):
+        set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def _cached_entry_response(request, entry):
+    etag, content, content_type = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    return _finish_response(request, response)
+
+
+def _store_if_cacheable(key, writes_version, response):
+    coverage = getattr(response, 'cache_coverage', None)
+    if response.streaming or response.status_code != 200 or coverage is None:
+        return
+    set_response_etag(response)
+    timeout = None
+    if current_read_alias() is not None:
+        # A lagging replica may have missed the writes invalidating the response since.
+        timeout = min(settings.RESPONSE_CACHE_TIMEOUT, settings.REPLICA_RESPONSE_CACHE_TIMEOUT)
+    store_response(key, (response['ETag'], response.content, response['Content-Type']), coverage, writes_version, timeout)
+
+
+def _cache_enabled():
+    return settings.RESPONSE_CACHE_TIMEOUT and not connection.in_atomic_block
+
+
+def _reads_own_writes(request):
+    # A response cached by another client may come from a replica missing the writes
+    # of this one, which reads from the primary for a while after them.
+    return bool(settings.DATABASE_REPLICAS) and settings.REPLICA_STICKY_COOKIE in request.COOKIES
+
+
+def cached_response(func):
+    """Decorator for serving GET responses from the response cache, with ETag support.
+
+    The view marks a response as cacheable by setting its cache_coverage. Requests
+    running inside an atomic block bypass the cache, as they may see uncommitted rows,
+    and clients reading their own writes from the primary are not served from it.
+    Async views do the cache and connection work through run_db.
+    """
+
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not await run_db(_cache_enabled):
+                return _finish_response(request, await func(request, *args, **kwargs))
+            key = response_cache_key(func.__name__, request, kwargs)
+            entry, writes_version = await run_db(get_response, key)
+            if entry is not None and not _reads_own_writes(request):
+                return _cached_entry_response(request, entry)
+            response = await func(request, *args, **kwargs)
+            await run_db(_store_if_cacheable, key, writes_version, response)
+            return _finish_response(request, response)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        if not _cache_enabled():
+            return _finish_response(request, func(request, *args, **kwargs))
+        key = response_cache_key(func.__name__, request, kwargs)
+        entry, writes_version = get_response(key)
+        if entry is not None and not _reads_own_writes(request):
+            return _cached_entry_response(request, entry)
+        response = func(request, *args, **kwargs)
+        _store_if_cacheable(key, writes_version, response)
+        return _finish_response(request, response)
+    return wrapper
@@ -0,0 +1,90 @@
+"""Send concurrent GET requests to a running server and report latency percentiles and throughput.
+
+Usage: python benchmarks/http_load.py http://127.0.0.1:8000/ --concurrency 200 --duration 10
+
+With --slow-client the clients send their request line by line with a pause in
+between, like clients on a slow network, which holds a sync worker for the whole
+time but only a coroutine in an ASGI worker.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def fetch(host, port, path, slow_client):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        request_lines = [f'GET {path} HTTP/1.1\r\n', f'Host: {host}\r\n', 'Connection: close\r\n', '\r\n']
+        for line in request_lines:
+            writer.write(line.encode())
+            await writer.drain()
+            if slow_client:
+                await asyncio.sleep(slow_client / len(request_lines))
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def client(url, deadline, slow_client, latencies, statuses):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            status = await fetch(parts.hostname, parts.port or 80, path, slow_client)
+        except (OSError, IndexError, ValueError):
+            status = 'error'
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def run_load(url, concurrency, duration, slow_client):
+    """Return the measured latencies (ms) and status counts of a load run."""
+
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(url, deadline, slow_client, latencies, statuses) for _ in range(concurrency)))
+    return latencies, statuses
+
+
+def summarize(latencies, statuses, duration):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) or 0, 2),
+        'p95_ms': round(percentile(latencies, 0.95) or 0, 2),
+        'p99_ms': round(percentile(latencies, 0.99) or 0, 2),
+        'mean_ms': round(statistics.mean(latencies), 2) if latencies else None,
+        'statuses': {str(status): count for status, count in statuses.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--slow-client', type=float, default=0, help='Seconds each client takes to send its request.')
+    args = parser.parse_args()
+
+    latencies, statuses = asyncio.run(run_load(args.url, args.concurrency, args.duration, args.slow_client))
+    print(json.dumps(summarize(latencies, statuses, args.duration), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Compare query plans and latency of the Budget query shapes with and without the Budget indexes.
+
+Usage: python benchmarks/index_plans.py --rows 1000000
+
+The transactions are seeded into a throwaway test database, so the configured
+database is never touched.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'money_handler.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import setup_databases, teardown_databases
+
+
+def query_shapes():
+    """Return the query shapes of app/views.py as (queryset builder, is a sum) pairs."""
+
+    from app.models import Budget
+    from app.pagination import after_cursor
+
+    fields = ('id', 'amount', 'category__type', 'transaction_at')
+    middle_date = datetime.date(2020, 1, 1)
+    month = (middle_date, middle_date + datetime.timedelta(days=30))
+    year = (middle_date, middle_date + datetime.timedelta(days=365))
+    return {
+        'first_page': (lambda: Budget.objects.values(*fields).order_by('transaction_at', 'id')[:1000], False),
+        'cursor_page': (lambda: after_cursor(Budget.objects.values(*fields), (middle_date, 0))[:1000], False),
+        'date_filter': (lambda: after_cursor(Budget.objects.filter(transaction_at=middle_date).values(*fields), None), False),
+        'category_page': (lambda: after_cursor(Budget.objects.filter(category__type='rent').values(*fields), None)[:1000], False),
+        'income_month': (lambda: Budget.objects.filter(transaction_at__range=month, amount__gt=0).values('amount'), True),
+        'expenses_year': (lambda: Budget.objects.filter(transaction_at__range=year, amount__lte=0).values('amount'), True),
+    }
+
+
+def run_shapes(repeat):
+    results = {}
+    for name, (build_query, is_sum) in query_shapes().items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if is_sum:
+                build_query().aggregate(Sum('amount'))
+            else:
+                list(build_query())
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {'median_ms': round(statistics.median(timings), 3), 'plan': build_query().explain()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Write the results as json to this file.')
+    args = parser.parse_args()
+
+    django.setup()
+    from app.models import Budget
+    from benchmarks.seed import seed_transactions
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seed_transactions(args.rows)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE app_budget')
+
+        with connection.schema_editor() as schema_editor:
+            for index in Budget._meta.indexes:
+                schema_editor.remove_index(Budget, index)
+        before = run_shapes(args.repeat)
+        with connection.schema_editor() as schema_editor:
+            for index in Budget._meta.indexes:
+                schema_editor.add_index(Budget, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE app_budget')
+        after = run_shapes(args.repeat)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    results = {
+        'vendor': connection.vendor,
+        'rows': args.rows,
+        'shapes': {name: {'before': before[name], 'after': after[name]} for name in before},
+    }
+    for name, shape in results['shapes'].items():
+        print(f"{name:15} {shape['before']['median_ms']:10.2f} ms -> {shape['after']['median_ms']:10.2f} ms")
+        print(f"{'':15} before: {shape['before']['plan']}")
+        print(f"{'':15} after:  {shape['after']['plan']}")
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Compare the json encoders on a page of transactions, as returned by get/transactions/.
+
+Usage: python benchmarks/json_encoders.py --rows 100000
+
+The rows are generated in memory, no database is needed. Each encoder is timed on
+values() dicts and on values_list() tuples, the tuples being turned into objects
+either through dict(zip()) or by writing every row with a bytes template.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'money_handler.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+
+FIELDS = ('id', 'amount', 'category__type', 'transaction_at')
+
+
+def generate_rows(rows):
+    from benchmarks.seed import CATEGORY_TYPES, generate_transactions
+
+    category_ids = {category_type: index for index, category_type in enumerate(CATEGORY_TYPES)}
+    return [
+        (index, budget.amount, CATEGORY_TYPES[budget.category_id], budget.transaction_at)
+        for index, budget in enumerate(generate_transactions(rows, datetime.date(2015, 1, 1), 3650, category_ids), 1)
+    ]
+
+
+def template_dumps(dumps, tuples):
+    # Each row written from its tuple, without building a dict.
+    return b'{"results":[' + b','.join(
+        b'{"id":%d,"amount":%b,"category__type":%b,"transaction_at":"%b"}' % (
+            row_id, dumps(amount), dumps(category_type), transaction_at.isoformat().encode()
+        )
+        for row_id, amount, category_type, transaction_at in tuples
+    ) + b']}'
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        content = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, len(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    django.setup()
+
+    from django.core.serializers.json import DjangoJSONEncoder
+    from app.encoders import ENCODERS
+
+    tuples = generate_rows(args.rows)
+    dicts = [dict(zip(FIELDS, row)) for row in tuples]
+    cases = {
+        'JsonResponse before (dicts)': lambda: json.dumps({'results': dicts}, cls=DjangoJSONEncoder).encode(),
+    }
+    for name, dumps in ENCODERS.items():
+        cases[f'{name} dicts'] = lambda dumps=dumps: dumps({'results': dicts})
+        cases[f'{name} tuples + dict(zip)'] = lambda dumps=dumps: dumps({'results': [dict(zip(FIELDS, row)) for row in tuples]})
+        cases[f'{name} tuples + template'] = lambda dumps=dumps: template_dumps(dumps, tuples)
+
+    print(f'{args.rows} transactions, best of {args.repeat}')
+    for name, func in cases.items():
+        milliseconds, size = best_of(args.repeat, func)
+        print(f'{name:34} {milliseconds:9.1f} ms {size / 1e6:8.2f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import datetime
+import math
+import random
+
+from django.db import transaction
+
+from app.category_totals import find_category_drift, fix_category_totals
+from app.ledger import rebuild_balance
+from app.models import Budget, Category
+from app.rollups import backfill_rollups
+
+
+SCALES = {
+    'small': 10000,
+    'medium': 1000000,
+    'large': 10000000,
+}
+
+# Monthly transactions: (category, day of the month, typical amount).
+MONTHLY_TRANSACTIONS = [
+    ('salary', 1, 3200),
+    ('rent', 1, -950),
+    ('insurance', 5, -120),
+    ('utilities', 12, -140),
+]
+
+# Everyday transactions: (category, share of the everyday rows, median amount).
+DAILY_TRANSACTIONS = [
+    ('groceries', 0.30, -35),
+    ('restaurants', 0.18, -25),
+    ('transport', 0.20, -12),
+    ('entertainment', 0.10, -30),
+    ('health', 0.05, -45),
+    ('travel', 0.02, -400),
+    ('freelance', 0.03, 450),
+    ('general', 0.12, -20),
+]
+
+CATEGORY_TYPES = [category for category, _, _ in MONTHLY_TRANSACTIONS + DAILY_TRANSACTIONS]
+
+
+def _amount(generator, typical_amount, spread):
+    amount = typical_amount * generator.lognormvariate(0, spread)
+    return round(amount, 2) or math.copysign(0.01, typical_amount)
+
+
+def generate_transactions(rows, start_date, days, category_ids, seed=0):
+    """Yield about rows unsaved Budget objects spread over days, with realistic distributions.
+
+    Incomes and fixed costs come once a month on fixed days, everyday expenses come
+    more often on weekends and grow slowly over the period.
+    """
+
+    generator = random.Random(seed)
+    months = max(1, days // 30)
+    daily_rows = max(0, rows - months * len(MONTHLY_TRANSACTIONS))
+    daily_categories = [category for category, _, _ in DAILY_TRANSACTIONS]
+    daily_weights = [share for _, share, _ in DAILY_TRANSACTIONS]
+    typical_amounts = {category: amount for category, _, amount in DAILY_TRANSACTIONS}
+    # Weekend days weigh 1.5, a linear 50% growth from the first to the last day.
+    day_weights = [
+        (1.5 if (start_date + datetime.timedelta(days=day)).weekday() >= 5 else 1) * (1 + 0.5 * day / days)
+        for day in range(days)
+    ]
+    scale = daily_rows / sum(day_weights)
+
+    produced = 0
+    carry = 0.0
+    for day in range(days):
+        transaction_at = start_date + datetime.timedelta(days=day)
+        for category, day_of_month, typical_amount in MONTHLY_TRANSACTIONS:
+            if transaction_at.day == day_of_month and produced < rows:
+                produced += 1
+                yield Budget(
+                    amount=_amount(generator, typical_amount, 0.05),
+                    category_id=category_ids[category],
+                    transaction_at=transaction_at
+                )
+        carry += day_weights[day] * scale
+        day_rows = int(carry)
+        carry -= day_rows
+        for category in generator.choices(daily_categories, daily_weights, k=min(day_rows, rows - produced)):
+            produced += 1
+            yield Budget(
+                amount=_amount(generator, typical_amounts[category], 0.6),
+                category_id=category_ids[category],
+                transaction_at=transaction_at
+            )
+    # Rounding leftovers land on the last day.
+    while produced < rows:
+        produced += 1
+        yield Budget(amount=-10, category_id=category_ids['general'], transaction_at=start_date + datetime.timedelta(days=days - 1))
+
+
+def seed_transactions(rows, start_date=datetime.date(2015, 1, 1), days=3650, batch_size=5000, seed=0):
+    """Fill the Budget table with generated transactions and return the number of rows created.
+
+    The derived aggregates (balance ledger, daily rollups and category totals) are rebuilt afterwards.
+    """
+
+    category_ids = {}
+    for category_type in CATEGORY_TYPES:
+        category_ids[category_type] = Category.objects.get_or_create(type=category_type)[0].id
+    created = 0
+    batch = []
+    with transaction.atomic():
+        for budget in generate_transactions(rows, start_date, days, category_ids, seed):
+            batch.append(budget)
+            if len(batch) >= batch_size:
+                Budget.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        Budget.objects.bulk_create(batch)
+        created += len(batch)
+    backfill_rollups()
+    rebuild_balance()
+    fix_category_totals(find_category_drift())
+    return created
@@ -0,0 +1,24 @@
+"""Gunicorn settings, read from the environment.
+
+GUNICORN_WORKERS processes (WEB_CONCURRENCY or 2 * cpus + 1 by default) each serve GUNICORN_THREADS
+requests at once, with threads > 1 using the gthread worker. Every thread keeps its
+own database connection open (DB_CONN_MAX_AGE), or shares the pool of its process
+(DB_POOL_SIZE), so the database must accept workers * threads connections.
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker runs money_handler.asgi:application.
+"""
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('GUNICORN_WORKERS', os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Restart each worker after this many requests (with some jitter so that they do not
+# restart together), which bounds the memory a leak can take. 0 disables it.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+# Database connections are only opened by the requests, never before the fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD') == 'True'
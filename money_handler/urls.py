@@ -1,15 +1,24 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from app import views
+from app import async_views, views
 
 
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
-    path('', views.get_balance, name='get_balance'),
+    path('', read_views.get_balance, name='get_balance'),
     path('admin/', admin.site.urls),
     path('add/', views.add_transaction, name='add_transaction'),
+    path('add/status/', views.get_ingest_status, name='get_ingest_status'),
+    path('add/bulk/', views.add_bulk_transactions, name='add_bulk_transactions'),
     path('update/', views.update_transaction, name='update_transaction'),
+    path('update/bulk/', views.update_bulk_transactions, name='update_bulk_transactions'),
     path('delete/', views.delete_transaction, name='delete_transaction'),
-    path('get/', include('app.urls'))
+    path('delete/bulk/', views.delete_bulk_transactions, name='delete_bulk_transactions'),
+    path('get/', include('app.urls')),
+    path('export/', views.export_transactions, name='export_transactions'),
+    path('import/', views.import_transactions, name='import_transactions'),
+    path('metrics/', views.get_metrics, name='metrics')
 ]
\ No newline at end of file